@@ -7,18 +7,34 @@ import matplotlib.pyplot as plt
 import librosa
 from core.audio.audio_processor import plot_waveform, plot_spectrogram
 
+# Spectrogram của cả recording nhiều giờ vừa tốn RAM vừa không đọc được -> chỉ vẽ một đoạn
+MAX_SPECTROGRAM_SECONDS = 120
+
 def render_audio_visualization(audio_data, sr):
     """
     Hiển thị waveform và spectrogram của audio
     
     Args:
-        audio_data: Numpy array chứa audio samples
+        audio_data: Numpy array (hoặc memmap) chứa audio samples
         sr: Sample rate
     """
     if audio_data is None or len(audio_data) == 0:
         st.warning("⚠️ Không có dữ liệu audio để hiển thị")
         return
     
+    duration = len(audio_data) / sr
+    spec_start = 0.0
+    if duration > MAX_SPECTROGRAM_SECONDS:
+        spec_start = st.slider(
+            "Spectrogram từ giây",
+            min_value=0.0,
+            max_value=float(duration - MAX_SPECTROGRAM_SECONDS),
+            value=0.0,
+            step=1.0,
+            help=f"Audio dài: spectrogram chỉ hiển thị {MAX_SPECTROGRAM_SECONDS}s bắt đầu từ vị trí này",
+        )
+    spec_view = audio_data[int(spec_start * sr):int((spec_start + MAX_SPECTROGRAM_SECONDS) * sr)]
+    
     col1, col2 = st.columns(2)
     
     with col1:
@@ -29,7 +45,10 @@ def render_audio_visualization(audio_data, sr):
     
     with col2:
         st.subheader("🎵 Spectrogram")
-        fig_spec = plot_spectrogram(audio_data, sr, title="Audio Spectrogram")
+        title = "Audio Spectrogram"
+        if len(spec_view) < len(audio_data):
+            title += f" ({spec_start:.0f}s - {spec_start + len(spec_view) / sr:.0f}s)"
+        fig_spec = plot_spectrogram(spec_view, sr, title=title)
         st.pyplot(fig_spec)
         plt.close(fig_spec)
 
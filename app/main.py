@@ -37,6 +37,7 @@ st.set_page_config(
 from app.components.layout import apply_custom_css
 from app.components.footer import render_footer
 from core.auth.session import init_session
+from core.asr.model_manager import get_preloader
 
 # =========================
 # 4️⃣ HOME PAGE (Legacy - redirect to Dashboard)
@@ -80,6 +81,9 @@ Sử dụng sidebar để điều hướng các chức năng hoặc truy cập *
 def main():
     # Initialize session and auth
     init_session()
+
+    # Load + warm up PRELOAD_MODELS in the background (once per process)
+    get_preloader()
     
     apply_custom_css()
 
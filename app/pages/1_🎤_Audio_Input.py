@@ -5,7 +5,6 @@ Upload / record audio, overview, visualization, basic preprocessing
 import streamlit as st
 import os
 import sys
-import tempfile
 
 # ================== PATH SETUP ==================
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
@@ -18,6 +17,7 @@ from core.audio.audio_processor import (
     preprocess_audio,
 )
 from core.audio.ffmpeg_setup import ensure_ffmpeg
+from core.audio.probe import AudioProbeError, limit_violation, probe_audio
 
 # ================== ENV SETUP ==================
 ensure_ffmpeg(silent=True)
@@ -56,9 +56,26 @@ with tab_upload:
         type=["wav", "mp3", "flac", "m4a", "ogg"],
     )
 
+    violation = None
     if uploaded_file:
+        # Chỉ đọc header: file quá dài / hỏng bị từ chối trước khi decode
+        try:
+            probe = probe_audio(uploaded_file)
+            violation = limit_violation(probe)
+        except AudioProbeError as e:
+            probe, violation = None, str(e)
+        if violation:
+            st.error(f"❌ {violation}")
+        elif probe.duration:
+            st.caption(
+                f"🔎 {probe.codec or '?'} · {probe.sample_rate or '?'} Hz · "
+                f"{probe.channels or '?'} ch · {probe.duration:.1f}s"
+            )
+
+    if uploaded_file and not violation:
         with st.spinner("Loading audio..."):
-            audio_data, sr = load_audio(uploaded_file)
+            # Decode theo block vào memmap: upload nhiều giờ không chiếm vài GB RAM
+            audio_data, sr = load_audio(uploaded_file, mmap=True)
 
         if audio_data is None:
             st.error("❌ Không thể load audio")
@@ -81,24 +98,15 @@ with tab_record:
         if audio_bytes:
             st.audio(audio_bytes, format="audio/wav")
 
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as tmp:
-                tmp.write(audio_bytes)
-                tmp_path = tmp.name
-
-            try:
-                audio_data, sr = load_audio(tmp_path)
-                if audio_data is not None:
-                    st.session_state.audio_data = audio_data
-                    st.session_state.audio_sr = sr
-                    st.session_state.audio_info = get_audio_info(audio_data, sr)
-                    st.session_state.audio_ready = False
-                    st.session_state.audio_source = audio_bytes
-                    st.success("✅ Audio recorded")
-            finally:
-                try:
-                    os.unlink(tmp_path)
-                except Exception:
-                    pass
+            # Bytes được pipe thẳng vào ffmpeg, không cần file tạm
+            audio_data, sr = load_audio(audio_bytes)
+            if audio_data is not None:
+                st.session_state.audio_data = audio_data
+                st.session_state.audio_sr = sr
+                st.session_state.audio_info = get_audio_info(audio_data, sr)
+                st.session_state.audio_ready = False
+                st.session_state.audio_source = audio_bytes
+                st.success("✅ Audio recorded")
     except ImportError:
         st.warning("Cài đặt audio-recorder-streamlit để dùng chức năng ghi âm")
 
@@ -1,14 +1,11 @@
 """
 Transcription Page
-Chạy ASR (Whisper / PhoWhisper), chunking nhẹ, tối ưu cho Streamlit Cloud
+Chạy ASR (Whisper / PhoWhisper / faster-whisper), chunking nhẹ, tối ưu cho Streamlit Cloud
 """
 import streamlit as st
 import os
 import sys
-import tempfile
 import re
-import time
-import soundfile as sf
 
 # ================== PATH ==================
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
@@ -22,23 +19,24 @@ from core.asr.model_registry import (
     check_model_dependencies,
     get_recommended_models,
 )
-from core.asr.transcription_service import (
-    load_whisper_model,
-    transcribe_audio,
-)
-from core.asr.phowhisper_service import (
-    load_phowhisper_model,
-    transcribe_phowhisper,
-)
+from core.asr.backends import SUPPORTED_BACKENDS, load_model, transcribe_function
+from core.asr.model_manager import get_preloader
+from core.asr.preloader import READY
 from core.asr.quality_presets import (
     get_model_size_for_preset,
+    get_decoding_profile_for_preset,
+    get_cascade_presets,
     get_preset_description,
     get_preset_tooltip,
     get_recommended_preset,
     get_all_presets,
     detect_gpu,
 )
-from core.audio.audio_processor import chunk_signal, format_timestamp
+from core.asr.cascade import transcribe_cascade
+from core.asr.progressive import ProgressiveTranscription, format_chunks
+from core.asr.chunk_scheduler import transcribe_chunks_parallel, plan_workers
+from core.audio.audio_processor import detect_packed_windows, format_timestamp
+from core.audio.vad import window_audio, window_duration, window_time_map
 from core.audio.ffmpeg_setup import ensure_ffmpeg
 
 # ================== ENV ==================
@@ -59,6 +57,7 @@ def init_state():
         "audio_info": None,
         "transcript_text": "",
         "transcript_segments": [],
+        "progressive_job": None,
     }
     for k, v in defaults.items():
         st.session_state.setdefault(k, v)
@@ -96,7 +95,7 @@ selected_model_id = st.selectbox(
         all_models[mid]["name"]
         + (" 🌟" if mid in recommended else "")
     ),
-    help="Chọn mô hình ASR: Whisper (đa ngôn ngữ) hoặc PhoWhisper (tối ưu cho tiếng Việt)"
+    help="Chọn mô hình ASR: Whisper (đa ngôn ngữ), PhoWhisper (tối ưu cho tiếng Việt) hoặc faster-whisper (CTranslate2, nhanh trên CPU)"
 )
 
 model_info = get_model_info(selected_model_id)
@@ -106,6 +105,11 @@ is_available, missing = check_model_dependencies(selected_model_id)
 if not is_available:
     st.error(f"❌ Missing dependencies: {', '.join(missing)}")
 
+preloader = get_preloader()
+if not preloader.done:
+    warming = [f"{m['backend']}-{m['size']}" for m in preloader.status()["models"] if m["state"] != READY]
+    st.caption(f"🔥 Đang load + warm-up: {', '.join(warming)}")
+
 # ================== QUALITY PRESET ==================
 st.subheader("⚡ Quality Preset")
 
@@ -120,7 +124,8 @@ preset_options = get_all_presets()
 preset_labels = {
     "fast": "⚡ Fast - Nhanh, ít chính xác",
     "balanced": "⚖️ Balanced - Cân bằng",
-    "accurate": "🎯 Accurate - Chậm, chính xác nhất"
+    "accurate": "🎯 Accurate - Chậm, chính xác nhất",
+    "cascade": "🔁 Cascade - Nhanh, tự sửa đoạn khó"
 }
 
 selected_preset = st.radio(
@@ -138,6 +143,8 @@ st.caption(get_preset_tooltip(selected_preset))
 
 # Auto-map preset to model size (hidden from user)
 model_size = get_model_size_for_preset(selected_preset, selected_model_id)
+decoding_profile = get_decoding_profile_for_preset(selected_preset)
+cascade_presets = get_cascade_presets(selected_preset)
 
 if model_size is None:
     st.error(f"❌ Invalid preset/model combination")
@@ -147,12 +154,31 @@ if model_size is None:
 with st.expander("ℹ️ Technical Details"):
     st.write(f"**Model size:** {model_size}")
     st.write(f"**Preset:** {selected_preset}")
+    st.write(f"**Decoding:** {decoding_profile or 'settings default'}")
     st.caption("💡 Technical details moved to Advanced Settings page")
 
 # Default options (hidden from regular users, moved to Advanced Settings)
 enable_chunk = True  # Always enabled for long audio
-chunk_seconds = 45  # Default chunk length
+chunk_seconds = 30  # Whisper pads every input to 30s: pack speech up to that length
 show_timestamps = True  # Always show timestamps
+num_workers, threads_per_worker = plan_workers()  # resource.num_workers / num_threads
+
+# Progressive mode: the Fast preset model previews, the selected preset refines in the background
+preview_size = get_model_size_for_preset("fast", selected_model_id)
+progressive = st.checkbox(
+    "⚡ Hiện bản nháp ngay (model nhỏ), tự cập nhật khi bản chính xác xong",
+    value=False,  # giữ 2 model trong RAM cùng lúc -> chỉ bật khi người dùng chọn
+    help="Bản nháp hiện theo từng đoạn sau vài giây; model của preset đã chọn chạy nền và thay thế từng đoạn khi xong. "
+         "Cần RAM cho cả hai model cùng lúc",
+)
+use_progressive = (
+    progressive
+    and not cascade_presets
+    and num_workers <= 1
+    and selected_model_id in SUPPORTED_BACKENDS
+    and preview_size is not None
+    and preview_size != model_size
+)
 
 # ================== TRANSCRIBE ==================
 def safe_get_text(result, default=""):
@@ -176,56 +202,56 @@ def safe_get_text(result, default=""):
         return result
     return default
 
+def plan_windows():
+    """
+    Chia `st.session_state.audio_data` thành các window cho ASR.
+
+    Speech (Silero VAD) được ghép vào các window tối đa `chunk_seconds` giây,
+    bỏ khoảng lặng giữa các đoạn, nên mỗi lượt encoder 30s của Whisper chứa
+    gần đầy speech thay vì padding.
+    """
+    audio_data = st.session_state.audio_data
+    sr = st.session_state.audio_sr
+    if not enable_chunk:
+        return [{"start": 0.0, "end": len(audio_data) / sr}]
+
+    windows = detect_packed_windows(audio_data, sr, max_dur=chunk_seconds)
+    speech = sum(window_duration(w) for w in windows)
+    st.caption(f"🪟 {len(windows)} windows · {speech:.0f}s được decode / {len(audio_data) / sr:.0f}s audio")
+    return windows
+
 def run_chunked_transcription(run_fn):
-    ranges = (
-        chunk_signal(st.session_state.audio_data, st.session_state.audio_sr, chunk_seconds)
-        if enable_chunk else [(0, len(st.session_state.audio_data))]
-    )
+    """
+    Chạy ASR theo từng window (xem `plan_windows`).
+
+    `run_fn(y, sr)` nhận trực tiếp numpy array của window (view của
+    `st.session_state.audio_data` hoặc các đoạn speech đã ghép; không ghi
+    WAV tạm, không spawn ffmpeg cho mỗi chunk). Segment/word timestamp của
+    từng window được map về thời gian gốc và lưu vào
+    `st.session_state.transcript_segments`.
+    """
+    audio_data = st.session_state.audio_data
+    sr = st.session_state.audio_sr
+    windows = plan_windows()
 
     results = []
+    segments = []
     progress = st.progress(0.0)
     error_count = 0
-    temp_files_to_cleanup = []  # Track files to cleanup after transcription
 
-    for i, (s0, s1) in enumerate(ranges, 1):
-        y = st.session_state.audio_data[s0:s1]
-        tmp_name = None
+    for i, w in enumerate(windows, 1):
+        y = window_audio(audio_data, sr, w)
 
         try:
-            # Create temp file and ensure it's closed before writing
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as tmp:
-                tmp_name = tmp.name
-            
-            # Write audio data to file
-            sf.write(tmp_name, y, st.session_state.audio_sr)
-            
-            # CRITICAL: Ensure file is flushed and closed before passing to transcription
-            # On Windows, file must be fully written and closed before other processes can access it
-            time.sleep(0.05)  # Small delay to ensure file system sync on Windows
-            
-            # Verify file exists and is readable before transcription
-            if not os.path.exists(tmp_name):
-                error_count += 1
-                st.warning(f"⚠️ Chunk {i}/{len(ranges)}: Temp file không tồn tại sau khi tạo: {tmp_name}")
-                continue
-            
-            # Normalize path for Windows (resolve any path issues)
-            tmp_name_normalized = os.path.normpath(os.path.abspath(tmp_name))
-            
-            # Verify normalized path exists
-            if not os.path.exists(tmp_name_normalized):
-                error_count += 1
-                st.warning(f"⚠️ Chunk {i}/{len(ranges)}: Normalized path không tồn tại: {tmp_name_normalized}")
-                # Try original path
-                tmp_name_normalized = tmp_name
-            
             # Run transcription
-            result = run_fn(tmp_name_normalized)
+            result = run_fn(y, sr)
             text = safe_get_text(result)
+            if isinstance(result, dict):
+                segments.extend(window_time_map(w, sr).remap_segments(result.get("segments")))
             
             if text:
                 if show_timestamps:
-                    ts = f"[{format_timestamp(s0 / st.session_state.audio_sr)} - {format_timestamp(s1 / st.session_state.audio_sr)}] "
+                    ts = f"[{format_timestamp(w['start'])} - {format_timestamp(w['end'])}] "
                 else:
                     ts = ""
                 results.append(ts + text.strip())
@@ -233,39 +259,186 @@ def run_chunked_transcription(run_fn):
                 # Transcription returned None or empty - log but continue
                 error_count += 1
                 if error_count == 1:  # Only show warning once
-                    st.warning(f"⚠️ Chunk {i}/{len(ranges)}: Transcription failed or returned empty. Check error messages above.")
+                    st.warning(f"⚠️ Chunk {i}/{len(windows)}: Transcription failed or returned empty. Check error messages above.")
         except Exception as chunk_err:
             error_count += 1
-            error_msg = str(chunk_err)
-            if "WinError 2" in error_msg or "cannot find the file" in error_msg.lower():
-                st.warning(f"⚠️ Chunk {i}/{len(ranges)}: File không tìm thấy. Có thể file đã bị xóa hoặc path có vấn đề.")
-            else:
-                st.warning(f"⚠️ Chunk {i}/{len(ranges)} failed: {error_msg}")
-        finally:
-            # Add to cleanup list instead of deleting immediately
-            # This ensures file exists during entire transcription process
-            if tmp_name and os.path.exists(tmp_name):
-                temp_files_to_cleanup.append(tmp_name)
-
-        progress.progress(i / len(ranges))
+            st.warning(f"⚠️ Chunk {i}/{len(windows)} failed: {str(chunk_err)}")
 
-    # Cleanup all temp files after all transcriptions are complete
-    for tmp_file in temp_files_to_cleanup:
-        try:
-            if os.path.exists(tmp_file):
-                # Small delay to ensure file is not in use
-                time.sleep(0.1)
-                os.unlink(tmp_file)
-        except Exception as cleanup_err:
-            # Ignore cleanup errors - file may already be deleted
-            pass
+        progress.progress(i / len(windows))
 
     if error_count > 0 and len(results) == 0:
         # All chunks failed
         raise Exception(f"All {error_count} chunks failed. Check audio file and model loading.")
 
+    st.session_state.transcript_segments = segments
     return "\n".join(results) if results else ""
 
+def run_parallel_chunked_transcription(backend, size):
+    """
+    Chạy ASR song song: các chunk được phân phối cho `num_workers` process,
+    mỗi process giữ model riêng. Kết quả được ghép lại theo thứ tự thời gian.
+    """
+    audio_data = st.session_state.audio_data
+    sr = st.session_state.audio_sr
+    windows = plan_windows()
+    chunks = [(w["start"], w["end"], window_audio(audio_data, sr, w)) for w in windows]
+
+    progress = st.progress(0.0)
+    ordered = transcribe_chunks_parallel(
+        chunks,
+        backend=backend,
+        model_size=size,
+        sr=sr,
+        language="vi",
+        num_workers=num_workers,
+        threads_per_worker=threads_per_worker,
+        progress_callback=lambda done, total: progress.progress(done / total),
+        decoding=decoding_profile,
+    )
+
+    results = []
+    segments = []
+    # Windows are in time order, like the sorted results
+    for w, (start, end, result) in zip(windows, ordered):
+        text = safe_get_text(result)
+        if isinstance(result, dict):
+            segments.extend(window_time_map(w, sr).remap_segments(result.get("segments")))
+        if text:
+            ts = f"[{format_timestamp(start)} - {format_timestamp(end)}] " if show_timestamps else ""
+            results.append(ts + text.strip())
+
+    if not results:
+        raise Exception(f"All {len(ordered)} chunks failed. Check audio file and model loading.")
+
+    st.session_state.transcript_segments = segments
+    return "\n".join(results)
+
+def run_cascade_transcription(backend):
+    """
+    Cascade: model của preset Fast chạy mọi window, model của preset Accurate
+    chỉ transcribe lại các window có điểm tin cậy thấp (xem `core.asr.cascade`).
+    """
+    audio_data = st.session_state.audio_data
+    sr = st.session_state.audio_sr
+    windows = plan_windows()
+
+    draft_preset, refine_preset = cascade_presets
+    draft_size = get_model_size_for_preset(draft_preset, backend)
+    refine_size = get_model_size_for_preset(refine_preset, backend)
+    draft_decoding = get_decoding_profile_for_preset(draft_preset)
+    refine_decoding = get_decoding_profile_for_preset(refine_preset)
+
+    load = lambda size: load_model(backend, size)
+    # scores=True: PhoWhisper's pipeline output has no token scores, decode with generate() instead
+    transcribe_fn = transcribe_function(backend, scores=True)
+    run = lambda m, y, decoding: transcribe_fn(m, y, sr=sr, language="vi", decoding=decoding)
+
+    draft_model = load(draft_size)
+    if draft_model is None:
+        raise Exception(f"Failed to load {backend}-{draft_size}")
+
+    refine_model = []
+
+    def refine(y):
+        # The large model is only loaded if some window needs it
+        if not refine_model:
+            st.info(f"🔁 Loading {backend}-{refine_size} for low-confidence windows...")
+            refine_model.append(load(refine_size))
+        return run(refine_model[0], y, refine_decoding) if refine_model[0] is not None else None
+
+    progress = st.progress(0.0)
+    entries = transcribe_cascade(
+        len(windows),
+        lambda i: window_audio(audio_data, sr, windows[i]),
+        lambda y: run(draft_model, y, draft_decoding),
+        refine,
+        progress_callback=lambda done, total: progress.progress(done / total),
+    )
+
+    results = []
+    segments = []
+    for w, entry in zip(windows, entries):
+        result = entry["result"]
+        text = safe_get_text(result)
+        if isinstance(result, dict):
+            segments.extend(window_time_map(w, sr).remap_segments(result.get("segments")))
+        if text:
+            ts = f"[{format_timestamp(w['start'])} - {format_timestamp(w['end'])}] " if show_timestamps else ""
+            results.append(ts + text.strip())
+
+    refined = sum(1 for entry in entries if entry["refined"])
+    st.caption(f"🔁 {refined}/{len(windows)} windows re-transcribed with {backend}-{refine_size}")
+
+    if not results:
+        raise Exception(f"All {len(windows)} chunks failed. Check audio file and model loading.")
+
+    st.session_state.transcript_segments = segments
+    return "\n".join(results)
+
+def start_progressive_transcription(backend):
+    """
+    Load model preview (preset Fast) và model của preset đã chọn, rồi chạy
+    `ProgressiveTranscription` trong thread nền; UI đọc kết quả qua
+    `show_progressive_transcript`.
+    """
+    audio_data = st.session_state.audio_data
+    sr = st.session_state.audio_sr
+    windows = plan_windows()
+
+    preview_model = load_model(backend, preview_size)
+    model = load_model(backend, model_size)
+    transcribe_fn = transcribe_function(backend)
+    make_fn = lambda m, decoding: (lambda y: transcribe_fn(m, y, sr=sr, language="vi", decoding=decoding))
+    if preview_model is None or model is None:
+        raise Exception(f"Failed to load {backend} models ({preview_size} / {model_size})")
+
+    previous = st.session_state.progressive_job
+    if previous is not None:
+        previous.cancel()
+    st.session_state.transcript_text = ""
+    st.session_state.progressive_job = ProgressiveTranscription(
+        windows,
+        lambda i: window_audio(audio_data, sr, windows[i]),
+        make_fn(preview_model, "fast"),
+        make_fn(model, decoding_profile),
+        time_map_fn=lambda w: window_time_map(w, sr),
+    ).start()
+
+@st.fragment(run_every=1.0)
+def show_progressive_transcript():
+    """Hiện transcript đang chạy; khi xong thì lưu vào session state như các mode khác."""
+    job = st.session_state.progressive_job
+    if job is None:
+        return
+    snap = job.snapshot()
+    total = max(1, snap["total"])
+    st.progress(
+        snap["refined"] / total,
+        text=f"Bản nháp {snap['previewed']}/{snap['total']} · Bản chính xác {snap['refined']}/{snap['total']}",
+    )
+    if job.first_text_at is not None:
+        st.caption(f"⏱️ Text đầu tiên sau {job.first_text_at - job.started_at:.1f}s")
+    st.text_area(
+        "Live transcript",
+        format_chunks(snap["chunks"], format_timestamp, show_timestamps),
+        height=300,
+        disabled=True,
+    )
+
+    stop = st.button("⏹️ Dừng cập nhật (giữ bản hiện tại)")
+    if stop:
+        job.cancel()
+    if not (snap["done"] or stop):
+        return
+
+    chunks = job.snapshot()["chunks"]
+    st.session_state.transcript_text = format_chunks(chunks, format_timestamp, show_timestamps, pending_text="")
+    st.session_state.transcript_segments = [seg for chunk in chunks for seg in chunk["segments"]]
+    st.session_state.progressive_job = None
+    for error in job.errors[:3]:
+        st.warning(f"⚠️ {error}")
+    st.rerun()
+
 
 if st.button("🚀 Start Transcription", type="primary", use_container_width=True):
     if not is_available:
@@ -273,22 +446,25 @@ if st.button("🚀 Start Transcription", type="primary", use_container_width=Tru
 
     with st.spinner("Running ASR..."):
         try:
-            if selected_model_id == "whisper":
-                model, device = load_whisper_model(model_size)
-                if model is None:
-                    st.error("❌ Không thể load Whisper model. Vui lòng kiểm tra lỗi ở trên.")
-                    st.stop()
-                text = run_chunked_transcription(
-                    lambda p: transcribe_audio(model, p, language="vi")
-                )
+            if use_progressive:
+                start_progressive_transcription(selected_model_id)
+                st.rerun()
 
-            elif selected_model_id == "phowhisper":
-                model = load_phowhisper_model(model_size)
+            if cascade_presets and selected_model_id in SUPPORTED_BACKENDS:
+                text = run_cascade_transcription(selected_model_id)
+
+            elif num_workers > 1 and selected_model_id in SUPPORTED_BACKENDS:
+                st.caption(f"⚙️ {num_workers} worker processes × {threads_per_worker} threads")
+                text = run_parallel_chunked_transcription(selected_model_id, model_size)
+
+            elif selected_model_id in SUPPORTED_BACKENDS:
+                model = load_model(selected_model_id, model_size)
                 if model is None:
-                    st.error("❌ Không thể load PhoWhisper model. Vui lòng kiểm tra lỗi ở trên.")
+                    st.error(f"❌ Không thể load {model_info['name']} model. Vui lòng kiểm tra lỗi ở trên.")
                     st.stop()
+                transcribe_fn = transcribe_function(selected_model_id)
                 text = run_chunked_transcription(
-                    lambda p: transcribe_phowhisper(model, p, language="vi")
+                    lambda y, sr: transcribe_fn(model, y, sr=sr, language="vi", decoding=decoding_profile)
                 )
             else:
                 st.error("❌ Unsupported model")
@@ -330,6 +506,9 @@ if st.button("🚀 Start Transcription", type="primary", use_container_width=Tru
                 3. Kiểm tra FFmpeg setup
                 """)
 
+if st.session_state.progressive_job is not None:
+    show_progressive_transcript()
+
 # ================== OUTPUT ==================
 if st.session_state.transcript_text:
     st.divider()
@@ -12,6 +12,7 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../.
 from app.components.layout import apply_custom_css
 from core.utils.settings_manager import load_settings, save_settings, load_settings_from_file
 from core.asr.model_registry import get_all_models, get_model_info
+from core.asr.decoding import DEFAULT_MAX_NEW_TOKENS, PROFILE_NAMES
 from config import config
 
 # Apply custom CSS
@@ -90,9 +91,9 @@ with tab1:
         
         precision = st.selectbox(
             "Precision",
-            ["fp32", "fp16", "int8"],
-            index=["fp32", "fp16", "int8"].index(current_settings["model"]["precision"]),
-            help="Model precision (fp32 recommended)"
+            ["fp32", "fp16", "bf16", "int8"],
+            index=["fp32", "fp16", "bf16", "int8"].index(current_settings["model"]["precision"]),
+            help="fp16: CUDA; bf16: autocast trên CPU hỗ trợ bf16 (nếu không sẽ dùng fp32); int8: dynamic quantization trên CPU"
         )
         
         # Chunking settings (moved from Transcription page)
@@ -155,10 +156,63 @@ with tab2:
             help="Số lượng candidates để chọn"
         )
     
+    st.markdown("**Decoding profile**")
+    col3, col4 = st.columns(2)
+    
+    with col3:
+        profile_options = list(PROFILE_NAMES)
+        decoding_profile = st.selectbox(
+            "Default Decoding Profile",
+            profile_options,
+            index=profile_options.index(current_settings["inference"]["decoding_profile"])
+            if current_settings["inference"]["decoding_profile"] in profile_options else 1,
+            help="fast = greedy, không fallback (preset Fast); accurate = beam search/best-of/patience ở trên"
+        )
+        
+        patience = st.number_input(
+            "Patience",
+            min_value=0.5,
+            max_value=5.0,
+            value=float(current_settings["inference"]["patience"]),
+            step=0.5,
+            help="Beam search patience (chỉ Whisper)"
+        )
+    
+    with col4:
+        max_fallbacks = st.number_input(
+            "Max Temperature Fallbacks",
+            min_value=0,
+            max_value=5,
+            value=current_settings["inference"]["max_fallbacks"],
+            help="Số lần tối đa decode lại một window 30s ở temperature cao hơn khi kết quả bị lặp / log-prob thấp"
+        )
+        
+        max_new_tokens = st.number_input(
+            "Max New Tokens",
+            min_value=16,
+            max_value=DEFAULT_MAX_NEW_TOKENS,
+            value=current_settings["inference"]["max_new_tokens"],
+            help="Số token tối đa decode cho mỗi window"
+        )
+        
+        cascade_logprob_threshold = st.number_input(
+            "Cascade Log-prob Threshold",
+            min_value=-3.0,
+            max_value=0.0,
+            value=float(current_settings["inference"]["cascade_logprob_threshold"]),
+            step=0.1,
+            help="Preset Cascade: window có avg log-prob thấp hơn ngưỡng này được transcribe lại bằng model lớn"
+        )
+    
     current_settings["inference"]["beam_size"] = beam_size
     current_settings["inference"]["batch_size"] = batch_size
     current_settings["inference"]["temperature"] = temperature
     current_settings["inference"]["best_of"] = best_of
+    current_settings["inference"]["decoding_profile"] = decoding_profile
+    current_settings["inference"]["patience"] = patience
+    current_settings["inference"]["max_fallbacks"] = max_fallbacks
+    current_settings["inference"]["max_new_tokens"] = max_new_tokens
+    current_settings["inference"]["cascade_logprob_threshold"] = cascade_logprob_threshold
 
 with tab3:
     st.subheader("Resource & Performance Tuning")
@@ -174,6 +228,14 @@ with tab3:
             help="Số lượng threads cho CPU"
         )
         
+        num_workers = st.number_input(
+            "ASR Worker Processes",
+            min_value=1,
+            max_value=16,
+            value=current_settings["resource"]["num_workers"],
+            help="Số process transcribe song song các chunk; threads được chia đều để tổng không vượt quá Number of Threads"
+        )
+        
         max_memory_mb = st.number_input(
             "Max Memory (MB)",
             min_value=512,
@@ -188,10 +250,11 @@ with tab3:
             "Quantization",
             ["none", "int8", "int4"],
             index=["none", "int8", "int4"].index(current_settings["resource"]["quantization"]),
-            help="Model quantization (giảm memory nhưng có thể giảm accuracy)"
+            help="int8: dynamic quantization các lớp Linear khi chạy CPU (giảm memory, nhanh hơn, có thể giảm nhẹ accuracy); int4 chưa hỗ trợ, dùng int8"
         )
     
     current_settings["resource"]["num_threads"] = num_threads
+    current_settings["resource"]["num_workers"] = num_workers
     current_settings["resource"]["max_memory_mb"] = max_memory_mb
     current_settings["resource"]["quantization"] = quantization
 
@@ -207,6 +270,12 @@ with tab4:
             help="Bật VAD để phát hiện speech segments"
         )
         
+        compress_silence = st.checkbox(
+            "Bỏ khoảng lặng trước ASR",
+            value=current_settings["pipeline"]["compress_silence"],
+            help="Không decode các khoảng lặng dài (VAD + guard pad); timestamp vẫn theo thời gian gốc"
+        )
+        
         vad_threshold = st.slider(
             "VAD Threshold",
             min_value=0.0,
@@ -258,6 +327,7 @@ with tab4:
         )
     
     current_settings["pipeline"]["vad_enabled"] = vad_enabled
+    current_settings["pipeline"]["compress_silence"] = compress_silence
     current_settings["pipeline"]["diarization_backend"] = diarization_backend
     current_settings["pipeline"]["max_speakers"] = max_speakers
 
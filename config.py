@@ -28,11 +28,21 @@ class Config:
     API_HOST: str = os.getenv("API_HOST", "0.0.0.0")
     API_PORT: int = int(os.getenv("API_PORT", "8000"))
     API_WORKERS: int = int(os.getenv("API_WORKERS", "1"))
+    # Pre-fork mode (python -m core.api.prefork): also move frozen weights to /dev/shm
+    PREFORK_SHARED_TENSORS: bool = os.getenv("PREFORK_SHARED_TENSORS", "false").lower() == "true"
+    API_JOB_WORKERS: int = int(os.getenv("API_JOB_WORKERS", "1"))  # concurrent transcription jobs
+    API_JOB_QUEUE_SIZE: int = int(os.getenv("API_JOB_QUEUE_SIZE", "8"))  # pending jobs before 429
     
     # Model Configuration
     DEFAULT_WHISPER_MODEL: str = os.getenv("DEFAULT_WHISPER_MODEL", "base")
     DEFAULT_PHOWHISPER_MODEL: str = os.getenv("DEFAULT_PHOWHISPER_MODEL", "medium")
+    # Loaded + warmed up at process start, e.g. "whisper:base,phowhisper:medium" (empty: lazy loading)
+    PRELOAD_MODELS: str = os.getenv("PRELOAD_MODELS", "")
     
+    # Inference daemon (python -m core.asr.daemon): empty = every process loads its own models
+    INFERENCE_SOCKET: str = os.getenv("INFERENCE_SOCKET", "")
+    INFERENCE_DAEMON_WORKERS: int = int(os.getenv("INFERENCE_DAEMON_WORKERS", "1"))  # concurrent decodes
+
     # Cache directories
     TRANSFORMERS_CACHE: str = os.getenv(
         "TRANSFORMERS_CACHE",
@@ -46,6 +56,8 @@ class Config:
         "WHISPER_CACHE",
         str(Path.home() / ".cache" / "whisper")
     )
+    # Converted CTranslate2 checkpoints (<CT2_MODEL_DIR>/<size>, e.g. phowhisper-small)
+    CT2_MODEL_DIR: str = os.getenv("CT2_MODEL_DIR", str(Path.home() / ".cache" / "ct2"))
     
     # Resource Limits
     MAX_AUDIO_DURATION: int = int(os.getenv("MAX_AUDIO_DURATION", "3600"))  # seconds
@@ -63,6 +75,18 @@ class Config:
     # Temporary Files
     TEMP_DIR: Path = Path(os.getenv("TEMP_DIR", str(BASE_DIR / "temp")))
     CLEANUP_TEMP_FILES: bool = os.getenv("CLEANUP_TEMP_FILES", "true").lower() == "true"
+    # Decoded audio for long recordings is memory-mapped from here (use a disk path, not tmpfs)
+    AUDIO_MMAP_DIR: Path = Path(os.getenv("AUDIO_MMAP_DIR", str(TEMP_DIR / "audio_mmap")))
+    # API uploads are streamed here in chunks before decoding (disk, not tmpfs)
+    UPLOAD_DIR: Path = Path(os.getenv("UPLOAD_DIR", str(TEMP_DIR / "uploads")))
+    # Resumable uploads (POST /uploads): max total size and idle time before parts are deleted
+    RESUMABLE_UPLOAD_MAX_SIZE: int = int(os.getenv("RESUMABLE_UPLOAD_MAX_SIZE", "4096"))  # MB
+    RESUMABLE_UPLOAD_TTL: int = int(os.getenv("RESUMABLE_UPLOAD_TTL", "24"))  # hours
+
+    # Transcript cache (content-addressed by audio PCM + model + decoding options)
+    TRANSCRIPT_CACHE_ENABLED: bool = os.getenv("TRANSCRIPT_CACHE_ENABLED", "true").lower() == "true"
+    TRANSCRIPT_CACHE_DIR: Path = Path(os.getenv("TRANSCRIPT_CACHE_DIR", str(TEMP_DIR / "transcript_cache")))
+    TRANSCRIPT_CACHE_MAX_MB: int = int(os.getenv("TRANSCRIPT_CACHE_MAX_MB", "512"))
 
     # Features
     DIARIZATION_ENABLED: bool = os.getenv("DIARIZATION_ENABLED", "false").lower() == "true"  # Optional speaker diarization page
@@ -0,0 +1,163 @@
+"""
+In-process job queue cho API transcription.
+
+Uploads được nhận ngay vào một queue có giới hạn và xử lý bởi một số worker
+thread cố định, nên event loop của FastAPI không bị block trong lúc decode.
+Khi queue đầy, `submit` raise `QueueFullError` để endpoint trả về 429.
+"""
+import logging
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional, Tuple, Type
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+
+class QueueFullError(Exception):
+    """Raised when the job queue has reached its maximum depth."""
+
+
+@dataclass
+class Job:
+    """A transcription job and its lifecycle state."""
+    id: str
+    kwargs: Dict[str, Any] = field(default_factory=dict, repr=False)
+    cleanup: Optional[Callable[[], None]] = field(default=None, repr=False)
+    status: str = JOB_QUEUED
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result: Optional[Dict] = None
+    error: Optional[str] = None
+    client_error: bool = False  # failure caused by the input (HTTP 4xx), not the server
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (JOB_DONE, JOB_FAILED)
+
+    def to_dict(self) -> Dict:
+        """Public status view (no result payload)."""
+        return {
+            "id": self.id,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+        }
+
+
+class JobQueue:
+    """Bounded queue + worker threads running `handler(**job.kwargs)`."""
+
+    def __init__(self, handler: Callable[..., Dict], workers: int = 1,
+                 max_queue_size: int = 8, max_finished_jobs: int = 100,
+                 client_errors: Tuple[Type[Exception], ...] = ()):
+        self.handler = handler
+        self.client_errors = client_errors
+        self.workers = max(1, int(workers))
+        self.max_finished_jobs = max(1, int(max_finished_jobs))
+        self._queue: "queue.Queue[Optional[Job]]" = queue.Queue(maxsize=max(1, int(max_queue_size)))
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def start(self):
+        """Start worker threads (idempotent)."""
+        if self._threads:
+            return
+        for i in range(self.workers):
+            t = threading.Thread(target=self._worker, name=f"transcribe-job-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def stop(self, timeout: float = 5.0):
+        """Ask worker threads to exit after their current job."""
+        for _ in self._threads:
+            try:
+                self._queue.put_nowait(None)
+            except queue.Full:
+                break
+        for t in self._threads:
+            t.join(timeout=timeout)
+        self._threads = []
+
+    def submit(self, cleanup: Optional[Callable[[], None]] = None, cleanup_on_reject: bool = True,
+               **kwargs) -> Job:
+        """Enqueue a job; raise QueueFullError if the queue is at capacity.
+
+        `cleanup` runs after the job finishes (or immediately if it is rejected,
+        unless `cleanup_on_reject` is False and the caller keeps its input for a retry).
+        """
+        job = Job(id=uuid.uuid4().hex, kwargs=kwargs, cleanup=cleanup)
+        with self._lock:
+            self._jobs[job.id] = job
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            with self._lock:
+                self._jobs.pop(job.id, None)
+            if cleanup_on_reject:
+                self._run_cleanup(job)
+            raise QueueFullError(f"Job queue full ({self._queue.maxsize} pending)")
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            running = sum(1 for j in self._jobs.values() if j.status == JOB_RUNNING)
+        return {
+            "workers": self.workers,
+            "queued": self._queue.qsize(),
+            "max_queue_size": self._queue.maxsize,
+            "running": running,
+        }
+
+    def _worker(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            job.status = JOB_RUNNING
+            job.started_at = time.time()
+            try:
+                job.result = self.handler(**job.kwargs)
+                job.status = JOB_DONE
+            except Exception as e:
+                logger.error(f"Job {job.id} failed: {str(e)}", exc_info=True)
+                job.error = str(e)
+                job.client_error = isinstance(e, self.client_errors)
+                job.status = JOB_FAILED
+            finally:
+                job.finished_at = time.time()
+                job.kwargs = {}
+                self._run_cleanup(job)
+                self._prune()
+
+    def _run_cleanup(self, job: Job):
+        if job.cleanup is None:
+            return
+        try:
+            job.cleanup()
+        except Exception as e:
+            logger.warning(f"Cleanup for job {job.id} failed: {str(e)}")
+        job.cleanup = None
+
+    def _prune(self):
+        """Forget the oldest finished jobs beyond `max_finished_jobs`."""
+        with self._lock:
+            finished = [job_id for job_id, j in self._jobs.items() if j.finished]
+            for job_id in finished[:max(0, len(finished) - self.max_finished_jobs)]:
+                del self._jobs[job_id]
@@ -0,0 +1,238 @@
+"""
+Pre-fork serving mode: N API workers sharing one copy of the model weights.
+
+`uvicorn --workers N` spawns fresh interpreters, so every worker loads its own
+copy of each model through `get_model()` and RSS grows N times. Here the
+master process loads `PRELOAD_MODELS` into `server.model_pool` once, freezes
+the weights and only then forks the workers, which all accept on one
+listening socket:
+
+- parameters are put in eval / no-grad mode, so inference never writes to
+  weight pages and they stay shared copy-on-write between the workers;
+- with `PREFORK_SHARED_TENSORS=true` the weights are also moved to shared
+  memory (`share_memory_()`); needs /dev/shm at least as large as the models
+  (Docker: `shm_size`);
+- `gc.freeze()` moves the objects built so far out of the collector's
+  generations, so the workers' GC runs do not touch (and copy) their pages.
+
+The master never runs inference and pins torch to one intra-op / inter-op
+thread before loading (loading and `quantize_dynamic` would otherwise start
+the OpenMP pool, whose threads do not survive fork and can deadlock the
+children); each worker sets its own thread count and warms its models up in
+its own startup. CUDA cannot be used
+across fork and CTranslate2 models own native threads, so GPU devices and
+the ct2 backend are loaded lazily per worker instead.
+
+Run: python -m core.api.prefork  (workers: API_WORKERS)
+"""
+import gc
+import logging
+import os
+import signal
+import socket
+import time
+from typing import Dict, List, Tuple
+
+import uvicorn
+
+from core.api import server
+from core.asr.daemon import get_client
+from core.asr.model_pool import default_device
+from core.asr.preloader import default_preload_pairs
+
+logger = logging.getLogger(__name__)
+
+# Backends whose models are safe to build before fork (pure PyTorch on CPU)
+FORK_SAFE_BACKENDS = ("whisper", "phowhisper")
+
+# A worker dying faster than this after its start is not restarted again (crash loop)
+MIN_WORKER_LIFETIME = 5.0
+
+
+def shared_tensors_enabled() -> bool:
+    try:
+        from config import config
+        return config.PREFORK_SHARED_TENSORS
+    except (ImportError, AttributeError):
+        return os.getenv("PREFORK_SHARED_TENSORS", "false").lower() == "true"
+
+
+def freeze_model(model, share_memory: bool = False):
+    """Make a loaded model read-only for inference so its weights stay shared after fork."""
+    module = getattr(model, "model", model)  # HF pipeline wraps the nn.Module
+    if not hasattr(module, "parameters"):
+        return model
+    module.eval()
+    for param in module.parameters():
+        param.requires_grad_(False)
+    if share_memory:
+        module.share_memory()
+    return model
+
+
+def limit_master_threads():
+    """Keep torch single-threaded in the master so no OpenMP pool exists at fork time."""
+    try:
+        import torch
+    except ImportError:
+        return
+    torch.set_num_threads(1)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError as e:
+        # Only settable once, before any inter-op work
+        logger.warning(f"Could not limit torch inter-op threads before fork: {str(e)}")
+
+
+def worker_threads(workers: int) -> int:
+    """Torch threads per worker: the `resource.num_threads` budget, capped by the CPUs
+    this process may run on (affinity / cpuset), split across the workers."""
+    try:
+        available = len(os.sched_getaffinity(0))
+    except AttributeError:  # macOS
+        available = os.cpu_count() or 1
+    try:
+        from core.utils.settings_manager import load_settings
+        budget = int(load_settings()["resource"].get("num_threads", available))
+    except Exception:
+        budget = available
+    return max(1, min(budget, available) // max(1, workers))
+
+
+def preload_for_fork(pairs: List[Tuple[str, str]], share_memory: bool = False) -> List[Tuple[str, str]]:
+    """Load (no warm-up) and freeze the fork-safe pairs into `server.model_pool`; returns the loaded pairs."""
+    if get_client() is not None:
+        logger.info("Models are served by the inference daemon; nothing to load before fork")
+        return []
+    if default_device() != "cpu":
+        logger.warning("Pre-fork model sharing is CPU only; workers will load their models themselves")
+        return []
+    loaded = []
+    for backend, size in pairs:
+        if backend not in FORK_SAFE_BACKENDS:
+            logger.warning(f"{backend}/{size} is not fork-safe; each worker loads it on its own")
+            continue
+        try:
+            freeze_model(server.model_pool.get(backend, size), share_memory=share_memory)
+            loaded.append((backend, size))
+        except Exception as e:
+            logger.warning(f"Failed to pre-load {backend}/{size} before fork: {str(e)}")
+    return loaded
+
+
+def _bind_socket(host: str, port: int) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _run_worker(sock: socket.socket, threads: int):
+    """Child process: limit torch threads, then serve on the inherited socket."""
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    config = uvicorn.Config(
+        server.app,
+        log_level="info" if not server.IS_PRODUCTION else "warning",
+    )
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def _spawn(sock: socket.socket, threads: int) -> int:
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            _run_worker(sock, threads)
+        except BaseException:
+            logger.exception("API worker crashed")
+            code = 1
+        finally:
+            os._exit(code)
+    return pid
+
+
+def serve(workers: int, host: str = server.API_HOST, port: int = server.API_PORT):
+    """Load + freeze the models, fork `workers` API processes and supervise them."""
+    if not hasattr(os, "fork"):
+        raise RuntimeError("Pre-fork mode needs os.fork (Linux / macOS)")
+    workers = max(1, int(workers))
+
+    try:
+        pairs = default_preload_pairs()
+    except ValueError as e:
+        logger.warning(f"Invalid PRELOAD_MODELS, skipping pre-fork load: {str(e)}")
+        pairs = []
+    if not pairs:
+        pairs = [server.resolve_model_request("whisper", None)]
+    limit_master_threads()
+    loaded = preload_for_fork(pairs, share_memory=shared_tensors_enabled())
+    logger.info(f"Shared before fork: {', '.join(f'{b}/{s}' for b, s in loaded) or 'none'} "
+                f"(~{server.model_pool.memory_mb():.0f} MB)")
+
+    # Workers run the normal startup: they warm up (and load any non-shared) pairs themselves
+    os.environ["PRELOAD_MODELS"] = ",".join(f"{b}:{s}" for b, s in pairs)
+    try:
+        from config import config
+        config.PRELOAD_MODELS = os.environ["PRELOAD_MODELS"]
+    except ImportError:
+        pass
+
+    sock = _bind_socket(host, port)
+    threads = worker_threads(workers)
+    gc.collect()
+    gc.freeze()
+
+    children: Dict[int, float] = {}
+    for _ in range(workers):
+        children[_spawn(sock, threads)] = time.time()
+    logger.info(f"Serving on {host}:{port} with {workers} pre-forked worker(s), {threads} thread(s) each")
+
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        started = children.pop(pid, None)
+        if started is None or stopping:
+            continue
+        if time.time() - started < MIN_WORKER_LIFETIME:
+            logger.error(f"Worker {pid} exited right after start (status {status}); not restarting")
+            continue
+        logger.warning(f"Worker {pid} exited (status {status}); restarting")
+        children[_spawn(sock, threads)] = time.time()
+
+    sock.close()
+
+
+if __name__ == "__main__":
+    try:
+        from config import config
+        num_workers = config.API_WORKERS
+    except ImportError:
+        num_workers = int(os.getenv("API_WORKERS", "1"))
+    serve(num_workers)
@@ -0,0 +1,424 @@
+"""
+Resumable (chunked) uploads cho recording rất dài.
+
+Upload một file nhiều giờ qua `/transcribe` mà đứt giữa chừng thì phải gửi
+lại từ byte 0. Protocol ở đây (endpoint trong `core/api/server.py`):
+
+1. `POST /uploads` tạo upload (tên file, tổng dung lượng nếu biết) -> id;
+2. `PUT /uploads/{id}` gửi từng đoạn với `Content-Range: bytes a-b/total` và
+   header `X-Part-SHA256` (hex); đoạn sai checksum bị từ chối, client gửi lại
+   riêng đoạn đó. `GET /uploads/{id}` cho biết đã nhận tới đâu / còn thiếu gì;
+3. `POST /uploads/{id}/finalize` kiểm tra đủ byte (+ SHA-256 cả file nếu có)
+   rồi đưa file vào job queue như `POST /jobs`.
+
+Dữ liệu nằm trong `UPLOAD_DIR/resumable/<id>/`: đoạn tới đúng thứ tự được ghi
+thẳng vào `data` (prefix liên tục), đoạn tới sớm nằm riêng trong file `.part`
+và được ghép vào khi khoảng trống phía trước đã đủ. Vì prefix luôn liên tục,
+`decode_early=true` cho phép decode (ffmpeg pipe) chạy song song với upload:
+`PrefixReader` đọc `data` và chờ byte mới tới khi upload hoàn tất.
+
+State nằm trong bộ nhớ của process (như job queue): chạy nhiều worker thì
+mọi request của một upload phải tới cùng một worker (sticky session).
+"""
+import hashlib
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_ACTIVE = "active"
+UPLOAD_COMPLETE = "complete"
+UPLOAD_ABORTED = "aborted"
+
+DECODE_RUNNING = "running"
+DECODE_DONE = "done"
+DECODE_FAILED = "failed"
+
+_CONTENT_RANGE_RE = re.compile(r"^\s*bytes\s+(\d+)-(\d+)/(\d+|\*)\s*$")
+_SHA256_RE = re.compile(r"^[0-9a-fA-F]{64}$")
+_READ_BLOCK = 1024 * 1024
+
+
+class UploadNotFoundError(Exception):
+    """Upload id không tồn tại (hoặc đã hết hạn / bị hủy)."""
+
+
+class UploadConflictError(Exception):
+    """Đoạn gửi lên chồng lấn dữ liệu đã có, hoặc upload chưa đủ byte khi finalize."""
+
+
+class UploadSizeError(Exception):
+    """Upload vượt dung lượng tối đa cho resumable upload."""
+
+
+class ChecksumMismatchError(ValueError):
+    """SHA-256 của dữ liệu nhận được không khớp với checksum client gửi."""
+
+
+def parse_content_range(header: Optional[str]) -> Tuple[int, int, Optional[int]]:
+    """'bytes 0-1048575/5000000' -> (start, length, total); total None nếu là '*'."""
+    match = _CONTENT_RANGE_RE.match(header or "")
+    if not match:
+        raise ValueError("Missing or invalid Content-Range header (expected 'bytes start-end/total')")
+    start, end = int(match.group(1)), int(match.group(2))
+    total = None if match.group(3) == "*" else int(match.group(3))
+    if end < start or (total is not None and end >= total):
+        raise ValueError(f"Invalid byte range: {start}-{end}/{match.group(3)}")
+    return start, end - start + 1, total
+
+
+def parse_sha256(value: Optional[str]) -> str:
+    if not value or not _SHA256_RE.match(value.strip()):
+        raise ValueError("Missing or invalid X-Part-SHA256 header (64 hex characters)")
+    return value.strip().lower()
+
+
+class PartWriter:
+    """Nhận body của một đoạn theo chunk; `commit` kiểm tra độ dài + checksum rồi mới ghi nhận."""
+
+    def __init__(self, upload: "ResumableUpload", start: int, length: int, sha256: str):
+        self.upload = upload
+        self.start = start
+        self.length = length
+        self.sha256 = sha256
+        self.received = 0
+        self._hash = hashlib.sha256()
+        # Đoạn nối tiếp prefix: ghi thẳng vào `data`, không cần ghép lại lúc sau
+        self.in_order = start == upload.contiguous
+        # SHA-256 của prefix sau đoạn này (chỉ có một writer nối tiếp prefix tại một thời điểm)
+        self.prefix_hash = upload._hash.copy() if self.in_order else None
+        if self.in_order:
+            self.path = upload.data_path
+            self._file = open(self.path, "r+b")
+            self._file.seek(start)
+            self._file.truncate()
+        else:
+            self.path = upload.dir / f"{start}.part.tmp"
+            self._file = open(self.path, "wb")
+
+    def write(self, chunk: bytes):
+        self.received += len(chunk)
+        if self.received > self.length:
+            raise ValueError(f"Body is longer than the Content-Range ({self.length} bytes)")
+        self._hash.update(chunk)
+        if self.prefix_hash is not None:
+            self.prefix_hash.update(chunk)
+        self._file.write(chunk)
+
+    def commit(self):
+        self._file.close()
+        if self.received != self.length:
+            self.abort()
+            raise ValueError(f"Body has {self.received} bytes, Content-Range says {self.length}")
+        if self._hash.hexdigest() != self.sha256:
+            self.abort()
+            raise ChecksumMismatchError(f"Checksum mismatch for bytes {self.start}-{self.start + self.length - 1}")
+        self.upload._commit_part(self)
+
+    def abort(self):
+        try:
+            self._file.close()
+            if self.in_order:
+                # Bỏ phần chưa verify ở đuôi `data`; prefix hợp lệ giữ nguyên
+                with open(self.path, "r+b") as f:
+                    f.truncate(self.start)
+            else:
+                os.unlink(self.path)
+        except OSError:
+            pass
+        self.upload._release(self.start)
+
+
+class PrefixReader:
+    """File-like (chỉ `read`) trên prefix liên tục của upload; chờ byte mới tới khi upload xong."""
+
+    def __init__(self, upload: "ResumableUpload"):
+        self.upload = upload
+        self.name = upload.filename
+        self._pos = 0
+        self._file = open(upload.data_path, "rb")
+
+    def read(self, n: int = -1) -> bytes:
+        upload = self.upload
+        with upload._cond:
+            while self._pos >= upload.contiguous and upload.state == UPLOAD_ACTIVE:
+                upload._cond.wait()
+            if upload.state == UPLOAD_ABORTED:
+                return b""
+            available = upload.contiguous - self._pos
+        if available <= 0:
+            return b""
+        size = available if n is None or n < 0 else min(n, available)
+        self._file.seek(self._pos)
+        data = self._file.read(size)
+        self._pos += len(data)
+        return data
+
+    def close(self):
+        self._file.close()
+
+
+class ResumableUpload:
+    """State của một upload: prefix liên tục trong `data` + các đoạn tới sớm."""
+
+    def __init__(self, upload_id: str, directory: Path, filename: str, total_size: Optional[int]):
+        self.id = upload_id
+        self.dir = directory
+        self.filename = filename
+        self.total_size = total_size
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+        self.state = UPLOAD_ACTIVE
+        self.job_id: Optional[str] = None  # transcription job using the file (set on finalize)
+        self.data_path = directory / ("data" + (os.path.splitext(filename)[1] or ".wav"))
+        self.contiguous = 0
+        self._hash = hashlib.sha256()  # SHA-256 của prefix, cập nhật khi prefix dài ra
+        self._parts: Dict[int, Tuple[int, str]] = {}  # start -> (length, sha256), đã verify
+        self._pending: Dict[int, int] = {}  # start -> length, đoạn tới sớm chưa ghép vào prefix
+        self._inflight: Dict[int, int] = {}  # start -> length, đang nhận
+        self._cond = threading.Condition()
+        self._decode_thread: Optional[threading.Thread] = None
+        self._decode_state: Optional[str] = None
+        self._decoded = None
+        self._decode_error: Optional[str] = None
+        self.data_path.touch()
+
+    # ---------- parts ----------
+
+    def begin_part(self, start: int, length: int, total: Optional[int], sha256: str,
+                   max_bytes: int) -> Optional[PartWriter]:
+        """Giữ chỗ cho đoạn [start, start+length); None nếu đoạn này đã nhận rồi (retry)."""
+        with self._cond:
+            if self.state != UPLOAD_ACTIVE:
+                raise UploadConflictError(f"Upload is {self.state}")
+            too_large = f"Upload larger than {max_bytes / (1024 * 1024):.0f}MB"
+            if total is not None:
+                if total > max_bytes:
+                    # create() không có size: total của PUT đầu tiên chưa từng được kiểm tra
+                    raise UploadSizeError(too_large)
+                if self.total_size is None:
+                    self.total_size = total
+                elif total != self.total_size:
+                    raise UploadConflictError(f"Total size {total} differs from the declared {self.total_size}")
+            end = start + length
+            if end > max_bytes:
+                raise UploadSizeError(too_large)
+            if self.total_size is not None and end > self.total_size:
+                raise UploadSizeError(f"Range ends after the declared size ({self.total_size} bytes)")
+            if self._parts.get(start) == (length, sha256):
+                return None  # idempotent retry của một đoạn đã có
+            taken = [(a, n) for a, (n, _) in self._parts.items()] + list(self._inflight.items())
+            for other_start, other_length in taken:
+                if start < other_start + other_length and other_start < end:
+                    raise UploadConflictError(
+                        f"Bytes {start}-{end - 1} overlap a part already received or in progress")
+            self._inflight[start] = length
+            self.updated_at = time.time()
+            try:
+                return PartWriter(self, start, length, sha256)
+            except OSError:
+                self._inflight.pop(start, None)
+                raise
+
+    def _release(self, start: int):
+        with self._cond:
+            self._inflight.pop(start, None)
+
+    def _commit_part(self, writer: PartWriter):
+        with self._cond:
+            self._inflight.pop(writer.start, None)
+            self._parts[writer.start] = (writer.length, writer.sha256)
+            self.updated_at = time.time()
+            if writer.in_order:
+                self._hash = writer.prefix_hash
+                self.contiguous = writer.start + writer.length
+            else:
+                os.replace(writer.path, self.dir / f"{writer.start}.part")
+                self._pending[writer.start] = writer.length
+            self._merge_pending()
+            self._cond.notify_all()
+
+    def _merge_pending(self):
+        """Nối các đoạn tới sớm vào `data` khi chúng tiếp giáp prefix (gọi khi giữ `_cond`)."""
+        while self.contiguous in self._pending:
+            start = self.contiguous
+            length = self._pending.pop(start)
+            part_path = self.dir / f"{start}.part"
+            with open(part_path, "rb") as src, open(self.data_path, "r+b") as dst:
+                dst.seek(start)
+                dst.truncate()
+                while True:
+                    block = src.read(_READ_BLOCK)
+                    if not block:
+                        break
+                    self._hash.update(block)
+                    dst.write(block)
+            os.unlink(part_path)
+            self.contiguous = start + length
+
+    def missing_ranges(self) -> List[Tuple[int, int]]:
+        """Các khoảng [start, end] (inclusive) chưa nhận; cần biết tổng dung lượng."""
+        with self._cond:
+            if self.total_size is None:
+                return []
+            covered = sorted((start, start + length) for start, (length, _) in self._parts.items())
+        missing, pos = [], 0
+        for start, end in covered:
+            if start > pos:
+                missing.append((pos, start - 1))
+            pos = max(pos, end)
+        if pos < self.total_size:
+            missing.append((pos, self.total_size - 1))
+        return missing
+
+    # ---------- finalize / abort ----------
+
+    def complete(self, sha256: Optional[str] = None) -> str:
+        """Đánh dấu upload đã đủ byte; trả về path của file hoàn chỉnh."""
+        with self._cond:
+            if self.state == UPLOAD_COMPLETE and self.job_id is None:
+                return str(self.data_path)  # finalize retried (e.g. job queue was full)
+            if self.state != UPLOAD_ACTIVE:
+                raise UploadConflictError(f"Upload is {self.state}")
+            if self._inflight:
+                raise UploadConflictError("Parts are still being uploaded")
+            size = self.total_size if self.total_size is not None else self.contiguous
+            if size == 0 or self.contiguous != size or self._pending:
+                missing = ", ".join(f"{a}-{b}" for a, b in self.missing_ranges()[:5])
+                raise UploadConflictError(f"Upload incomplete ({self.contiguous}/{size} bytes)"
+                                          + (f"; missing {missing}" if missing else ""))
+            if sha256 and self._hash.hexdigest() != sha256.strip().lower():
+                raise ChecksumMismatchError("Checksum mismatch for the assembled file")
+            self.total_size = size
+            self.state = UPLOAD_COMPLETE
+            self._cond.notify_all()
+        return str(self.data_path)
+
+    def abort(self):
+        with self._cond:
+            if self.state == UPLOAD_ACTIVE:
+                self.state = UPLOAD_ABORTED
+            self._cond.notify_all()
+
+    # ---------- early decode ----------
+
+    def start_decode(self, target_sr: int = 16000):
+        """Decode prefix (float32 mono memmap) song song với upload."""
+        if self._decode_thread is not None:
+            return
+        self._decode_state = DECODE_RUNNING
+        self._decode_thread = threading.Thread(target=self._decode, args=(target_sr,),
+                                               name=f"upload-decode-{self.id[:8]}", daemon=True)
+        self._decode_thread.start()
+
+    def _decode(self, target_sr: int):
+        from core.audio.audio_store import decode_to_memmap
+        reader = None
+        try:
+            reader = PrefixReader(self)
+            # Reader không seek được -> decode_to_memmap dùng ffmpeg pipe, đọc theo prefix
+            self._decoded = (target_sr, decode_to_memmap(reader, target_sr=target_sr))
+            self._decode_state = DECODE_DONE
+        except Exception as e:
+            self._decode_error = str(e)
+            self._decode_state = DECODE_FAILED
+            if self.state != UPLOAD_ABORTED:
+                logger.warning(f"Early decode of upload {self.id} failed: {str(e)}")
+        finally:
+            if reader is not None:
+                reader.close()
+
+    def decoded_audio(self, timeout: Optional[float] = None):
+        """(sr, samples) từ early decode, hoặc None nếu không chạy / lỗi (caller tự decode file)."""
+        if self._decode_thread is None:
+            return None
+        self._decode_thread.join(timeout)
+        if self._decode_state != DECODE_DONE or self.state != UPLOAD_COMPLETE:
+            return None
+        return self._decoded
+
+    def release_decoded(self):
+        self._decoded = None
+
+    def to_dict(self) -> Dict:
+        with self._cond:
+            info = {
+                "id": self.id,
+                "filename": self.filename,
+                "status": self.state,
+                "size": self.total_size,
+                "received": sum(length for length, _ in self._parts.values()),
+                "contiguous": self.contiguous,
+                "created_at": self.created_at,
+                "updated_at": self.updated_at,
+                "decode": self._decode_state,
+                "job_id": self.job_id,
+            }
+        info["missing"] = [{"start": a, "end": b} for a, b in self.missing_ranges()]
+        return info
+
+
+class ResumableUploadStore:
+    """Registry các upload của process; upload không hoạt động quá `ttl` giây bị xóa."""
+
+    def __init__(self, root: Path, max_bytes: int, ttl: float):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._uploads: Dict[str, ResumableUpload] = {}
+        self._lock = threading.Lock()
+
+    def create(self, filename: str, total_size: Optional[int] = None) -> ResumableUpload:
+        if total_size is not None and total_size > self.max_bytes:
+            raise UploadSizeError(f"Upload larger than {self.max_bytes / (1024 * 1024):.0f}MB")
+        self.sweep()
+        upload_id = uuid.uuid4().hex
+        directory = self.root / upload_id
+        directory.mkdir(parents=True, exist_ok=True)
+        name = os.path.basename(filename or "") or "upload.wav"
+        upload = ResumableUpload(upload_id, directory, name, total_size)
+        with self._lock:
+            self._uploads[upload_id] = upload
+        return upload
+
+    def get(self, upload_id: str) -> ResumableUpload:
+        with self._lock:
+            upload = self._uploads.get(upload_id)
+        if upload is None:
+            raise UploadNotFoundError(f"Upload {upload_id} not found")
+        return upload
+
+    def remove(self, upload_id: str):
+        """Hủy upload (nếu còn) và xóa dữ liệu trên đĩa."""
+        with self._lock:
+            upload = self._uploads.pop(upload_id, None)
+        if upload is not None:
+            upload.abort()
+            upload.release_decoded()
+        shutil.rmtree(self.root / upload_id, ignore_errors=True)
+
+    def sweep(self):
+        """Xóa upload chưa vào job queue, không hoạt động quá TTL, và thư mục mồ côi (process cũ)."""
+        now = time.time()
+        with self._lock:
+            expired = [u.id for u in self._uploads.values()
+                       if u.job_id is None and now - u.updated_at > self.ttl]
+            known = set(self._uploads)
+        for upload_id in expired:
+            logger.info(f"Upload {upload_id} expired")
+            self.remove(upload_id)
+        if not self.root.exists():
+            return
+        for path in self.root.iterdir():
+            try:
+                if path.name not in known and now - path.stat().st_mtime > self.ttl:
+                    shutil.rmtree(path, ignore_errors=True)
+            except OSError:
+                pass
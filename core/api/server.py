@@ -3,20 +3,21 @@ FastAPI endpoint cho upload audio -> transcript JSON.
 Optional diarization flag (stub/simple segmentation nếu cần).
 Chạy: uvicorn core.api.server:app --host 0.0.0.0 --port 8000
 """
-import tempfile
 import os
 import logging
-from typing import Optional
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, Optional, Tuple
 from pathlib import Path
 
 # Setup FFmpeg từ imageio-ffmpeg TRƯỚC KHI import các module khác
 from core.audio.ffmpeg_setup import ensure_ffmpeg
 ensure_ffmpeg(silent=True)
 
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Request
+from fastapi import FastAPI, Form, HTTPException, Request, WebSocket
 from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
+from starlette.concurrency import run_in_threadpool
 import uvicorn
 
 # Try to import config, fallback to defaults if not available
@@ -27,6 +28,10 @@ try:
     ALLOWED_ORIGINS = config.ALLOWED_ORIGINS.split(",") if config.ALLOWED_ORIGINS != "*" else ["*"]
     MAX_UPLOAD_SIZE = config.MAX_UPLOAD_SIZE * 1024 * 1024  # Convert MB to bytes
     IS_PRODUCTION = config.is_production()
+    JOB_WORKERS = config.API_JOB_WORKERS
+    JOB_QUEUE_SIZE = config.API_JOB_QUEUE_SIZE
+    RESUMABLE_MAX_SIZE = config.RESUMABLE_UPLOAD_MAX_SIZE * 1024 * 1024
+    RESUMABLE_TTL = config.RESUMABLE_UPLOAD_TTL * 3600
 except ImportError:
     # Fallback defaults
     API_HOST = os.getenv("API_HOST", "0.0.0.0")
@@ -34,6 +39,10 @@ except ImportError:
     ALLOWED_ORIGINS = os.getenv("ALLOWED_ORIGINS", "*").split(",") if os.getenv("ALLOWED_ORIGINS", "*") != "*" else ["*"]
     MAX_UPLOAD_SIZE = int(os.getenv("MAX_UPLOAD_SIZE", "200")) * 1024 * 1024
     IS_PRODUCTION = os.getenv("APP_ENV", "development").lower() == "production"
+    JOB_WORKERS = int(os.getenv("API_JOB_WORKERS", "1"))
+    JOB_QUEUE_SIZE = int(os.getenv("API_JOB_QUEUE_SIZE", "8"))
+    RESUMABLE_MAX_SIZE = int(os.getenv("RESUMABLE_UPLOAD_MAX_SIZE", "4096")) * 1024 * 1024
+    RESUMABLE_TTL = int(os.getenv("RESUMABLE_UPLOAD_TTL", "24")) * 3600
 
 # Configure logging
 logging.basicConfig(
@@ -42,8 +51,23 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-from core.asr.transcription_service import load_whisper_model, transcribe_audio
-from core.audio.audio_processor import normalize_audio_to_wav
+from core.asr.backends import load_model, transcribe_function
+from core.asr.daemon import DaemonError, get_client
+from core.asr.model_pool import ModelPool
+from core.asr.preloader import ModelPreloader, default_preload_pairs
+from core.asr.model_registry import get_model_info
+from core.asr.decoding import PROFILE_NAMES
+from core.audio.audio_processor import compress_silence, load_normalized_audio
+from core.audio.probe import AudioProbeError, limit_violation, probe_audio
+from core.utils.settings_manager import load_settings
+from core.audio.vad import IncrementalVAD, clone_silero_vad
+from core.api.jobs import JobQueue, QueueFullError
+from core.api.uploads import UPLOAD_REQUEST_BODY, UploadLimitMiddleware, save_request_stream, upload_dir
+from core.api.resumable import (
+    ChecksumMismatchError, ResumableUploadStore, UploadConflictError, UploadNotFoundError, UploadSizeError,
+    parse_content_range, parse_sha256,
+)
+from core.api.streaming import MAX_SEGMENT_SECONDS, STREAM_ENCODINGS, STREAM_SAMPLE_RATE, run_stream
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -54,12 +78,17 @@ app = FastAPI(
     redoc_url="/redoc" if not IS_PRODUCTION else None,
 )
 
+# Reject oversized upload bodies before they are parsed / spooled.
+# Added before CORS: the last middleware added is the outermost one, so CORS
+# wraps this and its 413 responses still carry the CORS headers
+app.add_middleware(UploadLimitMiddleware, max_bytes=MAX_UPLOAD_SIZE)
+
 # CORS Middleware
 app.add_middleware(
     CORSMiddleware,
     allow_origins=ALLOWED_ORIGINS,
     allow_credentials=True,
-    allow_methods=["GET", "POST", "OPTIONS"],
+    allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
     allow_headers=["*"],
     max_age=3600,
 )
@@ -71,37 +100,75 @@ if IS_PRODUCTION:
         allowed_hosts=["*"]  # Configure with actual domain in production
     )
 
-# Lazy-load model once
-_whisper_model = None
-_whisper_device = None
-_model_loading = False
+# Loaded models, keyed by (backend, size, device, precision), LRU-evicted under MAX_MEMORY_USAGE
+model_pool = ModelPool()
+# Startup load + warm-up of PRELOAD_MODELS into the pool (set in `startup_event`)
+preloader: Optional[ModelPreloader] = None
 
-def get_model():
-    """Get or load Whisper model (thread-safe lazy loading)"""
-    global _whisper_model, _whisper_device, _model_loading
-    
-    if _whisper_model is not None:
-        return _whisper_model
-    
-    if _model_loading:
-        # Model is being loaded, wait a bit
-        import time
-        time.sleep(1)
-        return get_model()
-    
+
+def resolve_model_request(backend: Optional[str], model_size: Optional[str]):
+    """Validate (backend, model_size) from a request; fill in config defaults."""
+    backend = (backend or "whisper").lower()
+    info = get_model_info(backend)
+    if info is None:
+        raise HTTPException(status_code=400, detail=f"Unsupported backend: {backend}")
+    if not model_size:
+        model_size = (
+            os.getenv("DEFAULT_WHISPER_MODEL", "base") if backend == "whisper"
+            else os.getenv(f"DEFAULT_{backend.upper()}_MODEL", info.get("default_size", "medium"))
+        )
+    if model_size not in info.get("sizes", []):
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported model_size '{model_size}' for {backend}. Available: {', '.join(info['sizes'])}"
+        )
+    return backend, model_size
+
+
+def resolve_decoding_request(decoding: Optional[str]) -> Optional[str]:
+    """Validate a decoding profile name from a request (None = settings default)."""
+    if not decoding:
+        return None
+    decoding = decoding.lower()
+    if decoding not in PROFILE_NAMES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported decoding profile '{decoding}'. Available: {', '.join(PROFILE_NAMES)}"
+        )
+    return decoding
+
+
+def get_model(backend: str = "whisper", model_size: Optional[str] = None):
+    """Get or load a model from the pool (thread-safe, single-flight loading)"""
+    backend, model_size = resolve_model_request(backend, model_size)
+    if get_client() is not None:
+        # Thin client: the inference daemon owns the models (INFERENCE_SOCKET)
+        model = load_model(backend, model_size)
+        if model is None:
+            raise RuntimeError(f"Inference daemon could not load {backend}/{model_size}")
+        return model
     try:
-        _model_loading = True
-        logger.info("Loading Whisper model...")
-        # Use config default if available
-        model_size = os.getenv("DEFAULT_WHISPER_MODEL", "base")
-        _whisper_model, _whisper_device = load_whisper_model(model_size)
-        logger.info(f"Whisper model loaded on device: {_whisper_device}")
-        return _whisper_model
+        return model_pool.get(backend, model_size)
     except Exception as e:
         logger.error(f"Error loading model: {str(e)}")
         raise
-    finally:
-        _model_loading = False
+
+
+@contextmanager
+def model_session(backend: str = "whisper", model_size: Optional[str] = None) -> Iterator[object]:
+    """
+    Exclusive use of a pooled model for one decode.
+
+    Whisper models are not thread-safe (KV-cache hooks live on shared modules),
+    so every decode - /transcribe, job workers, WebSocket segments, warm-up -
+    holds the model's inference lock. In client mode the daemon serializes.
+    """
+    backend, model_size = resolve_model_request(backend, model_size)
+    if get_client() is not None:
+        yield get_model(backend, model_size)
+        return
+    with model_pool.use(backend, model_size) as model:
+        yield model
 
 
 @app.get("/")
@@ -115,16 +182,43 @@ async def root():
     }
 
 
+def loaded_models() -> list:
+    """Models held by this process, or by the inference daemon in client mode."""
+    client = get_client()
+    if client is None:
+        return model_pool.loaded()
+    try:
+        return client.status()["models"]
+    except DaemonError as e:
+        logger.warning(str(e))
+        return []
+
+
+def preload_status() -> dict:
+    """Readiness of the startup preload (ready when nothing is configured)."""
+    if preloader is None:
+        return {"ready": True, "models": []}
+    return preloader.status()
+
+
 @app.get("/health")
 async def health():
     """Health check endpoint"""
     try:
-        model = get_model()
-        model_status = "loaded" if model is not None else "not_loaded"
+        preload = preload_status()
+        if preload["ready"]:
+            model = await run_in_threadpool(get_model)
+            model_status = "loaded" if model is not None else "not_loaded"
+        else:
+            # Do not queue behind the preload threads on the default model's load lock
+            model_status = "loading"
         return {
             "status": "ok",
+            "ready": preload["ready"],
             "model": model_status,
-            "device": _whisper_device
+            "models": loaded_models(),
+            "preload": preload["models"],
+            "jobs": job_queue.stats(),
         }
     except Exception as e:
         logger.error(f"Health check failed: {str(e)}")
@@ -134,109 +228,400 @@ async def health():
         )
 
 
-@app.post("/transcribe")
-async def transcribe(
-    file: UploadFile = File(...),
-    diarization: bool = Form(False),
-    language: Optional[str] = Form("vi"),
-    model_size: Optional[str] = Form(None)
-):
+@app.get("/ready")
+async def ready():
+    """Readiness probe: 200 once the preloaded models are loaded and warmed up, 503 before"""
+    preload = preload_status()
+    return JSONResponse(
+        status_code=200 if preload["ready"] else 503,
+        content={"ready": preload["ready"], "preload": preload["models"]}
+    )
+
+
+class AudioDecodeError(ValueError):
+    """Uploaded file could not be decoded as audio."""
+
+
+def _transcribe_file(raw_path: str, language: Optional[str] = "vi", model_size: Optional[str] = None,
+                     backend: str = "whisper", decoding: Optional[str] = None,
+                     predecoded: Optional[Callable] = None) -> dict:
+    """
+    Blocking transcription of an uploaded file (decode -> Whisper / PhoWhisper).
+
+    Runs in a worker thread (threadpool or job queue), never on the event loop.
+    `predecoded` returns the (sr, samples) already decoded while a resumable
+    upload was still arriving, or None to decode `raw_path` here.
+    Raises AudioDecodeError for undecodable input.
     """
-    Transcribe audio file to text
+    # Load (or fail) before decoding the upload
+    if get_model(backend, model_size) is None:
+        raise RuntimeError("Model not loaded")
+
+    audio = predecoded() if predecoded is not None else None
+    if audio is not None:
+        sr, y = audio
+    else:
+        # Normalize to 16kHz mono samples (memory-mapped, no second WAV)
+        try:
+            sr, y = load_normalized_audio(raw_path, mmap=True)
+        except Exception as e:
+            logger.error(f"Audio normalization failed: {str(e)}")
+            raise AudioDecodeError(f"Invalid audio file: {str(e)}")
+
+    transcribe_fn = transcribe_function(backend)
+
+    time_map = None
+    if load_settings()["pipeline"].get("compress_silence", True):
+        # Long pauses are not decoded; timestamps are mapped back to the upload's timeline.
+        # VAD runs before model_session so only the decode holds the model lock.
+        y, time_map = compress_silence(y, sr)
+
+    with model_session(backend, model_size) as model:
+        result = transcribe_fn(model, y, sr=sr, language=language, decoding=decoding)
+    if time_map is not None:
+        result = time_map.remap_result(result)
+    text = result.get("text", "") if result else ""
+
+    return {
+        "text": text,
+        "language": result.get("language") if result else language,
+        "segments": result.get("segments") if isinstance(result, dict) else None,
+        "diarization": None  # diarization stub; có thể tích hợp pyannote nếu có model
+    }
+
+
+async def _save_upload(request: Request) -> Tuple[str, Dict[str, str]]:
+    """Stream the request body's audio to disk (size enforced per chunk); return (path, form fields)."""
+    return await save_request_stream(request, MAX_UPLOAD_SIZE)
+
+
+def _check_audio_limits(raw_path: str) -> dict:
+    """Header-only probe of a saved upload; 413 above MAX_AUDIO_DURATION, 400 if it is not audio."""
+    try:
+        probe = probe_audio(raw_path)
+    except AudioProbeError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid audio file: {str(e)}")
+    violation = limit_violation(probe, max_bytes=MAX_UPLOAD_SIZE)
+    if violation:
+        raise HTTPException(status_code=413, detail=violation)
+    return probe.to_dict()
+
+
+def _remove_file(path: str):
+    try:
+        if os.path.exists(path):
+            os.unlink(path)
+    except Exception as e:
+        logger.warning(f"Failed to cleanup temp file {path}: {str(e)}")
+
+
+# Background job queue: bounded, fixed number of worker threads
+job_queue = JobQueue(
+    _transcribe_file,
+    workers=JOB_WORKERS,
+    max_queue_size=JOB_QUEUE_SIZE,
+    client_errors=(AudioDecodeError,),
+)
+
+# Resumable uploads (create -> PUT byte ranges -> finalize), parts under UPLOAD_DIR/resumable
+upload_store = ResumableUploadStore(upload_dir() / "resumable", max_bytes=RESUMABLE_MAX_SIZE, ttl=RESUMABLE_TTL)
+
+
+@app.post("/transcribe", openapi_extra=UPLOAD_REQUEST_BODY)
+async def transcribe(request: Request):
+    """
+    Transcribe audio file to text (synchronous; prefer POST /jobs for long audio)
     
-    Args:
+    Body: multipart/form-data with the fields below, or the raw audio as an
+    application/octet-stream body with the other fields in the query string.
+    The body is parsed as it streams in and the file is written to disk once.
+
+    Fields:
         file: Audio file (WAV, MP3, FLAC, etc.)
         diarization: Enable speaker diarization (stub implementation)
         language: Language code (default: vi)
-        model_size: Whisper model size (default: from config)
+        model_size: Model size, e.g. tiny for previews, medium for final passes (default: from config)
+        backend: "whisper", "phowhisper" or "ct2" (faster-whisper)
+        decoding: "fast" (greedy, no fallback) or "accurate" (default: from settings)
     
     Returns:
         JSON with transcription results
     """
-    temp_files = []
+    raw_path = None
     
     try:
-        # Check file size
-        file_content = await file.read()
-        file_size = len(file_content)
-        
-        if file_size > MAX_UPLOAD_SIZE:
-            raise HTTPException(
-                status_code=413,
-                detail=f"File too large. Maximum size: {MAX_UPLOAD_SIZE / (1024*1024):.0f}MB"
-            )
-        
-        if file_size == 0:
-            raise HTTPException(status_code=400, detail="Empty file")
-        
-        # Get model
-        model = get_model()
-        if model is None:
-            raise HTTPException(status_code=500, detail="Model not loaded")
+        raw_path, fields = await _save_upload(request)
+        backend, model_size = resolve_model_request(fields.get("backend"), fields.get("model_size"))
+        decoding = resolve_decoding_request(fields.get("decoding"))
+        language = fields.get("language", "vi")
+        # Reject over-long audio from its header before spending CPU/RAM on a full decode
+        await run_in_threadpool(_check_audio_limits, raw_path)
 
-        # Save uploaded file
-        suffix = os.path.splitext(file.filename or "")[-1] or ".wav"
-        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp_in:
-            tmp_in.write(file_content)
-            tmp_in.flush()
-            raw_path = tmp_in.name
-            temp_files.append(raw_path)
-
-        # Normalize to WAV 16kHz mono
-        try:
-            norm_path, sr, y = normalize_audio_to_wav(raw_path)
-            temp_files.append(norm_path)
-        except Exception as e:
-            logger.error(f"Audio normalization failed: {str(e)}")
-            raise HTTPException(status_code=400, detail=f"Invalid audio file: {str(e)}")
-
-        # Transcribe
+        # Decode + ASR in the threadpool so the event loop keeps serving /health etc.
         try:
-            result = transcribe_audio(
-                model, 
-                norm_path, 
-                sr=sr, 
-                language=language, 
-                task="transcribe"
-            )
-            text = result.get("text", "") if result else ""
-        except Exception as e:
+            return await run_in_threadpool(_transcribe_file, raw_path, language, model_size, backend, decoding)
+        except AudioDecodeError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except RuntimeError as e:
             logger.error(f"Transcription failed: {str(e)}")
             raise HTTPException(status_code=500, detail=f"Transcription error: {str(e)}")
-
-        # Cleanup temp files
-        for temp_file in temp_files:
-            try:
-                if os.path.exists(temp_file):
-                    os.unlink(temp_file)
-            except Exception as e:
-                logger.warning(f"Failed to cleanup temp file {temp_file}: {str(e)}")
-
-        return {
-            "text": text,
-            "language": result.get("language") if result else language,
-            "segments": result.get("segments") if isinstance(result, dict) else None,
-            "diarization": None  # diarization stub; có thể tích hợp pyannote nếu có model
-        }
         
     except HTTPException:
         # Re-raise HTTP exceptions
         raise
     except Exception as e:
         logger.error(f"Unexpected error: {str(e)}", exc_info=True)
-        
-        # Cleanup temp files on error
-        for temp_file in temp_files:
-            try:
-                if os.path.exists(temp_file):
-                    os.unlink(temp_file)
-            except Exception:
-                pass
-        
         return JSONResponse(
             status_code=500,
             content={"error": "Internal server error", "message": str(e) if not IS_PRODUCTION else "An error occurred"}
         )
+    finally:
+        if raw_path:
+            _remove_file(raw_path)
+
+
+@app.post("/jobs", status_code=202, openapi_extra=UPLOAD_REQUEST_BODY)
+async def create_job(request: Request):
+    """
+    Queue a transcription job and return immediately with its id.
+
+    Body and fields as for POST /transcribe. Returns 429 when the queue is
+    full (retry later).
+    """
+    raw_path, fields = await _save_upload(request)
+    try:
+        backend, model_size = resolve_model_request(fields.get("backend"), fields.get("model_size"))
+        decoding = resolve_decoding_request(fields.get("decoding"))
+        language = fields.get("language", "vi")
+        await run_in_threadpool(_check_audio_limits, raw_path)
+    except HTTPException:
+        _remove_file(raw_path)
+        raise
+    try:
+        job = job_queue.submit(
+            cleanup=lambda: _remove_file(raw_path),
+            raw_path=raw_path,
+            language=language,
+            model_size=model_size,
+            backend=backend,
+            decoding=decoding,
+        )
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "30"})
+    return job.to_dict()
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Job status: queued | running | done | failed"""
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+
+@app.get("/jobs/{job_id}/result")
+async def get_job_result(job_id: str):
+    """Transcription result of a finished job (409 while still queued/running)."""
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if not job.finished:
+        raise HTTPException(status_code=409, detail=f"Job is {job.status}")
+    if job.error is not None:
+        raise HTTPException(status_code=400 if job.client_error else 500, detail=job.error)
+    return job.result
+
+
+def _get_upload(upload_id: str):
+    try:
+        return upload_store.get(upload_id)
+    except UploadNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
+@app.post("/uploads", status_code=201)
+async def create_upload(
+    filename: str = Form(...),
+    size: Optional[int] = Form(None),
+    decode_early: bool = Form(False)
+):
+    """
+    Start a resumable upload for a large recording.
+
+    Args:
+        filename: Original file name (the extension selects the decoder)
+        size: Total size in bytes, if known (otherwise taken from Content-Range)
+        decode_early: Decode the received prefix while the upload is still running
+
+    Returns:
+        Upload status with its id; send parts with PUT /uploads/{id}
+    """
+    if size is not None and size <= 0:
+        raise HTTPException(status_code=400, detail="Empty file")
+    try:
+        upload = await run_in_threadpool(upload_store.create, filename, size)
+    except UploadSizeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    if decode_early:
+        upload.start_decode()
+    return upload.to_dict()
+
+
+@app.get("/uploads/{upload_id}")
+async def get_upload(upload_id: str):
+    """Received bytes and missing ranges (resume from here after a dropped connection)."""
+    return _get_upload(upload_id).to_dict()
+
+
+@app.put("/uploads/{upload_id}")
+async def upload_part(upload_id: str, request: Request):
+    """
+    Store one byte range of the upload.
+
+    Headers: `Content-Range: bytes start-end/total` (total may be `*`) and
+    `X-Part-SHA256` (hex digest of the body). Parts may arrive in any order;
+    re-sending a part that was already stored is a no-op.
+    """
+    upload = _get_upload(upload_id)
+    try:
+        start, length, total = parse_content_range(request.headers.get("content-range"))
+        checksum = parse_sha256(request.headers.get("x-part-sha256"))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if length > MAX_UPLOAD_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Part too large. Maximum part size: {MAX_UPLOAD_SIZE / (1024*1024):.0f}MB"
+        )
+    try:
+        writer = await run_in_threadpool(upload.begin_part, start, length, total, checksum, RESUMABLE_MAX_SIZE)
+    except UploadSizeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except UploadConflictError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    if writer is not None:
+        try:
+            async for chunk in request.stream():
+                if chunk:
+                    await run_in_threadpool(writer.write, chunk)
+            await run_in_threadpool(writer.commit)
+        except ChecksumMismatchError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+        except ValueError as e:
+            writer.abort()
+            raise HTTPException(status_code=400, detail=str(e))
+        except BaseException:
+            writer.abort()  # client disconnected mid-part: the range can be sent again
+            raise
+    return upload.to_dict()
+
+
+@app.post("/uploads/{upload_id}/finalize", status_code=202)
+async def finalize_upload(
+    upload_id: str,
+    sha256: Optional[str] = Form(None),
+    language: Optional[str] = Form("vi"),
+    model_size: Optional[str] = Form(None),
+    backend: Optional[str] = Form("whisper"),
+    decoding: Optional[str] = Form(None)
+):
+    """
+    Check that every byte arrived (and the whole-file SHA-256, if given), then
+    queue the transcription like POST /jobs.
+
+    Returns 409 with the missing ranges while the upload is incomplete.
+    """
+    upload = _get_upload(upload_id)
+    backend, model_size = resolve_model_request(backend, model_size)
+    decoding = resolve_decoding_request(decoding)
+    try:
+        raw_path = await run_in_threadpool(upload.complete, sha256)
+    except UploadConflictError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ChecksumMismatchError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    try:
+        await run_in_threadpool(_check_audio_limits, raw_path)
+    except HTTPException:
+        upload_store.remove(upload_id)
+        raise
+    try:
+        job = job_queue.submit(
+            cleanup=lambda: upload_store.remove(upload_id),
+            raw_path=raw_path,
+            language=language,
+            model_size=model_size,
+            backend=backend,
+            decoding=decoding,
+            predecoded=upload.decoded_audio,
+            cleanup_on_reject=False,  # keep the assembled file: finalize can be retried
+        )
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "30"})
+    upload.job_id = job.id
+    return job.to_dict()
+
+
+@app.delete("/uploads/{upload_id}", status_code=204)
+async def delete_upload(upload_id: str):
+    """Abort an upload and delete its parts (409 once it has been queued for transcription)."""
+    if _get_upload(upload_id).job_id is not None:
+        raise HTTPException(status_code=409, detail="Upload is being transcribed")
+    await run_in_threadpool(upload_store.remove, upload_id)
+
+
+@app.websocket("/ws/transcribe")
+async def transcribe_stream(websocket: WebSocket):
+    """
+    Realtime transcription (live captions) qua WebSocket.
+
+    Query params: language (vi), backend, model_size, encoding (pcm_s16le |
+    pcm_f32le), vad_threshold (0.5), partial_interval (giây, 1.0).
+    Client gửi PCM 16kHz mono dạng binary frames; protocol chi tiết xem
+    `core/api/streaming.py`.
+    """
+    await websocket.accept()
+    params = websocket.query_params
+    language = params.get("language", "vi")
+    encoding = params.get("encoding", "pcm_s16le")
+    try:
+        backend, model_size = resolve_model_request(params.get("backend"), params.get("model_size"))
+        if encoding not in STREAM_ENCODINGS:
+            raise HTTPException(status_code=400, detail=f"Unsupported encoding: {encoding}")
+        if int(params.get("sample_rate", STREAM_SAMPLE_RATE)) != STREAM_SAMPLE_RATE:
+            raise HTTPException(status_code=400, detail=f"Only {STREAM_SAMPLE_RATE} Hz PCM is supported")
+        vad_threshold = float(params.get("vad_threshold", 0.5))
+        partial_interval = float(params.get("partial_interval", 1.0))
+    except (HTTPException, ValueError) as e:
+        await websocket.send_json({"type": "error", "message": getattr(e, "detail", str(e))})
+        await websocket.close(code=1008)
+        return
+
+    try:
+        model = await run_in_threadpool(get_model, backend, model_size)
+        vad_model = await run_in_threadpool(clone_silero_vad)
+    except Exception as e:
+        logger.error(f"Streaming setup failed: {str(e)}")
+        model, vad_model = None, None
+    if model is None or vad_model is None:
+        await websocket.send_json({"type": "error", "message": "ASR or VAD model not available"})
+        await websocket.close(code=1011)
+        return
+
+    vad = IncrementalVAD(vad_model, sr=STREAM_SAMPLE_RATE, threshold=vad_threshold,
+                         max_speech_s=MAX_SEGMENT_SECONDS)
+
+    backend_transcribe = transcribe_function(backend)
+
+    def transcribe_fn(samples):
+        # Lock per segment, not per connection: other requests interleave between segments.
+        # Live audio hiếm khi lặp lại -> không ghi transcript cache
+        with model_session(backend, model_size) as locked:
+            return backend_transcribe(locked, samples, sr=STREAM_SAMPLE_RATE, language=language, use_cache=False)
+
+    await run_stream(websocket, transcribe_fn, vad, encoding=encoding, partial_interval=partial_interval)
 
 
 @app.on_event("startup")
@@ -245,23 +630,41 @@ async def startup_event():
     logger.info("Starting Vietnamese STT API...")
     logger.info(f"Environment: {'Production' if IS_PRODUCTION else 'Development'}")
     logger.info(f"Max upload size: {MAX_UPLOAD_SIZE / (1024*1024):.0f}MB")
+    job_queue.start()
+    logger.info(f"Job queue: {JOB_WORKERS} worker(s), max {JOB_QUEUE_SIZE} pending")
     
-    # Pre-load model if in production
-    if IS_PRODUCTION:
-        try:
-            get_model()
-            logger.info("Model pre-loaded successfully")
-        except Exception as e:
-            logger.warning(f"Failed to pre-load model: {str(e)}")
+    # Load + warm up PRELOAD_MODELS in parallel threads; production defaults to the default model
+    global preloader
+    try:
+        pairs = default_preload_pairs()
+        if not pairs and IS_PRODUCTION:
+            pairs = [resolve_model_request("whisper", None)]
+    except (ValueError, HTTPException) as e:
+        logger.warning(f"Invalid PRELOAD_MODELS, skipping preload: {str(e)}")
+        pairs = []
+    if pairs:
+        preloader = ModelPreloader(pairs, load_fn=get_model, use_fn=model_session).start()
+        logger.info(f"Preloading {', '.join(f'{b}/{s}' for b, s in pairs)}...")
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Cleanup on shutdown"""
     logger.info("Shutting down Vietnamese STT API...")
+    job_queue.stop()
 
 
 if __name__ == "__main__":
+    try:
+        from config import config
+        api_workers = config.API_WORKERS
+    except ImportError:
+        api_workers = int(os.getenv("API_WORKERS", "1"))
+    if api_workers > 1 and hasattr(os, "fork"):
+        # Workers share one copy of the model weights (see core.api.prefork)
+        from core.api.prefork import serve
+        serve(api_workers, host=API_HOST, port=API_PORT)
+        raise SystemExit(0)
     uvicorn.run(
         "core.api.server:app",
         host=API_HOST,
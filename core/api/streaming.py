@@ -0,0 +1,213 @@
+"""
+Realtime transcription qua WebSocket (live captions).
+
+Client gửi PCM 16kHz mono (binary frames, mặc định int16 little-endian) và
+nhận lại JSON:
+
+- {"type": "ready", "sample_rate": 16000, "encoding": "pcm_s16le"}
+- {"type": "partial", "start", "end", "text"}: giả thuyết tạm cho đoạn nói
+  đang mở, cập nhật khoảng mỗi `partial_interval` giây
+- {"type": "final", "start", "end", "text", "segments"}: đoạn nói đã đóng
+  (VAD phát hiện im lặng), timestamp tính theo giây từ đầu stream
+- {"type": "error", "message"} / {"type": "done"}
+
+Gửi text frame {"type": "stop"} để flush đoạn đang mở và kết thúc phiên.
+
+VAD chạy incremental (Silero, mỗi kết nối một bản copy của model cache trong
+`vad.load_silero_vad`). Decode chạy trong threadpool; final được xử lý theo
+thứ tự và không bao giờ bị bỏ, còn partial chỉ giữ bản mới nhất nên khi ASR
+chậm hơn realtime thì độ trễ không tích lũy.
+"""
+import asyncio
+import json
+import logging
+from collections import deque
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from starlette.concurrency import run_in_threadpool
+from starlette.websockets import WebSocket, WebSocketDisconnect
+
+from core.audio.vad import IncrementalVAD
+
+logger = logging.getLogger(__name__)
+
+STREAM_SAMPLE_RATE = 16000
+STREAM_ENCODINGS = {"pcm_s16le": "<i2", "pcm_f32le": "<f4"}
+
+# Whisper nhìn tối đa 30s audio mỗi lần decode
+MAX_SEGMENT_SECONDS = 30.0
+
+# samples float32 16kHz -> ASR result dict (format của transcribe_audio) hoặc None
+TranscribeFn = Callable[[np.ndarray], Optional[Dict]]
+
+
+def decode_pcm(data: bytes, encoding: str = "pcm_s16le") -> np.ndarray:
+    """Bytes PCM -> float32 [-1, 1]; độ dài phải là bội số của sample width."""
+    dtype = STREAM_ENCODINGS[encoding]
+    if len(data) % np.dtype(dtype).itemsize:
+        raise ValueError(f"PCM payload of {len(data)} bytes is not aligned to {encoding} samples")
+    samples = np.frombuffer(data, dtype=dtype)
+    if dtype == "<i2":
+        return samples.astype(np.float32) / 32768.0
+    return samples.astype(np.float32)
+
+
+class StreamingSession:
+    """Buffer audio của một stream và quyết định khi nào cần decode.
+
+    Không gọi ASR trực tiếp: `feed`/`flush` trả về các request
+    ("final" | "partial", start_s, end_s, samples) để caller decode.
+    """
+
+    def __init__(self, vad: IncrementalVAD, partial_interval: float = 1.0, encoding: str = "pcm_s16le"):
+        self.vad = vad
+        self.sr = vad.sr
+        self.partial_interval = partial_interval
+        self.encoding = encoding
+        self._sample_width = np.dtype(STREAM_ENCODINGS[encoding]).itemsize
+        self._remainder = b""     # byte lẻ cuối frame trước (chưa đủ một sample)
+        self._buffer = np.zeros(self.sr * 4, dtype=np.float32)
+        self._buffer_len = 0
+        self._buffer_offset = 0   # sample index (trong stream) của _buffer[0]
+        self._last_partial_end = 0.0
+
+    def feed_bytes(self, data: bytes) -> List[Tuple[str, float, float, np.ndarray]]:
+        """Như `feed` nhưng nhận bytes PCM thô.
+
+        Frame WebSocket không nhất thiết cắt đúng biên sample: phần dư được giữ
+        lại và ghép vào đầu frame sau để các sample int16 phía sau không bị lệch.
+        """
+        data = self._remainder + data
+        usable = len(data) - (len(data) % self._sample_width)
+        self._remainder = data[usable:]
+        return self.feed(decode_pcm(data[:usable], self.encoding))
+
+    def feed(self, samples: np.ndarray) -> List[Tuple[str, float, float, np.ndarray]]:
+        self._append(samples)
+        requests = [("final", seg["start"], seg["end"], self._slice(seg["start"], seg["end"]))
+                    for seg in self.vad.feed(samples)]
+
+        start = self.vad.speech_start
+        now = self.vad.position
+        if start is not None and now - max(start, self._last_partial_end) >= self.partial_interval:
+            requests.append(("partial", start, now, self._slice(start, now)))
+            self._last_partial_end = now
+        self._trim()
+        return requests
+
+    def flush(self) -> List[Tuple[str, float, float, np.ndarray]]:
+        requests = [("final", seg["start"], seg["end"], self._slice(seg["start"], seg["end"]))
+                    for seg in self.vad.flush()]
+        self._buffer_len = 0
+        return requests
+
+    def _append(self, samples: np.ndarray):
+        needed = self._buffer_len + len(samples)
+        if needed > len(self._buffer):
+            grown = np.zeros(max(needed, 2 * len(self._buffer)), dtype=np.float32)
+            grown[:self._buffer_len] = self._buffer[:self._buffer_len]
+            self._buffer = grown
+        self._buffer[self._buffer_len:needed] = samples
+        self._buffer_len = needed
+
+    def _slice(self, start: float, end: float) -> np.ndarray:
+        lo = max(0, int(start * self.sr) - self._buffer_offset)
+        hi = min(self._buffer_len, int(end * self.sr) - self._buffer_offset)
+        return self._buffer[lo:max(lo, hi)].copy()
+
+    def _trim(self):
+        """Bỏ audio không còn thuộc đoạn nói nào (giữ lại phần pad trước speech)."""
+        keep_from = self.vad.speech_start
+        if keep_from is None:
+            keep_from = max(0.0, self.vad.position - self.vad.speech_pad_samples / self.sr)
+        drop = int(keep_from * self.sr) - self._buffer_offset
+        if drop <= 0:
+            return
+        drop = min(drop, self._buffer_len)
+        remaining = self._buffer_len - drop
+        self._buffer[:remaining] = self._buffer[drop:self._buffer_len]
+        self._buffer_len = remaining
+        self._buffer_offset += drop
+
+
+def _message(kind: str, start: float, end: float, result: Optional[Dict]) -> Dict:
+    text = (result or {}).get("text", "").strip()
+    message = {"type": kind, "start": round(start, 3), "end": round(end, 3), "text": text}
+    if kind == "final":
+        message["segments"] = [
+            {**seg, "start": round(start + float(seg.get("start", 0.0)), 3),
+             "end": round(start + float(seg.get("end", end - start)), 3)}
+            for seg in (result or {}).get("segments") or []
+        ]
+    return message
+
+
+async def run_stream(websocket: WebSocket, transcribe_fn: TranscribeFn, vad: IncrementalVAD,
+                     encoding: str = "pcm_s16le", partial_interval: float = 1.0):
+    """Phục vụ một kết nối WebSocket đã được accept cho tới khi client stop/disconnect."""
+    session = StreamingSession(vad, partial_interval=partial_interval, encoding=encoding)
+    finals = deque()
+    latest_partial = [None]
+    wake = asyncio.Event()
+    closed = [False]
+
+    async def decode_loop():
+        while True:
+            await wake.wait()
+            wake.clear()
+            while finals or latest_partial[0] is not None:
+                if finals:
+                    kind, start, end, samples = finals.popleft()
+                else:
+                    kind, start, end, samples = latest_partial[0]
+                    latest_partial[0] = None
+                try:
+                    result = await run_in_threadpool(transcribe_fn, samples) if len(samples) else None
+                except Exception as e:
+                    logger.error(f"Streaming decode failed: {str(e)}", exc_info=True)
+                    result = None
+                if kind == "partial" and finals:
+                    continue  # segment closed meanwhile; its final supersedes this partial
+                await websocket.send_json(_message(kind, start, end, result))
+            if closed[0]:
+                return
+
+    def enqueue(requests):
+        for request in requests:
+            if request[0] == "final":
+                finals.append(request)
+                latest_partial[0] = None
+            else:
+                latest_partial[0] = request
+        if requests:
+            wake.set()
+
+    decoder = asyncio.create_task(decode_loop())
+    await websocket.send_json({"type": "ready", "sample_rate": STREAM_SAMPLE_RATE, "encoding": encoding})
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                # Client đã đi: không còn ai nhận kết quả, bỏ phần chưa decode
+                return
+            if message.get("bytes"):
+                enqueue(await run_in_threadpool(session.feed_bytes, message["bytes"]))
+            elif message.get("text"):
+                try:
+                    command = json.loads(message["text"]).get("type")
+                except (ValueError, AttributeError):
+                    command = message["text"].strip()
+                if command in ("stop", "eof"):
+                    break
+        enqueue(session.flush())
+        closed[0] = True
+        wake.set()
+        await decoder
+        await websocket.send_json({"type": "done"})
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        if not decoder.done():
+            decoder.cancel()
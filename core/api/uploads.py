@@ -0,0 +1,308 @@
+"""
+Ghi upload của API xuống đĩa theo từng chunk.
+
+`await file.read()` nạp cả file vào RAM rồi mới ghi ra file tạm, còn
+`UploadFile` thì Starlette spool cả body ra file tạm trước khi handler chạy,
+nên copy thêm một lần nữa là ghi đĩa hai lần. Ở đây:
+
+- `UploadLimitMiddleware` (ASGI) từ chối body vượt `MAX_UPLOAD_SIZE` ngay khi
+  thấy `Content-Length`, hoặc ngay khi số byte nhận được vượt giới hạn (chunked
+  transfer);
+- `save_request_stream` đọc thẳng `request.stream()`: body
+  `multipart/form-data` được parse streaming (python-multipart), part file ghi
+  thẳng vào `UPLOAD_DIR`; body `application/octet-stream` / `audio/*` là chính
+  file audio. Giới hạn được kiểm tra sau mỗi chunk.
+
+Path trả về được đưa thẳng cho decoder (ffmpeg đọc file, không có bản WAV trung gian).
+"""
+import json
+import logging
+import os
+import tempfile
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+
+from fastapi import HTTPException, Request
+from starlette.concurrency import run_in_threadpool
+
+try:
+    import python_multipart as multipart
+    from python_multipart.multipart import parse_options_header
+except ModuleNotFoundError:  # python-multipart < 0.0.13
+    import multipart
+    from multipart.multipart import parse_options_header
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+# Boundary + các form field nhỏ (language, backend, ...) ngoài phần file
+MULTIPART_OVERHEAD = 64 * 1024
+# Content-Type coi body là file audio thô (các field khác lấy từ query string)
+RAW_UPLOAD_TYPES = ("application/octet-stream", "audio/")
+
+
+# OpenAPI body của các route upload (handler đọc `request.stream()` nên FastAPI không tự sinh)
+UPLOAD_REQUEST_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": ["file"],
+                    "properties": {
+                        "file": {"type": "string", "format": "binary"},
+                        "language": {"type": "string", "default": "vi"},
+                        "model_size": {"type": "string"},
+                        "backend": {"type": "string", "default": "whisper"},
+                        "decoding": {"type": "string"},
+                        "diarization": {"type": "boolean", "default": False},
+                    },
+                }
+            },
+            "application/octet-stream": {"schema": {"type": "string", "format": "binary"}},
+        },
+    }
+}
+
+
+class UploadTooLargeError(HTTPException):
+    """Upload vượt MAX_UPLOAD_SIZE (413)."""
+
+    def __init__(self, max_bytes: int):
+        super().__init__(
+            status_code=413,
+            detail=f"File too large. Maximum size: {max_bytes / (1024 * 1024):.0f}MB",
+        )
+
+
+def upload_dir() -> Path:
+    """Thư mục chứa upload đang xử lý (`Config.UPLOAD_DIR`, trên đĩa chứ không phải tmpfs)."""
+    try:
+        from config import config
+        path = Path(config.UPLOAD_DIR)
+    except (ImportError, AttributeError):
+        path = Path(tempfile.gettempdir()) / "uploads"
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+class _StreamingForm:
+    """Callbacks cho `multipart.MultipartParser`.
+
+    Part `file_field` (có filename) được ghi thẳng vào `out`; các field khác
+    là text nhỏ, giữ trong `fields`. Part file thứ hai trở đi bị bỏ qua.
+    """
+
+    def __init__(self, out, file_field: str, max_bytes: int):
+        self.out = out
+        self.file_field = file_field
+        self.max_bytes = max_bytes
+        self.fields: Dict[str, str] = {}
+        self.filename: Optional[str] = None
+        self.written = 0
+        self._field_bytes = 0
+        self._headers: Dict[bytes, bytes] = {}
+        self._header_field = b""
+        self._header_value = b""
+        self._name: Optional[str] = None
+        self._value: Optional[bytearray] = None
+        self._to_file = False
+
+    def callbacks(self) -> Dict:
+        return {
+            "on_part_begin": self.on_part_begin,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+        }
+
+    def on_part_begin(self):
+        self._headers = {}
+        self._name, self._value, self._to_file = None, None, False
+
+    def on_header_field(self, data: bytes, start: int, end: int):
+        self._header_field += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def on_header_end(self):
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field, self._header_value = b"", b""
+
+    def on_headers_finished(self):
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        name = options.get(b"name", b"").decode("utf-8", "replace")
+        filename = options.get(b"filename")
+        if name == self.file_field and filename is not None:
+            if self.filename is None:
+                self.filename = filename.decode("utf-8", "replace")
+                self._to_file = True
+            return  # part file thừa: bỏ
+        self._name, self._value = name, bytearray()
+
+    def on_part_data(self, data: bytes, start: int, end: int):
+        size = end - start
+        if self._to_file:
+            self.written += size
+            if self.written > self.max_bytes:
+                raise UploadTooLargeError(self.max_bytes)
+            self.out.write(data[start:end])
+        elif self._value is not None:
+            self._field_bytes += size
+            if self._field_bytes > MULTIPART_OVERHEAD:
+                raise HTTPException(status_code=413, detail="Form fields too large")
+            self._value += data[start:end]
+
+    def on_part_end(self):
+        if self._value is not None and self._name:
+            self.fields[self._name] = self._value.decode("utf-8", "replace")
+        self._name, self._value, self._to_file = None, None, False
+
+
+async def save_request_stream(request: Request, max_bytes: int, file_field: str = "file"
+                              ) -> Tuple[str, Dict[str, str]]:
+    """
+    Ghi file upload trong body của `request` ra đĩa; trả về (path, fields).
+
+    - `multipart/form-data`: part `file_field` ghi thẳng xuống đĩa, `fields`
+      là các form field còn lại;
+    - `application/octet-stream` / `audio/*`: cả body là file, `fields` lấy
+      từ query string (`filename` tùy chọn, dùng cho đuôi file).
+
+    Raise UploadTooLargeError ngay khi vượt `max_bytes` (file dở dang bị xóa),
+    HTTPException 400 nếu thiếu file / upload rỗng, 415 nếu Content-Type khác.
+    """
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    content_type = content_type.decode("latin-1").lower()
+    if content_type == "multipart/form-data":
+        boundary = params.get(b"boundary")
+        if not boundary:
+            raise HTTPException(status_code=400, detail="Missing multipart boundary")
+        raw = False
+    elif content_type.startswith(RAW_UPLOAD_TYPES):
+        raw = True
+    else:
+        raise HTTPException(
+            status_code=415,
+            detail="Send the audio as multipart/form-data (field 'file') or as an application/octet-stream body",
+        )
+
+    fd, path = tempfile.mkstemp(dir=str(upload_dir()))
+    try:
+        with os.fdopen(fd, "wb") as out:
+            if raw:
+                fields = dict(request.query_params)
+                filename = fields.get("filename")
+                written = 0
+                async for chunk in request.stream():
+                    written += len(chunk)
+                    if written > max_bytes:
+                        raise UploadTooLargeError(max_bytes)
+                    if chunk:
+                        await run_in_threadpool(out.write, chunk)
+            else:
+                form = _StreamingForm(out, file_field, max_bytes)
+                parser = multipart.MultipartParser(boundary, form.callbacks())
+                try:
+                    async for chunk in request.stream():
+                        if chunk:
+                            # Callbacks ghi part file xuống đĩa -> chạy ngoài event loop
+                            await run_in_threadpool(parser.write, chunk)
+                    parser.finalize()
+                except ValueError as e:  # MultipartParseError
+                    raise HTTPException(status_code=400, detail=f"Malformed multipart body: {str(e)}")
+                if form.filename is None:
+                    raise HTTPException(status_code=400, detail=f"Missing form file field '{file_field}'")
+                fields, filename, written = form.fields, form.filename, form.written
+        if written == 0:
+            raise HTTPException(status_code=400, detail="Empty file")
+    except BaseException:
+        _unlink(path)
+        raise
+
+    # Giữ đuôi file gốc (fallback librosa / soundfile đoán format theo đuôi)
+    suffix = os.path.splitext(filename or "")[-1] or ".wav"
+    final_path = path + suffix
+    os.replace(path, final_path)
+    return final_path, fields
+
+
+def _unlink(path: str):
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+
+
+class UploadLimitMiddleware:
+    """
+    ASGI middleware giới hạn kích thước body cho các route upload.
+
+    Request có `Content-Length` quá lớn bị trả 413 mà không đọc body; với
+    chunked transfer, số byte được đếm khi stream vào và request bị cắt ngay
+    khi vượt giới hạn.
+    """
+
+    def __init__(self, app, max_bytes: int, paths: Iterable[str] = ("/transcribe", "/jobs")):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.limit = max_bytes + MULTIPART_OVERHEAD
+        self.paths = tuple(paths)
+
+    def _applies(self, scope) -> bool:
+        return (
+            scope["type"] == "http"
+            and scope["method"] in ("POST", "PUT")
+            and scope["path"].startswith(self.paths)
+        )
+
+    async def __call__(self, scope, receive, send):
+        if not self._applies(scope):
+            await self.app(scope, receive, send)
+            return
+
+        length = dict(scope["headers"]).get(b"content-length")
+        if length is not None and length.isdigit() and int(length) > self.limit:
+            await self._reject(send)
+            return
+
+        received = 0
+        started = False
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.limit:
+                    raise UploadTooLargeError(self.max_bytes)
+            return message
+
+        async def tracked_send(message):
+            nonlocal started
+            if message["type"] == "http.response.start":
+                started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracked_send)
+        except UploadTooLargeError:
+            # Chỉ tới đây nếu exception không được FastAPI chuyển thành response
+            if started:
+                raise
+            await self._reject(send)
+
+    async def _reject(self, send):
+        error = UploadTooLargeError(self.max_bytes)
+        body = json.dumps({"detail": error.detail}).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
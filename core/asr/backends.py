@@ -0,0 +1,109 @@
+"""Common entry points over the ASR engines.
+
+Callers (pages, API, worker pools) do not branch on the backend: they get the
+raw model from `load_model(backend, size)` and the matching service function
+from `transcribe_function(backend)`, then call
+`fn(model, audio, sr=..., language=..., decoding=..., use_cache=...)`.
+
+- "whisper": openai-whisper (PyTorch), `transcription_service`;
+- "phowhisper": transformers pipeline, `phowhisper_service`;
+- "ct2": CTranslate2 / faster-whisper with int8 CPU compute, `ct2_service`
+  (standard Whisper sizes or converted Whisper / PhoWhisper checkpoints).
+
+`transcribe_function(backend, scores=True)` prefers a decode that returns
+per-window log-probs (see `core.asr.cascade`); not every such decode takes
+`use_cache`, check `accepts_use_cache` before passing it.
+
+The service modules are imported lazily, so selecting one backend does not
+import the others' frameworks. With `INFERENCE_SOCKET` set, models live in
+the inference daemon (`core.asr.daemon`): `load_model` returns a
+`RemoteModel` handle and `transcribe_function` forwards to the daemon.
+"""
+import logging
+from typing import Callable, Dict, NamedTuple, Optional
+
+from core.asr.daemon import DaemonError, get_client, remote_transcribe_function
+
+logger = logging.getLogger(__name__)
+
+
+class _Service(NamedTuple):
+    load: Callable                        # (size, precision=None) -> model
+    transcribe: Callable                  # (model, audio, ..., use_cache=True, ...) -> result
+    transcribe_scored: Optional[Callable] = None  # same, with per-window log-probs
+    scored_accepts_cache: bool = False    # `transcribe_scored` takes `use_cache`
+
+
+def _whisper_service():
+    from core.asr import transcription_service as service
+    return _Service(lambda size, precision=None: service.load_whisper_model(size, precision)[0],
+                    service.transcribe_audio)
+
+
+def _phowhisper_service():
+    from core.asr import phowhisper_service as service
+    # The scored decode calls generate() on one window and never touches the transcript cache
+    return _Service(service.load_phowhisper_model, service.transcribe_phowhisper,
+                    service.transcribe_phowhisper_scored, scored_accepts_cache=False)
+
+
+def _ct2_service():
+    from core.asr import ct2_service as service
+    return _Service(service.load_ct2_model, service.transcribe_ct2)
+
+
+# backend -> () -> _Service
+_SERVICES: Dict[str, Callable[[], _Service]] = {
+    "whisper": _whisper_service,
+    "phowhisper": _phowhisper_service,
+    "ct2": _ct2_service,
+}
+
+SUPPORTED_BACKENDS = tuple(_SERVICES)
+
+
+def _check_backend(backend: str) -> str:
+    backend = (backend or "").lower()
+    if backend not in _SERVICES:
+        raise ValueError(f"Unsupported ASR backend: {backend}. Available: {', '.join(SUPPORTED_BACKENDS)}")
+    return backend
+
+
+def _service(backend: str) -> _Service:
+    return _SERVICES[_check_backend(backend)]()
+
+
+def load_model(backend: str, model_size: str, precision: Optional[str] = None):
+    """Load (cached) the raw model of `backend`; None if loading failed."""
+    client = get_client()
+    if client is not None:
+        backend = _check_backend(backend)
+        try:
+            # The daemon loads with its own precision settings
+            return client.load(backend, model_size)
+        except DaemonError as e:
+            logger.error(f"Failed to load {backend}/{model_size} in the inference daemon: {str(e)}")
+            return None
+    return _service(backend).load(model_size, precision)
+
+
+def transcribe_function(backend: str, scores: bool = False, local: bool = False) -> Callable[..., Optional[Dict]]:
+    """Service function `(model, audio, sr=..., language=..., decoding=..., ...) -> result dict`.
+
+    `local=True` always returns the in-process function (used by the daemon itself).
+    """
+    if not local and get_client() is not None:
+        _check_backend(backend)
+        return remote_transcribe_function(scores)
+    service = _service(backend)
+    if scores and service.transcribe_scored is not None:
+        return service.transcribe_scored
+    return service.transcribe
+
+
+def accepts_use_cache(backend: str, scores: bool = False) -> bool:
+    """Whether `transcribe_function(backend, scores)` (in-process) takes `use_cache`."""
+    service = _service(backend)
+    if scores and service.transcribe_scored is not None:
+        return service.scored_accepts_cache
+    return True
@@ -0,0 +1,159 @@
+"""
+Benchmark tốc độ / bộ nhớ của các chế độ precision (fp32, bf16, int8, fp16)
+
+Mỗi variant chạy trong một process riêng (spawn) để RSS không bị cộng dồn
+giữa các model. Báo cáo: thời gian load, RSS sau khi load, peak RSS, thời
+gian decode và real-time factor (RTF = thời gian decode / độ dài audio;
+RTF < 1 nghĩa là nhanh hơn realtime).
+
+Chạy:
+    python -m core.asr.benchmark_precision --audio sample.wav --backend whisper --model_size small
+"""
+import json
+import multiprocessing as mp
+import os
+import sys
+import time
+from typing import Dict, List
+
+
+def _rss_mb() -> float:
+    import psutil
+    return psutil.Process(os.getpid()).memory_info().rss / (1024 * 1024)
+
+
+def _peak_rss_mb() -> float:
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux: KB, macOS: bytes
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    except ImportError:
+        return _rss_mb()
+
+
+def _run_variant(backend: str, model_size: str, precision: str, device: str,
+                 audio_path: str, language: str, threads: int, warmup_seconds: float) -> Dict:
+    """Load một variant và transcribe audio (chạy trong child process)."""
+    import torch
+    from core.asr.model_pool import DEFAULT_LOADERS
+    from core.asr.quantization import inference_context
+    from core.audio.audio_processor import load_normalized_audio
+
+    if threads:
+        torch.set_num_threads(threads)
+
+    sr, y = load_normalized_audio(audio_path, target_sr=16000)
+    duration = len(y) / sr
+
+    rss_before = _rss_mb()
+    start = time.perf_counter()
+    model = DEFAULT_LOADERS[backend](model_size, device, precision)
+    load_s = time.perf_counter() - start
+    rss_loaded = _rss_mb()
+
+    def transcribe(samples):
+        with torch.no_grad(), inference_context(model):
+            if backend == "whisper":
+                result = model.transcribe(samples, language=language, fp16=precision == "fp16")
+            else:
+                result = model({"raw": samples, "sampling_rate": 16000}, return_timestamps=True)
+        return (result or {}).get("text", "")
+
+    if warmup_seconds > 0:
+        transcribe(y[:int(warmup_seconds * sr)])
+
+    start = time.perf_counter()
+    text = transcribe(y)
+    decode_s = time.perf_counter() - start
+
+    return {
+        "backend": backend,
+        "model_size": model_size,
+        "precision": precision,
+        "device": device,
+        "audio_seconds": round(duration, 2),
+        "load_s": round(load_s, 2),
+        "decode_s": round(decode_s, 2),
+        "rtf": round(decode_s / duration, 3) if duration else None,
+        "model_rss_mb": round(rss_loaded - rss_before, 1),
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+        "text": text.strip(),
+    }
+
+
+def run_benchmark(audio_path: str, backend: str = "whisper", model_size: str = "small",
+                  precisions: List[str] = None, device: str = "cpu", language: str = "vi",
+                  threads: int = 0, warmup_seconds: float = 5.0) -> List[Dict]:
+    """Chạy từng precision trong một process mới và trả về danh sách kết quả."""
+    from core.asr.quantization import resolve_precision
+
+    precisions = precisions or ["fp32", "bf16", "int8"]
+    results = []
+    ctx = mp.get_context("spawn")
+    for requested in precisions:
+        effective = resolve_precision(device, requested, "none")
+        if effective != requested:
+            print(f"⚠️ {requested} không chạy được trên {device}, bỏ qua (sẽ dùng {effective})")
+            continue
+        print(f"🔄 {backend}-{model_size} [{requested}] ...")
+        with ctx.Pool(1) as pool:
+            try:
+                result = pool.apply(
+                    _run_variant,
+                    (backend, model_size, requested, device, audio_path, language, threads, warmup_seconds),
+                )
+            except Exception as e:
+                print(f"❌ {requested}: {e}")
+                continue
+        results.append(result)
+        print(f"  ✅ RTF {result['rtf']}, model RSS {result['model_rss_mb']} MB, peak RSS {result['peak_rss_mb']} MB")
+    return results
+
+
+def format_table(results: List[Dict]) -> str:
+    lines = [
+        "| Model | Precision | Device | Load (s) | Decode (s) | RTF | Model RSS (MB) | Peak RSS (MB) |",
+        "|-------|-----------|--------|----------|------------|-----|----------------|---------------|",
+    ]
+    for r in results:
+        lines.append(
+            f"| {r['backend']}-{r['model_size']} | {r['precision']} | {r['device']} | {r['load_s']} | "
+            f"{r['decode_s']} | {r['rtf']} | {r['model_rss_mb']} | {r['peak_rss_mb']} |"
+        )
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark RTF / RSS cho fp32, bf16, int8, fp16")
+    parser.add_argument("--audio", type=str, required=True, help="File audio để transcribe")
+    parser.add_argument("--backend", type=str, default="whisper", choices=["whisper", "phowhisper"])
+    parser.add_argument("--model_size", type=str, default="small")
+    parser.add_argument("--precisions", type=str, default="fp32,bf16,int8",
+                        help="Danh sách precision, cách nhau bởi dấu phẩy (default: fp32,bf16,int8)")
+    parser.add_argument("--device", type=str, default="cpu", choices=["cpu", "cuda"])
+    parser.add_argument("--language", type=str, default="vi")
+    parser.add_argument("--threads", type=int, default=0, help="torch threads (0 = mặc định)")
+    parser.add_argument("--warmup", type=float, default=5.0, help="Giây audio dùng để warm-up (0 = tắt)")
+    parser.add_argument("--output", type=str, default=None, help="Ghi kết quả JSON ra file")
+
+    args = parser.parse_args()
+
+    results = run_benchmark(
+        audio_path=args.audio,
+        backend=args.backend,
+        model_size=args.model_size,
+        precisions=[p.strip() for p in args.precisions.split(",") if p.strip()],
+        device=args.device,
+        language=args.language,
+        threads=args.threads,
+        warmup_seconds=args.warmup,
+    )
+    print()
+    print(format_table(results))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"\n📄 Đã lưu kết quả: {args.output}")
@@ -0,0 +1,124 @@
+"""Confidence cascade: nháp mọi window bằng model nhỏ, chỉ làm lại các window đáng ngờ.
+
+Lượt nháp chạy model của preset `fast` trên tất cả window. Mỗi bản nháp được
+chấm điểm bằng các tín hiệu Whisper vốn đã tính trong mỗi lần decode:
+
+- `avg_logprob`: log-probability trung bình của token (PhoWhisper: lấy từ
+  scores của `generate`, xem `phowhisper_service.transcribe_phowhisper_scored`);
+- `compression_ratio`: tỉ lệ nén gzip của text, cao khi bị lặp vòng;
+- `no_speech_prob`: xác suất window là im lặng (chỉ Whisper).
+
+Chỉ những window không đạt `CascadeThresholds` mới được transcribe lại bằng
+model của preset `accurate` (load lazy), nên một buổi họp thu âm sạch tốn
+khoảng một lượt model nhỏ.
+"""
+import zlib
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+
+@dataclass(frozen=True)
+class CascadeThresholds:
+    min_avg_logprob: float = -0.6          # thấp hơn: làm lại
+    max_compression_ratio: float = 2.2     # cao hơn: làm lại (bị lặp)
+    silence_no_speech_prob: float = 0.6    # cao hơn (và text rỗng): im lặng, giữ bản nháp
+
+    @classmethod
+    def from_settings(cls, settings: Optional[Dict] = None) -> "CascadeThresholds":
+        if settings is None:
+            from core.utils.settings_manager import load_settings
+            settings = load_settings()
+        inference = settings.get("inference", {})
+        return cls(min_avg_logprob=float(inference.get("cascade_logprob_threshold", cls.min_avg_logprob)))
+
+
+def compression_ratio(text: str) -> float:
+    """Cùng thước đo với Whisper: số byte gốc / số byte sau khi nén zlib."""
+    data = (text or "").encode("utf-8")
+    if not data:
+        return 0.0
+    return len(data) / len(zlib.compress(data))
+
+
+def window_confidence(result: Optional[Dict]) -> Dict[str, Optional[float]]:
+    """Gộp điểm theo segment của một ASR result (trọng số theo độ dài segment).
+
+    Điểm nào backend không cung cấp thì là None; compression ratio được tính
+    lại từ text nếu thiếu.
+    """
+    text = (result or {}).get("text", "") or ""
+    segments = (result or {}).get("segments") or []
+
+    def weighted(key):
+        pairs = [
+            (float(seg[key]), max(1e-3, float(seg.get("end") or 0.0) - float(seg.get("start") or 0.0)))
+            for seg in segments if seg.get(key) is not None
+        ]
+        if not pairs:
+            return None
+        values, weights = zip(*pairs)
+        return float(np.average(values, weights=weights))
+
+    ratios = [float(seg["compression_ratio"]) for seg in segments if seg.get("compression_ratio") is not None]
+    return {
+        "avg_logprob": weighted("avg_logprob"),
+        "no_speech_prob": weighted("no_speech_prob"),
+        "compression_ratio": max(ratios) if ratios else compression_ratio(text),
+        "empty": not text.strip(),
+    }
+
+
+def needs_refinement(confidence: Dict, thresholds: CascadeThresholds) -> bool:
+    no_speech = confidence.get("no_speech_prob")
+    if confidence.get("empty"):
+        # VAD báo có tiếng nói nhưng bản nháp rỗng: làm lại, trừ khi Whisper chắc chắn là im lặng
+        return not (no_speech is not None and no_speech > thresholds.silence_no_speech_prob)
+    if (confidence.get("compression_ratio") or 0.0) > thresholds.max_compression_ratio:
+        return True
+    avg_logprob = confidence.get("avg_logprob")
+    return avg_logprob is not None and avg_logprob < thresholds.min_avg_logprob
+
+
+def transcribe_cascade(
+    window_count: int,
+    get_window: Callable[[int], np.ndarray],
+    draft_fn: Callable[[np.ndarray], Optional[Dict]],
+    refine_fn: Callable[[np.ndarray], Optional[Dict]],
+    thresholds: Optional[CascadeThresholds] = None,
+    progress_callback: Optional[Callable[[int, int], None]] = None,
+) -> List[Dict]:
+    """
+    Chạy cascade trên `window_count` window.
+
+    Args:
+        get_window: index -> samples (được gọi lại cho window cần làm lại, nên
+            không bao giờ giữ toàn bộ window trong bộ nhớ)
+        draft_fn / refine_fn: samples -> ASR result (format của `transcribe_audio`).
+            `refine_fn` chỉ được gọi khi có window cần làm lại, nên có thể load
+            model lớn một cách lazy.
+        progress_callback: Gọi với (done, total); total tăng thêm số window
+            cần làm lại sau khi xong lượt nháp
+
+    Returns:
+        Mỗi window một dict: {'result', 'confidence', 'refined'}
+    """
+    thresholds = thresholds or CascadeThresholds.from_settings()
+    entries = []
+    for i in range(window_count):
+        result = draft_fn(get_window(i))
+        confidence = window_confidence(result)
+        entries.append({"result": result, "confidence": confidence, "refined": False})
+        if progress_callback:
+            progress_callback(i + 1, window_count)
+
+    doubtful = [i for i, entry in enumerate(entries) if needs_refinement(entry["confidence"], thresholds)]
+    total = window_count + len(doubtful)
+    for done, i in enumerate(doubtful, window_count + 1):
+        refined = refine_fn(get_window(i))
+        if refined is not None:
+            entries[i] = {"result": refined, "confidence": window_confidence(refined), "refined": True}
+        if progress_callback:
+            progress_callback(done, total)
+    return entries
@@ -0,0 +1,187 @@
+"""Chunk scheduler: fan ASR chunks out to a pool of worker processes.
+
+Each worker process loads its own model once (in the pool initializer) and
+pins `torch.set_num_threads(threads_per_worker)`, so several chunks decode at
+the same time while `workers * threads_per_worker` stays within the
+`resource.num_threads` budget from the settings manager.
+
+Pools are kept alive per (backend, model_size, workers, threads) so repeated
+transcriptions in the same process do not pay the model load again.
+"""
+import atexit
+import multiprocessing as mp
+import threading
+from concurrent.futures import ALL_COMPLETED, FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from core.asr.backends import SUPPORTED_BACKENDS, load_model, transcribe_function
+from core.asr.decoding import get_decoding_profile
+from core.audio.audio_processor import as_asr_input
+from core.utils.settings_manager import load_settings
+
+
+# Worker-process globals (set by `_init_worker` in each child process)
+_worker_model = None
+_worker_backend = None
+
+# Parent-process pool cache
+_pools: Dict[Tuple[str, str, int, int], ProcessPoolExecutor] = {}
+_pools_lock = threading.Lock()
+
+
+def plan_workers(num_workers: Optional[int] = None, threads_per_worker: Optional[int] = None) -> Tuple[int, int]:
+    """Return (num_workers, threads_per_worker) that fit the thread budget.
+
+    Defaults come from `resource.num_workers` / `resource.num_threads`. The
+    thread budget is split evenly across workers; if both values are given
+    and exceed the budget, the worker count is reduced.
+    """
+    resource = load_settings()["resource"]
+    total_threads = max(1, int(resource.get("num_threads", 4)))
+    if num_workers is None:
+        num_workers = int(resource.get("num_workers", 1))
+    num_workers = max(1, min(int(num_workers), total_threads))
+
+    if threads_per_worker is None:
+        threads_per_worker = total_threads // num_workers
+    threads_per_worker = max(1, int(threads_per_worker))
+    num_workers = max(1, min(num_workers, total_threads // threads_per_worker))
+    return num_workers, threads_per_worker
+
+
+def _init_worker(backend: str, model_size: str, threads_per_worker: int):
+    """Pool initializer: limit torch threads and load the model once per process."""
+    global _worker_model, _worker_backend
+    import torch
+
+    torch.set_num_threads(threads_per_worker)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        # Already set (interop pool started) - keep going
+        pass
+
+    _worker_model = load_model(backend, model_size)
+    _worker_backend = backend
+
+
+def _transcribe_chunk(index: int, audio: np.ndarray, language: str,
+                      decoding=None) -> Tuple[int, Optional[Dict]]:
+    """Worker task: transcribe one 16kHz float32 chunk with the process-local model."""
+    if _worker_model is None:
+        return index, None
+
+    transcribe_fn = transcribe_function(_worker_backend)
+    return index, transcribe_fn(_worker_model, audio, sr=16000, language=language, decoding=decoding)
+
+
+def get_pool(backend: str, model_size: str, num_workers: int, threads_per_worker: int) -> ProcessPoolExecutor:
+    """Return a cached worker pool for the given model, creating it on first use."""
+    backend = backend.lower()
+    if backend not in SUPPORTED_BACKENDS:
+        raise ValueError(f"Unsupported ASR backend: {backend}")
+
+    key = (backend, model_size, num_workers, threads_per_worker)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            # spawn: forking a process that already initialised torch/OpenMP threads can deadlock
+            pool = ProcessPoolExecutor(
+                max_workers=num_workers,
+                mp_context=mp.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(backend, model_size, threads_per_worker),
+            )
+            _pools[key] = pool
+        return pool
+
+
+def shutdown_pools():
+    """Shut down every cached worker pool (called automatically at exit)."""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+atexit.register(shutdown_pools)
+
+
+def transcribe_chunks_parallel(
+    chunks: Iterable[Tuple[float, float, np.ndarray]],
+    backend: str = "whisper",
+    model_size: str = "base",
+    sr: int = 16000,
+    language: str = "vi",
+    num_workers: Optional[int] = None,
+    threads_per_worker: Optional[int] = None,
+    progress_callback: Optional[Callable[[int, int], None]] = None,
+    decoding=None,
+) -> List[Tuple[float, float, Optional[Dict]]]:
+    """Transcribe chunks concurrently in worker processes.
+
+    Args:
+        chunks: (start_s, end_s, samples) tuples; may be a generator that yields
+            chunks while they are produced (e.g. VAD windows as they close)
+        backend: "whisper" or "phowhisper"
+        model_size: Model size loaded by every worker
+        sr: Sample rate of the chunk samples (resampled to 16kHz before dispatch)
+        language: Language code
+        num_workers / threads_per_worker: See `plan_workers`
+        progress_callback: Called as (done, total) in the calling thread
+            (for a generator, total is the number of chunks submitted so far)
+        decoding: Decoding profile name or DecodingProfile (None = settings)
+
+    Returns:
+        List of (start_s, end_s, result) sorted by start time; `result` has the
+        usual `transcribe_audio` format or is None if that chunk failed.
+    """
+    num_workers, threads_per_worker = plan_workers(num_workers, threads_per_worker)
+    pool = None  # created on the first chunk: no worker start-up for an empty input
+    total = len(chunks) if hasattr(chunks, "__len__") else None
+    # Resolve once in the parent so every worker decodes with the same settings
+    decoding = get_decoding_profile(decoding)
+    # Chunks waiting in the pool hold their samples; keep at most two per worker in flight
+    max_pending = 2 * num_workers
+
+    spans: List[Tuple[float, float]] = []
+    results: Dict[int, Optional[Dict]] = {}
+    pending = set()
+
+    def collect(return_when):
+        nonlocal pending
+        done, pending = wait(pending, return_when=return_when)
+        for future in done:
+            idx, result = future.result()
+            results[idx] = result
+            if progress_callback is not None:
+                progress_callback(len(results), total or len(spans))
+
+    try:
+        for idx, (start, end, audio) in enumerate(chunks):
+            if pool is None:
+                pool = get_pool(backend, model_size, num_workers, threads_per_worker)
+            spans.append((start, end))
+            pending.add(pool.submit(_transcribe_chunk, idx, as_asr_input(np.asarray(audio), sr), language, decoding))
+            if len(pending) >= max_pending:
+                collect(FIRST_COMPLETED)
+        if pending:
+            collect(ALL_COMPLETED)
+    except BrokenProcessPool:
+        # A worker died (e.g. OOM); drop the pool so the next call starts fresh
+        with _pools_lock:
+            _pools.pop((backend.lower(), model_size, num_workers, threads_per_worker), None)
+        raise
+    finally:
+        # Left early (the chunk generator raised, e.g. a cache hit, or a chunk failed):
+        # the pool is shared and kept alive, so drop our chunks that have not started yet
+        for future in pending:
+            future.cancel()
+
+    ordered = [(start, end, results.get(idx)) for idx, (start, end) in enumerate(spans)]
+    ordered.sort(key=lambda item: item[0])
+    return ordered
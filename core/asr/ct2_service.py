@@ -0,0 +1,186 @@
+"""
+Module transcription sử dụng CTranslate2 (faster-whisper)
+
+Cùng kiến trúc Whisper nhưng chạy trên engine C++ CTranslate2 với weights
+int8, nhanh hơn nhiều lần so với `openai-whisper` trên CPU. Size là tên model
+Whisper chuẩn (faster-whisper tự tải bản đã convert) hoặc một thư mục trong
+`Config.CT2_MODEL_DIR`, vd. PhoWhisper đã convert:
+
+    ct2-transformers-converter --model vinai/PhoWhisper-small \\
+        --output_dir ~/.cache/ct2/phowhisper-small \\
+        --copy_files tokenizer.json preprocessor_config.json --quantization int8
+"""
+import os
+from pathlib import Path
+from typing import Dict, Optional
+
+import numpy as np
+import streamlit as st
+
+from core.audio.audio_processor import as_asr_input
+from core.asr.result_cache import cache_key_for, get_transcript_cache, tag_model
+from core.asr.quantization import set_model_precision
+from core.asr.decoding import get_decoding_profile
+
+# precision chung (MODEL_PRECISION) -> compute_type của CTranslate2
+_COMPUTE_TYPES = {"int8": "int8", "fp16": "float16", "bf16": "bfloat16", "fp32": "float32"}
+
+
+def _select_device() -> str:
+    # On Streamlit Cloud, force CPU even if CUDA is detected
+    if os.getenv("STREAMLIT_SHARING", "").lower() == "true" or os.getenv("STREAMLIT_SERVER_BASE_URL", ""):
+        return "cpu"
+    try:
+        import ctranslate2
+        return "cuda" if ctranslate2.get_cuda_device_count() > 0 else "cpu"
+    except Exception:
+        return "cpu"
+
+
+def ct2_compute_type(device: str, precision: Optional[str] = None) -> str:
+    """
+    compute_type cho CTranslate2.
+
+    `precision` None hoặc "fp32" (mặc định chung, không yêu cầu gì) dùng
+    `model.ct2_compute_type` (CT2_COMPUTE_TYPE, mặc định int8). Trên GPU int8
+    chạy dạng int8_float16.
+    """
+    if precision in (None, "fp32"):
+        from core.utils.settings_manager import load_settings
+        precision = load_settings()["model"].get("ct2_compute_type", "int8")
+    compute_type = _COMPUTE_TYPES.get(precision, precision)
+    if str(device).startswith("cuda") and compute_type == "int8":
+        return "int8_float16"
+    return compute_type
+
+
+def resolve_ct2_model_path(model_size: str) -> str:
+    """Thư mục đã convert trong CT2_MODEL_DIR nếu có, ngược lại tên model để faster-whisper tự tải."""
+    try:
+        from config import config
+        model_dir = Path(config.CT2_MODEL_DIR)
+    except (ImportError, AttributeError):
+        model_dir = Path.home() / ".cache" / "ct2"
+    local = model_dir / model_size
+    if local.is_dir():
+        return str(local)
+    if model_size.startswith("phowhisper"):
+        raise FileNotFoundError(
+            f"Không tìm thấy checkpoint CTranslate2 '{local}'. Convert bằng: "
+            f"ct2-transformers-converter --model vinai/PhoWhisper-{model_size.split('-', 1)[-1]} "
+            f"--output_dir {local} --copy_files tokenizer.json preprocessor_config.json --quantization int8"
+        )
+    return model_size
+
+
+def load_ct2_model(model_size="small", precision=None):
+    """
+    Load faster-whisper model với cache
+
+    Args:
+        model_size: tiny / base / small / medium / large-v3, hoặc checkpoint đã
+            convert trong CT2_MODEL_DIR (vd. phowhisper-small)
+        precision: fp32 | fp16 | bf16 | int8 hoặc compute_type CTranslate2;
+            None = `model.ct2_compute_type` (mặc định int8)
+    """
+    device = _select_device()
+    return _load_ct2_model(model_size, device, ct2_compute_type(device, precision))
+
+
+@st.cache_resource
+def _load_ct2_model(model_size, device, compute_type):
+    try:
+        from faster_whisper import WhisperModel
+    except ImportError:
+        st.error("❌ faster-whisper chưa được cài đặt. Cài bằng: pip install faster-whisper")
+        return None
+
+    try:
+        from core.utils.settings_manager import load_settings
+        threads = int(load_settings()["resource"].get("num_threads", 4))
+        model = WhisperModel(
+            resolve_ct2_model_path(model_size),
+            device=device,
+            compute_type=compute_type,
+            cpu_threads=threads,
+        )
+        set_model_precision(model, compute_type)
+        return tag_model(model, "ct2", model_size)
+    except FileNotFoundError as e:
+        st.error(f"❌ {str(e)}")
+        return None
+    except Exception as e:
+        st.error(f"Lỗi khi load faster-whisper model: {str(e)}")
+        return None
+
+
+def transcribe_ct2(model, audio_path_or_array, sr=16000, language="vi", use_cache=True, decoding=None) -> Optional[Dict]:
+    """
+    Transcribe audio sử dụng faster-whisper
+
+    Args:
+        model: WhisperModel đã load (từ `load_ct2_model`)
+        audio_path_or_array: Đường dẫn file hoặc numpy array
+        sr: Sample rate của array (tự resample về 16kHz nếu khác)
+        language: Ngôn ngữ (vi cho tiếng Việt)
+        use_cache: False để bỏ qua transcript cache (vd. audio live/streaming)
+        decoding: Tên decoding profile ("fast" | "accurate") hoặc DecodingProfile
+
+    Returns:
+        Dict cùng format với `transcribe_audio`: text, language, segments
+        (mỗi segment có avg_logprob, no_speech_prob, compression_ratio).
+    """
+    if model is None:
+        return None
+
+    profile = get_decoding_profile(decoding)
+    cache_key = None
+    if isinstance(audio_path_or_array, str):
+        audio = audio_path_or_array
+    else:
+        audio = as_asr_input(np.asarray(audio_path_or_array), sr)
+        if use_cache:
+            cache_key = cache_key_for(model, audio, 16000, language, {"decoding": profile.cache_options()})
+        if cache_key:
+            cached = get_transcript_cache().get(cache_key)
+            if cached is not None:
+                return cached
+
+    try:
+        segments, info = model.transcribe(
+            audio,
+            language=language,
+            task="transcribe",
+            **profile.ct2_transcribe_kwargs()
+        )
+        # `segments` is a generator: decoding happens while iterating
+        output_segments = []
+        for seg in segments:
+            item = {
+                "id": seg.id,
+                "start": seg.start,
+                "end": seg.end,
+                "text": seg.text.strip(),
+                "avg_logprob": seg.avg_logprob,
+                "no_speech_prob": seg.no_speech_prob,
+                "compression_ratio": seg.compression_ratio,
+                "temperature": seg.temperature,
+            }
+            if seg.words:
+                item["words"] = [
+                    {"start": w.start, "end": w.end, "word": w.word, "probability": w.probability}
+                    for w in seg.words
+                ]
+            output_segments.append(item)
+    except Exception as e:
+        st.error(f"❌ Lỗi khi transcribe với faster-whisper: {str(e)}")
+        return None
+
+    result = {
+        "text": " ".join(seg["text"] for seg in output_segments if seg["text"]).strip(),
+        "language": getattr(info, "language", language),
+        "segments": output_segments,
+    }
+    if cache_key:
+        get_transcript_cache().put(cache_key, result)
+    return result
@@ -0,0 +1,363 @@
+"""Local inference daemon: one process owns the models of a node.
+
+Without it the Streamlit app and the API (and each API worker) load their own
+copies of every model and compete for the same cores. With `INFERENCE_SOCKET`
+set, both become thin clients:
+
+- the daemon (`python -m core.asr.daemon`) keeps the models in a `ModelPool`
+  and runs at most `INFERENCE_DAEMON_WORKERS` decodes at a time (one global
+  scheduler for the node);
+- clients talk to it over a Unix socket with length-prefixed JSON messages;
+- PCM is not serialized: the client writes float32 samples into a
+  `multiprocessing.shared_memory` block and only sends its name.
+
+`core.asr.backends.load_model` / `transcribe_function` return `RemoteModel`
+handles and forward to the daemon when it is configured, so the callers do
+not change.
+"""
+import dataclasses
+import json
+import logging
+import os
+import socket
+import socketserver
+import struct
+import threading
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_HEADER = struct.Struct(">I")
+MAX_MESSAGE_BYTES = 64 * 1024 * 1024
+CONNECT_TIMEOUT = 2.0
+
+
+class DaemonError(RuntimeError):
+    """The inference daemon is unreachable or rejected the request."""
+
+
+def daemon_socket() -> Optional[str]:
+    """Socket path of the inference daemon, or None to run models in-process."""
+    try:
+        from config import config
+        path = config.INFERENCE_SOCKET
+    except (ImportError, AttributeError):
+        path = os.getenv("INFERENCE_SOCKET", "")
+    return path or None
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"Not JSON serializable: {type(value).__name__}")
+
+
+def send_message(sock: socket.socket, message: Dict):
+    data = json.dumps(message, default=_json_default, ensure_ascii=False).encode("utf-8")
+    sock.sendall(_HEADER.pack(len(data)) + data)
+
+
+def _recv_exact(sock: socket.socket, n: int) -> bytes:
+    buf = bytearray()
+    while len(buf) < n:
+        chunk = sock.recv(n - len(buf))
+        if not chunk:
+            raise ConnectionError("Connection closed")
+        buf.extend(chunk)
+    return bytes(buf)
+
+
+def recv_message(sock: socket.socket) -> Dict:
+    (length,) = _HEADER.unpack(_recv_exact(sock, _HEADER.size))
+    if length > MAX_MESSAGE_BYTES:
+        raise ConnectionError(f"Message too large: {length} bytes")
+    return json.loads(_recv_exact(sock, length).decode("utf-8"))
+
+
+# ================== CLIENT ==================
+
+class RemoteModel:
+    """Handle for a model that lives in the daemon (what `load_model` returns in client mode)."""
+
+    def __init__(self, backend: str, size: str, client: "DaemonClient"):
+        self.backend = backend
+        self.size = size
+        self.client = client
+
+    def __repr__(self):
+        return f"RemoteModel({self.backend}/{self.size} @ {self.client.path})"
+
+
+class DaemonClient:
+    """Blocking client; one short-lived connection per request, safe to share across threads."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def request(self, message: Dict) -> Dict:
+        try:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(CONNECT_TIMEOUT)
+            sock.connect(self.path)
+        except OSError as e:
+            raise DaemonError(f"Inference daemon not reachable at {self.path}: {str(e)}")
+        try:
+            sock.settimeout(None)  # decodes can take minutes
+            send_message(sock, message)
+            response = recv_message(sock)
+        except (OSError, ValueError) as e:
+            raise DaemonError(f"Inference daemon request failed: {str(e)}")
+        finally:
+            sock.close()
+        if not response.get("ok"):
+            raise DaemonError(response.get("error", "unknown error"))
+        return response
+
+    def ping(self) -> bool:
+        try:
+            return bool(self.request({"op": "ping"}).get("ok"))
+        except DaemonError:
+            return False
+
+    def status(self) -> Dict:
+        return self.request({"op": "status"})["status"]
+
+    def load(self, backend: str, size: str) -> RemoteModel:
+        self.request({"op": "load", "backend": backend, "size": size})
+        return RemoteModel(backend, size, self)
+
+    def transcribe(self, model: RemoteModel, audio: np.ndarray, sr: int = 16000, language: str = "vi",
+                   decoding=None, use_cache: bool = True, scores: bool = False) -> Optional[Dict]:
+        """Send `audio` through shared memory; returns the service result dict (or None)."""
+        audio = np.ascontiguousarray(audio, dtype=np.float32)
+        if dataclasses.is_dataclass(decoding):
+            decoding = dataclasses.asdict(decoding)  # DecodingProfile: rebuilt by the daemon
+        shm = shared_memory.SharedMemory(create=True, size=max(1, audio.nbytes))
+        try:
+            np.ndarray(audio.shape, dtype=np.float32, buffer=shm.buf)[:] = audio
+            response = self.request({
+                "op": "transcribe",
+                "backend": model.backend,
+                "size": model.size,
+                "shm": shm.name,
+                "samples": int(audio.shape[0]),
+                "sr": int(sr),
+                "language": language,
+                "decoding": decoding,
+                "use_cache": bool(use_cache),
+                "scores": bool(scores),
+            })
+        finally:
+            shm.close()
+            shm.unlink()
+        return response.get("result")
+
+
+_clients: Dict[str, DaemonClient] = {}
+
+
+def get_client() -> Optional[DaemonClient]:
+    """Client for the configured daemon, or None when running models in-process."""
+    path = daemon_socket()
+    if not path:
+        return None
+    if path not in _clients:
+        _clients[path] = DaemonClient(path)
+    return _clients[path]
+
+
+def _remote_transcribe(model: RemoteModel, audio, sr=16000, language="vi", use_cache=True, decoding=None,
+                       scores=False, **_):
+    if isinstance(audio, str):
+        from core.audio.audio_processor import load_normalized_audio
+        sr, audio = load_normalized_audio(audio)
+    return model.client.transcribe(model, audio, sr=sr, language=language, decoding=decoding,
+                                   use_cache=use_cache, scores=scores)
+
+
+def _remote_transcribe_scored(model: RemoteModel, audio, **kwargs):
+    return _remote_transcribe(model, audio, scores=True, **kwargs)
+
+
+def remote_transcribe_function(scores: bool = False):
+    """`transcribe_function`-compatible callable that forwards to the daemon."""
+    return _remote_transcribe_scored if scores else _remote_transcribe
+
+
+# ================== DAEMON ==================
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        # The client owns (and unlinks) the block; do not let our tracker unlink it at exit
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(shm._name, "shared_memory")
+    except Exception:
+        pass
+    return shm
+
+
+class InferenceDaemon:
+    """Owns a ModelPool and serializes decodes through a bounded number of slots."""
+
+    def __init__(self, path: str, workers: int = 1, pool=None):
+        from core.asr.model_pool import ModelPool
+        self.path = path
+        self.pool = pool or ModelPool()
+        self.workers = max(1, int(workers))
+        self._slots = threading.BoundedSemaphore(self.workers)
+        self._lock = threading.Lock()
+        self._active = 0
+        self._waiting = 0
+        self._served = 0
+        self._server: Optional[socketserver.ThreadingUnixStreamServer] = None
+
+    def handle(self, message: Dict) -> Dict:
+        op = message.get("op")
+        if op == "ping":
+            return {"ok": True}
+        if op == "status":
+            return {"ok": True, "status": self.status()}
+        if op == "load":
+            self._model(message)
+            return {"ok": True}
+        if op == "transcribe":
+            return {"ok": True, "result": self._transcribe(message)}
+        return {"ok": False, "error": f"Unknown op: {op}"}
+
+    def status(self) -> Dict:
+        with self._lock:
+            counters = {"active": self._active, "waiting": self._waiting, "served": self._served}
+        return {"workers": self.workers, "models": self.pool.loaded(), **counters}
+
+    def _model(self, message: Dict):
+        from core.asr.model_registry import get_model_info
+        backend, size = str(message.get("backend", "")).lower(), str(message.get("size", ""))
+        info = get_model_info(backend)
+        if info is None or size not in info.get("sizes", []):
+            raise ValueError(f"Unsupported model: {backend}/{size}")
+        return self.pool.get(backend, size)
+
+    def _transcribe(self, message: Dict) -> Optional[Dict]:
+        from core.asr.backends import accepts_use_cache, transcribe_function
+        from core.asr.decoding import DecodingProfile
+        self._model(message)  # validate + load before taking a decode slot
+        transcribe_fn = transcribe_function(message["backend"], scores=bool(message.get("scores")), local=True)
+        decoding = message.get("decoding")
+        if isinstance(decoding, dict):
+            decoding = DecodingProfile(**decoding)
+        kwargs = {"sr": int(message.get("sr", 16000)), "language": message.get("language", "vi"),
+                  "decoding": decoding}
+        if accepts_use_cache(message["backend"], scores=bool(message.get("scores"))):
+            kwargs["use_cache"] = bool(message.get("use_cache", True))
+
+        shm = _attach(message["shm"])
+        try:
+            audio = np.ndarray((int(message["samples"]),), dtype=np.float32, buffer=shm.buf)
+            with self._lock:
+                self._waiting += 1
+            with self._slots:
+                with self._lock:
+                    self._waiting -= 1
+                    self._active += 1
+                try:
+                    # Copy out of the client's block: results must not keep a view into it.
+                    # Slots bound total concurrency; the pool lock serializes decodes per model
+                    with self.pool.use(message["backend"].lower(), str(message["size"])) as model:
+                        result = transcribe_fn(model, audio.copy(), **kwargs)
+                finally:
+                    with self._lock:
+                        self._active -= 1
+                        self._served += 1
+            del audio
+        finally:
+            shm.close()
+        return result
+
+    def serve_forever(self):
+        if os.path.exists(self.path):
+            os.unlink(self.path)  # stale socket from a previous run
+        daemon = self
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                try:
+                    message = recv_message(self.request)
+                except (ConnectionError, ValueError) as e:
+                    logger.warning(f"Bad request: {str(e)}")
+                    return
+                try:
+                    response = daemon.handle(message)
+                except ValueError as e:
+                    logger.warning(f"Rejected {message.get('op')}: {str(e)}")
+                    response = {"ok": False, "error": str(e)}
+                except Exception as e:
+                    logger.exception(f"Request {message.get('op')} failed")
+                    response = {"ok": False, "error": str(e)}
+                try:
+                    send_message(self.request, response)
+                except OSError:
+                    pass  # client went away
+
+        socketserver.ThreadingUnixStreamServer.daemon_threads = True
+        self._server = socketserver.ThreadingUnixStreamServer(self.path, Handler)
+        os.chmod(self.path, 0o660)
+        logger.info(f"Inference daemon listening on {self.path} ({self.workers} decode slot(s))")
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+
+    def shutdown(self):
+        if self._server is not None:
+            self._server.shutdown()
+
+
+def main(argv: Optional[List[str]] = None):
+    import argparse
+    import signal
+
+    try:
+        from config import config
+        default_path, default_workers = config.INFERENCE_SOCKET, config.INFERENCE_DAEMON_WORKERS
+    except ImportError:
+        default_path = os.getenv("INFERENCE_SOCKET", "")
+        default_workers = int(os.getenv("INFERENCE_DAEMON_WORKERS", "1"))
+
+    parser = argparse.ArgumentParser(description="Local ASR inference daemon")
+    parser.add_argument("--socket", default=default_path or "/tmp/vietnamese-stt.sock")
+    parser.add_argument("--workers", type=int, default=default_workers, help="Concurrent decodes")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+    # The daemon itself runs the models in-process (backends must not forward to ourselves)
+    os.environ["INFERENCE_SOCKET"] = ""
+    try:
+        from config import config
+        config.INFERENCE_SOCKET = ""
+    except ImportError:
+        pass
+
+    daemon = InferenceDaemon(args.socket, workers=args.workers)
+
+    from core.asr.preloader import ModelPreloader, default_preload_pairs
+    ModelPreloader(default_preload_pairs(), load_fn=daemon.pool.get, use_fn=daemon.pool.use).start()
+
+    # serve_forever blocks the main thread; shutdown() must come from another one
+    signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=daemon.shutdown, daemon=True).start())
+    try:
+        daemon.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""Decoding profiles shared by the Whisper and PhoWhisper backends.
+
+A `DecodingProfile` bundles the search settings (beam size, best-of,
+temperature, patience) together with hard per-window caps:
+
+- `max_fallbacks`: how many times a 30s window may be re-decoded at a higher
+  temperature after failing the compression-ratio / log-prob checks. Whisper's
+  default schedule allows 5 retries with best_of sampling, so one noisy
+  window could cost ~25 decodes;
+- `max_new_tokens`: the most tokens decoded for one window.
+
+Profiles:
+
+- "fast": greedy, no fallback - lowest latency, used by the Fast preset;
+- "accurate": beam search / best-of / temperature / patience taken from
+  `load_settings()["inference"]`.
+"""
+from dataclasses import asdict, dataclass, replace
+from typing import Dict, Optional, Tuple, Union
+
+# Whisper decodes at most 448 tokens of context; transcribe() uses half of it per window
+DEFAULT_MAX_NEW_TOKENS = 224
+
+
+@dataclass(frozen=True)
+class DecodingProfile:
+    name: str
+    beam_size: Optional[int] = None      # None/1 = greedy
+    best_of: Optional[int] = None        # candidates when sampling (temperature > 0)
+    temperature: float = 0.0             # first temperature tried
+    patience: Optional[float] = None     # beam search patience (Whisper only)
+    max_fallbacks: int = 0               # extra decodes at higher temperature per window
+    temperature_increment: float = 0.2
+    max_new_tokens: int = DEFAULT_MAX_NEW_TOKENS
+    compression_ratio_threshold: float = 2.4
+    logprob_threshold: float = -1.0
+    no_speech_threshold: float = 0.6
+
+    def temperatures(self) -> Tuple[float, ...]:
+        """Temperature schedule: the start value plus at most `max_fallbacks` steps (<= 1.0)."""
+        temps = [round(self.temperature, 2)]
+        for _ in range(max(0, int(self.max_fallbacks))):
+            nxt = round(temps[-1] + self.temperature_increment, 2)
+            if nxt > 1.0 or self.temperature_increment <= 0:
+                break
+            temps.append(nxt)
+        return tuple(temps)
+
+    def needs_fallback(self, avg_logprob: float, compression_ratio: float, no_speech_prob: float) -> bool:
+        """Whisper's rule for retrying a window at a higher temperature."""
+        if no_speech_prob > self.no_speech_threshold and avg_logprob < self.logprob_threshold:
+            return False  # silence: a retry will not help
+        return compression_ratio > self.compression_ratio_threshold or avg_logprob < self.logprob_threshold
+
+    def whisper_transcribe_kwargs(self) -> Dict:
+        """Keyword arguments for openai-whisper `model.transcribe`."""
+        kwargs = {
+            "temperature": self.temperatures(),
+            "compression_ratio_threshold": self.compression_ratio_threshold,
+            "logprob_threshold": self.logprob_threshold,
+            "no_speech_threshold": self.no_speech_threshold,
+            "sample_len": self.max_new_tokens,
+        }
+        if self.beam_size and self.beam_size > 1:
+            kwargs["beam_size"] = self.beam_size
+            if self.patience is not None:
+                kwargs["patience"] = self.patience
+        if self.best_of and self.best_of > 1:
+            kwargs["best_of"] = self.best_of
+        return kwargs
+
+    def whisper_decoding_kwargs(self, temperature: float) -> Dict:
+        """Fields for `whisper.DecodingOptions` for a single decode at `temperature`."""
+        kwargs = {"temperature": temperature, "sample_len": self.max_new_tokens}
+        if temperature == 0.0:
+            if self.beam_size and self.beam_size > 1:
+                kwargs["beam_size"] = self.beam_size
+                if self.patience is not None:
+                    kwargs["patience"] = self.patience
+        elif self.best_of and self.best_of > 1:
+            kwargs["best_of"] = self.best_of
+        return kwargs
+
+    def ct2_transcribe_kwargs(self) -> Dict:
+        """Keyword arguments for faster-whisper (CTranslate2) `WhisperModel.transcribe`."""
+        kwargs = {
+            "beam_size": max(1, self.beam_size or 1),
+            "temperature": list(self.temperatures()),
+            "compression_ratio_threshold": self.compression_ratio_threshold,
+            "log_prob_threshold": self.logprob_threshold,
+            "no_speech_threshold": self.no_speech_threshold,
+            "max_new_tokens": self.max_new_tokens,
+        }
+        if self.patience is not None:
+            kwargs["patience"] = self.patience
+        if self.best_of and self.best_of > 1:
+            kwargs["best_of"] = self.best_of
+        return kwargs
+
+    def generate_kwargs(self) -> Dict:
+        """`generate_kwargs` for the transformers ASR pipeline (PhoWhisper).
+
+        HF generate has no beam patience and no Whisper-style per-window
+        fallback loop, so only the first temperature and the caps are used.
+        """
+        kwargs = {"max_new_tokens": self.max_new_tokens, "num_beams": max(1, self.beam_size or 1)}
+        if self.temperature > 0.0:
+            kwargs["do_sample"] = True
+            kwargs["temperature"] = self.temperature
+        return kwargs
+
+    def cache_options(self) -> Dict:
+        """Everything that changes the decoded text (for transcript cache keys)."""
+        options = asdict(self)
+        options.pop("name")
+        return options
+
+
+FAST_PROFILE = DecodingProfile(name="fast", max_new_tokens=DEFAULT_MAX_NEW_TOKENS)
+
+PROFILE_NAMES = ("fast", "accurate")
+
+
+def accurate_profile(settings: Optional[Dict] = None) -> DecodingProfile:
+    """Profile built from `load_settings()["inference"]`."""
+    if settings is None:
+        from core.utils.settings_manager import load_settings
+        settings = load_settings()
+    inference = settings.get("inference", {})
+    return DecodingProfile(
+        name="accurate",
+        beam_size=int(inference.get("beam_size", 5)),
+        best_of=int(inference.get("best_of", 5)),
+        temperature=float(inference.get("temperature", 0.0)),
+        patience=float(inference.get("patience", 1.0)),
+        max_fallbacks=int(inference.get("max_fallbacks", 2)),
+        max_new_tokens=int(inference.get("max_new_tokens", DEFAULT_MAX_NEW_TOKENS)),
+    )
+
+
+def get_decoding_profile(profile: Union[None, str, DecodingProfile] = None) -> DecodingProfile:
+    """Resolve a profile name (or None = `inference.decoding_profile` setting) to a profile."""
+    if isinstance(profile, DecodingProfile):
+        return profile
+    from core.utils.settings_manager import load_settings
+    settings = load_settings()
+    inference = settings.get("inference", {})
+    name = str(profile or inference.get("decoding_profile", "accurate")).lower()
+    if name == "fast":
+        # The token cap from the settings still applies to the fast path
+        return replace(FAST_PROFILE, max_new_tokens=int(inference.get("max_new_tokens", DEFAULT_MAX_NEW_TOKENS)))
+    if name == "accurate":
+        return accurate_profile(settings)
+    raise ValueError(f"Unknown decoding profile: {name}. Available: {', '.join(PROFILE_NAMES)}")
@@ -7,16 +7,15 @@ import json
 import torch
 from pathlib import Path
 from typing import Dict, List, Tuple
-# Ensure FFmpeg configured before importing librosa (best-effort)
+# Ensure FFmpeg configured before decoding (best-effort)
 try:
     from core.audio.ffmpeg_setup import ensure_ffmpeg
     ensure_ffmpeg(silent=True)
 except Exception:
     pass
-import librosa
-import soundfile as sf
-import tempfile
 from core.audio.audio_processor import _make_safe_temp_copy
+from core.audio.ffmpeg_decoder import decode_audio
+from core.audio.probe import AudioProbeError, limit_violation, probe_audio
 
 # Import models
 # Note: Cần import trực tiếp whisper và transformers vì không có streamlit context
@@ -97,8 +96,9 @@ def evaluate_model_whisper(audio_path: str, model_size: str = "large") -> str:
         device = "cuda" if torch.cuda.is_available() else "cpu"
         model = whisper.load_model(model_size, device=device)
 
+        # One ffmpeg pass: 16kHz mono float32, same input the model would decode itself
         result = model.transcribe(
-            audio_path,
+            decode_audio(audio_path, sr=16000),
             language="vi",
             task="transcribe",
             fp16=False
@@ -142,7 +142,8 @@ def evaluate_model_phowhisper(audio_path: str, model_size: str = "medium") -> st
             device=device
         )
 
-        result = transcriber(audio_path, return_timestamps=True)
+        audio = decode_audio(audio_path, sr=16000)
+        result = transcriber({"raw": audio, "sampling_rate": 16000}, return_timestamps=True)
 
         if result:
             return result.get("text", "")
@@ -194,6 +195,15 @@ def run_evaluation(
     for i, (audio_name, reference) in enumerate(references.items(), 1):
         audio_path = test_path / audio_name
         print(f"[{i}/{len(references)}] Đang xử lý {audio_name}...")
+
+        # Header-only check: skip files the app would reject before decoding them twice
+        try:
+            violation = limit_violation(probe_audio(str(audio_path)))
+        except AudioProbeError as e:
+            violation = str(e)
+        if violation:
+            print(f"  ⏭️ Bỏ qua: {violation}")
+            continue
         
         # Transcribe với Whisper
         print("  🔄 Transcribing với Whisper...")
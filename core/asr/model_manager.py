@@ -1,11 +1,15 @@
 """ASR Model manager: unified wrapper and caching for ASR models.
 
-Provides a small abstraction over available ASR backends (currently Whisper)
-and exposes a cached loader suitable for Streamlit deployments.
+Provides a small abstraction over the available ASR backends (see
+`core.asr.backends`: whisper, phowhisper, ct2) and exposes a cached loader
+suitable for Streamlit deployments.
 """
 from typing import Tuple
 import streamlit as st
 
+from core.asr.backends import SUPPORTED_BACKENDS, load_model
+from core.asr.daemon import RemoteModel, get_client
+from core.asr.preloader import ModelPreloader, default_preload_pairs
 from core.asr.transcription_service import load_whisper_model
 
 
@@ -13,16 +17,44 @@ from core.asr.transcription_service import load_whisper_model
 def get_asr_model(model_size: str = "tiny", backend: str = "whisper") -> Tuple[object, str]:
     """Return (model, device) for the requested ASR backend and model size.
 
-    Currently supports backend='whisper'. This is intentionally small and
-    delegates to `load_whisper_model` which already handles device selection
-    and error handling.
+    Supports every backend in `core.asr.backends.SUPPORTED_BACKENDS`; the
+    loaders already handle device selection and error handling. Use
+    `backends.transcribe_function(backend)` to transcribe with the model.
+    With `INFERENCE_SOCKET` set the model is a `RemoteModel` in the daemon
+    (device "daemon").
 
     The resource is cached by Streamlit to avoid repeated downloads and loads.
     """
     backend = backend.lower()
-    if backend == "whisper":
+    if backend == "whisper" and get_client() is None:
         model, device = load_whisper_model(model_size)
         return model, device
-    else:
-        st.error(f"Unsupported ASR backend: {backend}")
-        return None, None
+    if backend in SUPPORTED_BACKENDS:
+        model = load_model(backend, model_size)
+        return model, _model_device(model)
+    st.error(f"Unsupported ASR backend: {backend}")
+    return None, None
+
+
+def _model_device(model) -> str:
+    if isinstance(model, RemoteModel):
+        return "daemon"
+    device = getattr(model, "device", None)  # HF pipeline
+    if device is None:
+        device = getattr(getattr(model, "model", None), "device", "cpu")  # faster-whisper: ctranslate2 model
+    return str(device)
+
+
+@st.cache_resource
+def get_preloader() -> ModelPreloader:
+    """Start (once per server process) loading + warming up `PRELOAD_MODELS`.
+
+    Models land in the same `@st.cache_resource` loaders the pages use, so a
+    page that asks for a preloaded model gets it without waiting.
+    """
+    try:
+        pairs = default_preload_pairs()
+    except ValueError as e:
+        st.warning(f"⚠️ PRELOAD_MODELS không hợp lệ: {str(e)}")
+        pairs = []
+    return ModelPreloader(pairs).start()
@@ -0,0 +1,289 @@
+"""Thread-safe pool of loaded ASR models for long-running services (API, workers).
+
+Unlike the `@st.cache_resource` loaders used by the Streamlit pages, the pool
+can hold several models at once and unload them again:
+
+- models are keyed by (backend, size, device, precision);
+- loading is single-flight: concurrent requests for a key that is being
+  loaded wait for that load instead of starting a second one;
+- each entry carries an inference lock: the models are not thread-safe
+  (openai-whisper installs KV-cache hooks on shared modules), so decodes go
+  through `with pool.use(backend, size) as model:`, which holds it;
+- least-recently-used models are evicted once the estimated weight
+  footprint exceeds the memory budget (`Config.MAX_MEMORY_USAGE`, MB);
+  models that are mid-decode are never evicted.
+
+Loaders raise on failure instead of rendering Streamlit errors, so callers
+can map failures to HTTP responses or logs.
+"""
+import gc
+import logging
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+import torch
+
+from core.asr.quantization import SUPPORTED_PRECISIONS, apply_precision, model_precision, resolve_precision
+from core.asr.result_cache import model_identity, tag_model
+
+logger = logging.getLogger(__name__)
+
+
+class ModelKey(NamedTuple):
+    backend: str
+    size: str
+    device: str
+    precision: str
+
+
+def default_device() -> str:
+    """Same device policy as the Streamlit loaders: CUDA if available, CPU on Streamlit Cloud."""
+    if os.getenv("STREAMLIT_SHARING", "").lower() == "true" or os.getenv("STREAMLIT_SERVER_BASE_URL", ""):
+        return "cpu"
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+
+def _load_whisper(size: str, device: str, precision: str):
+    import whisper
+    model = apply_precision(whisper.load_model(size, device=device), precision)
+    return tag_model(model, "whisper", size)
+
+
+def _load_phowhisper(size: str, device: str, precision: str):
+    from transformers import pipeline
+    transcriber = pipeline(
+        "automatic-speech-recognition",
+        model=f"vinai/PhoWhisper-{size}",
+        device=0 if device == "cuda" else -1,
+        torch_dtype=torch.float16 if precision == "fp16" else None,
+    )
+    transcriber = apply_precision(transcriber, precision, module=transcriber.model)
+    return tag_model(transcriber, "phowhisper", size)
+
+
+def _load_ct2(size: str, device: str, precision: str):
+    from faster_whisper import WhisperModel
+    from core.asr.ct2_service import ct2_compute_type, resolve_ct2_model_path
+    from core.asr.quantization import set_model_precision
+    from core.utils.settings_manager import load_settings
+    compute_type = ct2_compute_type(device, precision)
+    threads = int(load_settings()["resource"].get("num_threads", 4))
+    model = WhisperModel(resolve_ct2_model_path(size), device=device, compute_type=compute_type, cpu_threads=threads)
+    set_model_precision(model, compute_type)
+    return tag_model(model, "ct2", size)
+
+
+DEFAULT_LOADERS: Dict[str, Callable[[str, str, str], object]] = {
+    "whisper": _load_whisper,
+    "phowhisper": _load_phowhisper,
+    "ct2": _load_ct2,
+}
+
+
+# Approximate CTranslate2 Whisper weights (MB, float16) per model size, for
+# models faster-whisper downloads by name (no converted directory to measure)
+CT2_FP16_MB = {"tiny": 75, "base": 145, "small": 485, "medium": 1530, "large": 3090}
+
+
+def estimate_model_mb(model) -> float:
+    """
+    Approximate weight footprint of a loaded model in MB.
+
+    torch models count every tensor in `state_dict()`: parameters, buffers
+    and the packed weights of `quantize_dynamic` int8 layers, which are
+    neither. CTranslate2 models hold no torch tensors (see `_ct2_model_mb`).
+    """
+    identity = model_identity(model)
+    if identity is not None and identity[0] == "ct2":
+        return _ct2_model_mb(identity[1], model_precision(model))
+
+    module = getattr(model, "model", model)  # HF pipeline wraps the nn.Module
+    try:
+        state = module.state_dict()
+    except AttributeError:
+        return 0.0
+    return _tensor_bytes(state.values(), set()) / (1024 * 1024)
+
+
+def _tensor_bytes(values, seen: set) -> int:
+    total = 0
+    for value in values:
+        if isinstance(value, (tuple, list)):  # int8 packed params: (weight, bias)
+            total += _tensor_bytes(value, seen)
+        elif hasattr(value, "numel") and hasattr(value, "element_size"):
+            ptr = value.data_ptr() if hasattr(value, "data_ptr") else 0
+            if ptr and ptr in seen:
+                continue  # tied weights
+            seen.add(ptr)
+            total += value.numel() * value.element_size()
+    return total
+
+
+def _ct2_model_mb(size: str, compute_type: str) -> float:
+    """Size of the converted checkpoint on disk, else `CT2_FP16_MB` scaled to the compute type."""
+    try:
+        from core.asr.ct2_service import resolve_ct2_model_path
+        path = resolve_ct2_model_path(size)
+    except Exception:
+        path = None
+    if path and os.path.isdir(path):
+        total = sum(
+            os.path.getsize(os.path.join(root, name))
+            for root, _, files in os.walk(path) for name in files
+        )
+        return total / (1024 * 1024)
+
+    parts = size.lower().split("-")  # large-v3, distil-large-v3, phowhisper-small
+    base_mb = next((mb for name, mb in CT2_FP16_MB.items() if name in parts), 0.0)
+    if compute_type.startswith("int8"):
+        return base_mb / 2
+    if compute_type == "float32":
+        return base_mb * 2
+    return float(base_mb)
+
+
+class _Entry(NamedTuple):
+    model: object
+    size_mb: float
+    lock: threading.Lock  # held for the duration of every decode on `model`
+
+
+class ModelPool:
+    """LRU cache of loaded models with single-flight loading and a memory budget."""
+
+    def __init__(self, max_memory_mb: Optional[float] = None,
+                 loaders: Optional[Dict[str, Callable[[str, str, str], object]]] = None):
+        if max_memory_mb is None:
+            try:
+                from config import config
+                max_memory_mb = config.MAX_MEMORY_USAGE
+            except ImportError:
+                max_memory_mb = int(os.getenv("MAX_MEMORY_USAGE", "8192"))
+        self.max_memory_mb = float(max_memory_mb)
+        self.loaders = dict(loaders or DEFAULT_LOADERS)
+        self._models: "OrderedDict[ModelKey, _Entry]" = OrderedDict()
+        self._key_locks: Dict[ModelKey, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def make_key(self, backend: str, size: str, device: Optional[str] = None,
+                 precision: Optional[str] = None) -> ModelKey:
+        """Build a pool key; `precision=None` resolves it from the settings for the device."""
+        backend = backend.lower()
+        if backend not in self.loaders:
+            raise ValueError(f"Unsupported ASR backend: {backend}")
+        device = device or default_device()
+        if precision is None:
+            precision = resolve_precision(device)
+        if precision not in SUPPORTED_PRECISIONS:
+            raise ValueError(f"Unsupported precision: {precision}")
+        return ModelKey(backend, size, device, precision)
+
+    def get(self, backend: str, size: str, device: Optional[str] = None,
+            precision: Optional[str] = None):
+        """
+        Return the loaded model for the key, loading it at most once.
+
+        Only for loading / inspection: decoding must go through `use()` so
+        concurrent callers are serialized on the model.
+        """
+        return self._entry(backend, size, device, precision).model
+
+    def acquire(self, backend: str, size: str, device: Optional[str] = None,
+                precision: Optional[str] = None) -> Tuple[object, threading.Lock]:
+        """Return `(model, lock)`; the caller must hold `lock` while decoding with `model`."""
+        entry = self._entry(backend, size, device, precision)
+        return entry.model, entry.lock
+
+    @contextmanager
+    def use(self, backend: str, size: str, device: Optional[str] = None,
+            precision: Optional[str] = None) -> Iterator[object]:
+        """`with pool.use(backend, size) as model:` - exclusive use of the model for one decode."""
+        model, lock = self.acquire(backend, size, device, precision)
+        with lock:
+            yield model
+
+    def _entry(self, backend: str, size: str, device: Optional[str],
+               precision: Optional[str]) -> _Entry:
+        key = self.make_key(backend, size, device, precision)
+
+        with self._lock:
+            entry = self._models.get(key)
+            if entry is not None:
+                self._models.move_to_end(key)
+                return entry
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            # Another thread may have finished loading while we waited
+            with self._lock:
+                entry = self._models.get(key)
+                if entry is not None:
+                    self._models.move_to_end(key)
+                    return entry
+
+            logger.info(f"Loading {key.backend} model ({key.size}, {key.device}, {key.precision})...")
+            model = self.loaders[key.backend](key.size, key.device, key.precision)
+            size_mb = estimate_model_mb(model)
+            logger.info(f"Loaded {key.backend}/{key.size}: ~{size_mb:.0f} MB")
+
+            entry = _Entry(model, size_mb, threading.Lock())
+            with self._lock:
+                self._models[key] = entry
+                evicted = self._evict_over_budget(keep=key)
+            if evicted:
+                self._release_memory()
+            return entry
+
+    def loaded(self) -> List[Dict]:
+        """Describe loaded models, least recently used first."""
+        with self._lock:
+            return [
+                {**key._asdict(), "memory_mb": round(entry.size_mb, 1)}
+                for key, entry in self._models.items()
+            ]
+
+    def memory_mb(self) -> float:
+        with self._lock:
+            return sum(entry.size_mb for entry in self._models.values())
+
+    def evict(self, key: ModelKey) -> bool:
+        with self._lock:
+            removed = self._models.pop(key, None) is not None
+        if removed:
+            self._release_memory()
+        return removed
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+        self._release_memory()
+
+    def _evict_over_budget(self, keep: ModelKey) -> bool:
+        """
+        Drop LRU models until the budget fits (caller holds `self._lock`).
+
+        Models in the middle of a decode (inference lock held) are skipped.
+        Returns whether anything was evicted; the caller then runs
+        `_release_memory()` after releasing `self._lock`.
+        """
+        evicted = False
+        total = sum(entry.size_mb for entry in self._models.values())
+        for key, entry in list(self._models.items()):
+            if total <= self.max_memory_mb:
+                break
+            if key == keep or entry.lock.locked():
+                continue
+            del self._models[key]
+            total -= entry.size_mb
+            evicted = True
+            logger.info(f"Evicted {key.backend}/{key.size} ({entry.size_mb:.0f} MB) to stay under {self.max_memory_mb:.0f} MB")
+        return evicted
+
+    @staticmethod
+    def _release_memory():
+        gc.collect()
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
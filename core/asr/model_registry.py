@@ -1,7 +1,8 @@
 """
 Model Registry
-Quản lý ASR models: Whisper và PhoWhisper
+Quản lý ASR models: Whisper, PhoWhisper và faster-whisper (CTranslate2)
 """
+import importlib.util
 from typing import Dict, List, Optional
 
 MODELS: Dict[str, Dict] = {
@@ -28,6 +29,19 @@ MODELS: Dict[str, Dict] = {
         "recommended": True,
         "vietnamese_support": True,
         "dependencies": ["transformers", "torch"]
+    },
+    "ct2": {
+        "name": "faster-whisper (CTranslate2)",
+        "type": "Transformer seq2seq (CTranslate2)",
+        "category": "Tối ưu CPU",
+        "service": "ct2_service",
+        # phowhisper-* cần convert trước vào CT2_MODEL_DIR (xem ct2_service)
+        "sizes": ["tiny", "base", "small", "medium", "large-v3", "phowhisper-small", "phowhisper-medium"],
+        "default_size": "small",
+        "description": "Whisper / PhoWhisper trên engine CTranslate2, int8 trên CPU, nhanh hơn nhiều lần openai-whisper",
+        "recommended": False,
+        "vietnamese_support": True,
+        "dependencies": ["faster-whisper"]
     }
 }
 
@@ -79,7 +93,10 @@ def check_model_dependencies(model_id: str):
                 import transformers
             elif dep == "torch":
                 import torch
-            # Chỉ hỗ trợ Whisper và PhoWhisper
+            elif dep == "faster-whisper":
+                # Chỉ kiểm tra có cài hay không, không import (kéo theo ctranslate2)
+                if importlib.util.find_spec("faster_whisper") is None:
+                    missing.append(dep)
         except (ImportError, SyntaxError, IndentationError, AttributeError, Exception) as e:
             # Bắt tất cả exception để tránh crash khi check dependencies
             missing.append(dep)
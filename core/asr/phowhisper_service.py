@@ -52,7 +52,10 @@ import tempfile
 import subprocess
 import time
 import shutil
-from core.audio.audio_processor import _make_safe_temp_copy
+from core.audio.audio_processor import _make_safe_temp_copy, as_asr_input
+from core.asr.result_cache import cache_key_for, get_transcript_cache, tag_model
+from core.asr.quantization import apply_precision, inference_context, resolve_precision
+from core.asr.decoding import get_decoding_profile
 
 def check_ffmpeg_for_librosa():
     """
@@ -132,17 +135,33 @@ def check_ffmpeg_for_librosa():
     except Exception as e:
         return False, f"Lỗi khi test librosa: {str(e)}"
 
-@st.cache_resource
-def load_phowhisper_model(model_size="small"):
+def _select_pipeline_device():
+    """0 = GPU, -1 = CPU (giống quy tắc trong `load_phowhisper_model`)."""
+    # On Streamlit Cloud, force CPU even if CUDA is detected (to avoid issues)
+    if os.getenv("STREAMLIT_SHARING", "").lower() == "true" or os.getenv("STREAMLIT_SERVER_BASE_URL", ""):
+        return -1
+    return 0 if torch.cuda.is_available() else -1
+
+
+def load_phowhisper_model(model_size="small", precision=None):
     """
     Load PhoWhisper model từ HuggingFace với cache
     
     Args:
         model_size: "small", "medium", hoặc "base"
+        precision: fp32 | fp16 | bf16 | int8; None = theo settings
+            (`model.precision`, `resource.quantization`). Mỗi (model_size,
+            precision) được cache riêng.
     
     Returns:
         pipeline: Transformers pipeline object hoặc None nếu lỗi
     """
+    device = "cuda" if _select_pipeline_device() == 0 else "cpu"
+    return _load_phowhisper_model(model_size, resolve_precision(device, precision))
+
+
+@st.cache_resource
+def _load_phowhisper_model(model_size, precision):
     error_details = []
     
     try:
@@ -226,22 +245,23 @@ def load_phowhisper_model(model_size="small"):
         # 5. Load model
         error_details.append("\n=== Model Loading ===")
         # Ensure we don't force CUDA on Cloud (check if CUDA is actually available)
-        device = 0 if torch.cuda.is_available() else -1
-        # On Streamlit Cloud, force CPU even if CUDA is detected (to avoid issues)
-        if os.getenv("STREAMLIT_SHARING", "").lower() == "true" or os.getenv("STREAMLIT_SERVER_BASE_URL", ""):
-            device = -1  # Force CPU on Cloud
+        device = _select_pipeline_device()
+        if device == -1 and torch.cuda.is_available():
             error_details.append("Streamlit Cloud detected: forcing CPU device")
         
         model_name = f"vinai/PhoWhisper-{model_size}"
         error_details.append(f"Model: {model_name}")
         error_details.append(f"Device: {device} (0=GPU, -1=CPU)")
+        error_details.append(f"Precision: {precision}")
         
         try:
             transcriber = pipeline(
                 "automatic-speech-recognition",
                 model=model_name,
-                device=device
+                device=device,
+                torch_dtype=torch.float16 if precision == "fp16" else None,
             )
+            transcriber = apply_precision(transcriber, precision, module=transcriber.model)
             
             # Check memory after loading
             try:
@@ -256,7 +276,7 @@ def load_phowhisper_model(model_size="small"):
                 pass
             
             error_details.append("Model loaded: SUCCESS")
-            return transcriber
+            return tag_model(transcriber, "phowhisper", model_size)
         except KeyError as ke:
             # Handle "missing field" errors from model loading
             error_msg = f"Missing field error: {str(ke)}"
@@ -285,8 +305,11 @@ def load_phowhisper_model(model_size="small"):
                         model=model_name,
                         device=-1  # Force CPU
                     )
+                    transcriber = apply_precision(
+                        transcriber, resolve_precision("cpu", precision), module=transcriber.model
+                    )
                     error_details.append("Model loaded with CPU fallback: SUCCESS")
-                    return transcriber
+                    return tag_model(transcriber, "phowhisper", model_size)
                 except Exception as cpu_err:
                     error_details.append(f"CPU fallback also failed: {str(cpu_err)}")
                     st.error(f"❌ Không thể load model ngay cả với CPU: {str(cpu_err)}")
@@ -322,15 +345,22 @@ def load_phowhisper_model(model_size="small"):
         
         return None
 
-def transcribe_phowhisper(model, audio_path_or_array, sr=16000, language="vi"):
+def transcribe_phowhisper(model, audio_path_or_array, sr=16000, language="vi", use_cache=True, decoding=None):
     """
     Transcribe audio sử dụng PhoWhisper
     
     Args:
         model: PhoWhisper pipeline model
-        audio_path_or_array: Đường dẫn file hoặc numpy array
-        sr: Sample rate (PhoWhisper yêu cầu 16kHz)
+        audio_path_or_array: Đường dẫn file hoặc numpy array (array được
+            truyền thẳng vào pipeline, không ghi file tạm)
+        sr: Sample rate của array (tự resample về 16kHz nếu khác)
         language: Ngôn ngữ (vi cho tiếng Việt)
+        use_cache: False để bỏ qua transcript cache (vd. audio live/streaming)
+        decoding: Tên decoding profile ("fast" | "accurate") hoặc DecodingProfile;
+            None = theo settings. Được truyền vào pipeline dưới dạng `generate_kwargs`
+
+    Với input là array, kết quả được lưu vào transcript cache và trả về
+    ngay ở những lần gọi sau với cùng audio/model.
     
     Returns:
         Dict: Kết quả transcription với format tương thích Whisper
@@ -341,7 +371,10 @@ def transcribe_phowhisper(model, audio_path_or_array, sr=16000, language="vi"):
     """
     error_details = []
     audio_path = None
+    pipeline_input = None
+    cache_key = None
     is_temp = False
+    profile = get_decoding_profile(decoding)
     
     try:
         error_details.append("=== Transcription Start ===")
@@ -363,103 +396,111 @@ def transcribe_phowhisper(model, audio_path_or_array, sr=16000, language="vi"):
                 st.error(f"❌ File không tồn tại: {audio_path}")
                 return None
         else:
-            # Là numpy array, cần lưu vào temp file
+            # Là numpy array: truyền thẳng vào pipeline (không ghi file tạm, không gọi ffmpeg)
             error_details.append(f"Input is numpy array, shape: {audio_path_or_array.shape if hasattr(audio_path_or_array, 'shape') else 'unknown'}")
-            try:
-                with tempfile.NamedTemporaryFile(delete=False, suffix='.wav') as tmp_file:
-                    sf.write(tmp_file.name, audio_path_or_array, sr)
-                    audio_path = tmp_file.name
-                    is_temp = True
-                error_details.append(f"Created temp file: {audio_path}")
-            except Exception as e:
-                error_details.append(f"ERROR creating temp file: {str(e)}")
-                st.error(f"❌ Không thể tạo file tạm: {str(e)}")
-                return None
-        
-        # Kiểm tra FFmpeg trước khi transcribe
-        error_details.append("\n=== Pre-transcribe FFmpeg Check ===")
-        ffmpeg_path = get_ffmpeg_path()
-        if ffmpeg_path:
-            verified, verify_msg = verify_ffmpeg(ffmpeg_path)
-            error_details.append(f"FFmpeg path: {ffmpeg_path}")
-            error_details.append(f"FFmpeg verified: {verified}")
-            error_details.append(f"Verify message: {verify_msg}")
+            pipeline_input = {
+                "raw": as_asr_input(np.asarray(audio_path_or_array), sr),
+                "sampling_rate": 16000,
+            }
+            error_details.append("Using in-memory audio (no temp file)")
+            if use_cache:
+                cache_key = cache_key_for(model, pipeline_input["raw"], 16000, language,
+                                          {"decoding": profile.cache_options()})
+            if cache_key:
+                cached = get_transcript_cache().get(cache_key)
+                if cached is not None:
+                    return cached
+        
+        if pipeline_input is None:
+            # Kiểm tra FFmpeg trước khi transcribe
+            error_details.append("\n=== Pre-transcribe FFmpeg Check ===")
+            ffmpeg_path = get_ffmpeg_path()
+            if ffmpeg_path:
+                verified, verify_msg = verify_ffmpeg(ffmpeg_path)
+                error_details.append(f"FFmpeg path: {ffmpeg_path}")
+                error_details.append(f"FFmpeg verified: {verified}")
+                error_details.append(f"Verify message: {verify_msg}")
             
-            if not verified:
-                st.warning(f"⚠️ FFmpeg có thể không hoạt động: {verify_msg}")
-        else:
-            error_details.append("WARNING: FFmpeg path not found")
-            st.warning("⚠️ Không tìm thấy FFmpeg path")
-        
-        # Transcribe với PhoWhisper
-        error_details.append("\n=== Calling Pipeline ===")
-        error_details.append(f"Audio path: {audio_path}")
-        error_details.append(f"Return timestamps: True")
-        
-        # CRITICAL: Preflight check - ensure audio file exists and is readable (prevents WinError 2)
-        if not audio_path:
-            error_details.append("ERROR: audio_path is None or empty")
-            st.error("❌ Audio path không hợp lệ!")
-            return None
+                if not verified:
+                    st.warning(f"⚠️ FFmpeg có thể không hoạt động: {verify_msg}")
+            else:
+                error_details.append("WARNING: FFmpeg path not found")
+                st.warning("⚠️ Không tìm thấy FFmpeg path")
+        
+            # Transcribe với PhoWhisper
+            error_details.append("\n=== Calling Pipeline ===")
+            error_details.append(f"Audio path: {audio_path}")
+            error_details.append(f"Return timestamps: True")
+        
+            # CRITICAL: Preflight check - ensure audio file exists and is readable (prevents WinError 2)
+            if not audio_path:
+                error_details.append("ERROR: audio_path is None or empty")
+                st.error("❌ Audio path không hợp lệ!")
+                return None
         
-        if not os.path.exists(audio_path):
-            error_details.append(f"ERROR: File không tồn tại: {audio_path}")
-            st.error(f"❌ File không tồn tại: {audio_path}")
-            st.warning("💡 File có thể đã bị xóa hoặc path không đúng. Đây là nguyên nhân phổ biến của WinError 2 trên Windows.")
-            return None
+            if not os.path.exists(audio_path):
+                error_details.append(f"ERROR: File không tồn tại: {audio_path}")
+                st.error(f"❌ File không tồn tại: {audio_path}")
+                st.warning("💡 File có thể đã bị xóa hoặc path không đúng. Đây là nguyên nhân phổ biến của WinError 2 trên Windows.")
+                return None
         
-        if not os.path.isfile(audio_path):
-            error_details.append(f"ERROR: Path không phải là file: {audio_path}")
-            st.error(f"❌ Path không phải là file: {audio_path}")
-            return None
+            if not os.path.isfile(audio_path):
+                error_details.append(f"ERROR: Path không phải là file: {audio_path}")
+                st.error(f"❌ Path không phải là file: {audio_path}")
+                return None
         
-        # Verify file is readable (Windows file lock check)
-        file_readable = False
-        for attempt in range(3):
-            try:
-                # Test if file is readable
-                with open(audio_path, 'rb') as test_file:
-                    test_file.read(1)  # Read 1 byte to test
-                file_readable = True
-                error_details.append(f"File readable check: SUCCESS (attempt {attempt + 1})")
-                break
-            except PermissionError as perm_err:
-                error_details.append(f"File readable check: PermissionError (attempt {attempt + 1}): {str(perm_err)}")
-                st.warning(f"⚠️ File đang được sử dụng bởi process khác. Retry {attempt + 1}/3...")
-                time.sleep(0.2 * (attempt + 1))
-                continue
-            except Exception as file_err:
-                error_details.append(f"File readable check: Error (attempt {attempt + 1}): {str(file_err)}")
-                # Try to create safe temp copy if path has issues
+            # Verify file is readable (Windows file lock check)
+            file_readable = False
+            for attempt in range(3):
                 try:
-                    base = os.path.basename(audio_path) if audio_path else None
-                    if base and (base.strip() != base or any(ord(c) > 127 for c in base)):
-                        # Path has trailing spaces or special characters
-                        tmp_copy = _make_safe_temp_copy(audio_path)
-                        audio_path = tmp_copy
-                        is_temp = True
-                        file_readable = True
-                        error_details.append(f"Created safe temp copy: {tmp_copy}")
-                        break
-                except Exception:
-                    time.sleep(0.1 * (attempt + 1))
+                    # Test if file is readable
+                    with open(audio_path, 'rb') as test_file:
+                        test_file.read(1)  # Read 1 byte to test
+                    file_readable = True
+                    error_details.append(f"File readable check: SUCCESS (attempt {attempt + 1})")
+                    break
+                except PermissionError as perm_err:
+                    error_details.append(f"File readable check: PermissionError (attempt {attempt + 1}): {str(perm_err)}")
+                    st.warning(f"⚠️ File đang được sử dụng bởi process khác. Retry {attempt + 1}/3...")
+                    time.sleep(0.2 * (attempt + 1))
                     continue
+                except Exception as file_err:
+                    error_details.append(f"File readable check: Error (attempt {attempt + 1}): {str(file_err)}")
+                    # Try to create safe temp copy if path has issues
+                    try:
+                        base = os.path.basename(audio_path) if audio_path else None
+                        if base and (base.strip() != base or any(ord(c) > 127 for c in base)):
+                            # Path has trailing spaces or special characters
+                            tmp_copy = _make_safe_temp_copy(audio_path)
+                            audio_path = tmp_copy
+                            is_temp = True
+                            file_readable = True
+                            error_details.append(f"Created safe temp copy: {tmp_copy}")
+                            break
+                    except Exception:
+                        time.sleep(0.1 * (attempt + 1))
+                        continue
         
-        if not file_readable:
-            error_details.append("ERROR: File không thể đọc được sau 3 lần thử")
-            st.error(f"❌ Không thể đọc file: {audio_path}")
-            st.warning("💡 File có thể đang bị khóa bởi process khác hoặc không có quyền truy cập.")
-            return None
+            if not file_readable:
+                error_details.append("ERROR: File không thể đọc được sau 3 lần thử")
+                st.error(f"❌ Không thể đọc file: {audio_path}")
+                st.warning("💡 File có thể đang bị khóa bởi process khác hoặc không có quyền truy cập.")
+                return None
         
-        # Final verification before pipeline call
-        if not os.path.exists(audio_path):
-            error_details.append(f"ERROR: File biến mất trước khi gọi pipeline: {audio_path}")
-            st.error(f"❌ File biến mất: {audio_path}")
-            st.warning("💡 File có thể đã bị xóa bởi cleanup process. Đây là nguyên nhân WinError 2.")
-            return None
+            # Final verification before pipeline call
+            if not os.path.exists(audio_path):
+                error_details.append(f"ERROR: File biến mất trước khi gọi pipeline: {audio_path}")
+                st.error(f"❌ File biến mất: {audio_path}")
+                st.warning("💡 File có thể đã bị xóa bởi cleanup process. Đây là nguyên nhân WinError 2.")
+                return None
 
         try:
-            result = model(audio_path, return_timestamps=True)
+            with inference_context(model):
+                result = model(
+                    pipeline_input if pipeline_input is not None else audio_path,
+                    return_timestamps=True,
+                    generate_kwargs=profile.generate_kwargs(),
+                )
             error_details.append("Pipeline call: SUCCESS")
             error_details.append(f"Result type: {type(result)}")
             error_details.append(f"Result keys: {result.keys() if isinstance(result, dict) else 'N/A'}")
@@ -618,6 +659,8 @@ def transcribe_phowhisper(model, audio_path_or_array, sr=16000, language="vi"):
             error_details.append(f"Created single segment, duration: {duration}")
         
         error_details.append("Transcription: SUCCESS")
+        if cache_key:
+            get_transcript_cache().put(cache_key, output)
         return output
         
     except Exception as e:
@@ -641,5 +684,60 @@ def transcribe_phowhisper(model, audio_path_or_array, sr=16000, language="vi"):
         
         return None
 
+def transcribe_phowhisper_scored(model, audio, sr=16000, language="vi", decoding=None):
+    """
+    Như `transcribe_phowhisper` cho một window <= 30s, nhưng gọi thẳng
+    `model.model.generate` để lấy log-prob của từng token: segment trả về có
+    thêm `avg_logprob` và `compression_ratio` (dùng để chấm điểm trong
+    `core.asr.cascade`). Nếu generate lỗi thì fallback về `transcribe_phowhisper`
+    (kết quả không có score).
+    """
+    if model is None:
+        return None
+
+    from core.asr.cascade import compression_ratio
+
+    profile = get_decoding_profile(decoding)
+    samples = as_asr_input(np.asarray(audio), sr)
+    cache_key = cache_key_for(model, samples, 16000, language, {"decoding": profile.cache_options(), "scored": True})
+    if cache_key:
+        cached = get_transcript_cache().get(cache_key)
+        if cached is not None:
+            return cached
+
+    try:
+        generator = model.model
+        features = model.feature_extractor(samples, sampling_rate=16000, return_tensors="pt").input_features
+        features = features.to(generator.device, dtype=generator.dtype)
+        with torch.no_grad(), inference_context(model):
+            out = generator.generate(
+                features, output_scores=True, return_dict_in_generate=True, **profile.generate_kwargs()
+            )
+        beam_indices = getattr(out, "beam_indices", None)
+        # Beam search scores are already log-softmaxed; greedy/sampling scores are raw logits
+        token_logprobs = generator.compute_transition_scores(
+            out.sequences, out.scores, beam_indices=beam_indices, normalize_logits=beam_indices is None
+        )[0]
+        token_logprobs = token_logprobs[torch.isfinite(token_logprobs)]
+        avg_logprob = float(token_logprobs.mean()) if token_logprobs.numel() else 0.0
+        text = model.tokenizer.batch_decode(out.sequences, skip_special_tokens=True)[0].strip()
+    except Exception as e:
+        st.warning(f"⚠️ Không lấy được token score từ PhoWhisper ({str(e)}); dùng pipeline thường")
+        return transcribe_phowhisper(model, samples, sr=16000, language=language, decoding=profile)
+
+    output = {
+        "text": text,
+        "segments": [{
+            "start": 0.0,
+            "end": len(samples) / 16000,
+            "text": text,
+            "avg_logprob": avg_logprob,
+            "compression_ratio": compression_ratio(text),
+        }] if text else [],
+    }
+    if cache_key:
+        get_transcript_cache().put(cache_key, output)
+    return output
+
 # Tái sử dụng các hàm format từ transcription_service
 from .transcription_service import format_transcript, format_time, get_transcript_statistics
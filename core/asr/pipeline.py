@@ -1,17 +1,209 @@
-"""Pipeline helper: normalize -> VAD -> segment -> Whisper transcription -> normalize text"""
-import os
+"""Pipeline helper: decode -> VAD -> segment -> Whisper transcription -> normalize text
+
+The stages run as a streaming pipeline: a decode thread and a VAD thread are
+connected to the ASR stage (the calling thread, or the worker pool) by
+bounded queues, so ASR starts on the first window as soon as VAD closes it
+instead of after the whole recording has been decoded and scored.
+"""
+import logging
+import queue
 import tempfile
+import threading
 import soundfile as sf
-from typing import List, Dict, Optional
+from typing import Callable, List, Dict, Optional
 import numpy as np
 import torch
 import streamlit as st
 
-from core.audio.audio_processor import normalize_audio_to_wav
+from core.audio.audio_store import GrowingAudioBuffer, iter_decoded_blocks
 from core.audio import vad as vad_module
 from core.asr.model_manager import get_asr_model
-from core.asr.transcription_service import transcribe_audio
+from core.asr.decoding import get_decoding_profile
+from core.asr.chunk_scheduler import transcribe_chunks_parallel, plan_workers
+from core.asr.transcription_service import transcribe_audio, transcribe_batch
+from core.asr.daemon import RemoteModel, remote_transcribe_function
+from core.asr.result_cache import AudioFingerprinter, get_transcript_cache, make_cache_key
+from core.asr.model_pool import default_device
+from core.asr.quantization import resolve_precision
 from core.nlp.post_processing import format_text, normalize_vietnamese
+from core.utils.settings_manager import load_settings
+
+logger = logging.getLogger(__name__)
+
+# Whisper's encoder sees a fixed 30s window; longer windows need long-form transcribe
+WHISPER_WINDOW_SECONDS = 30.0
+
+# Stage queues are bounded: decode runs at most ~1 min of audio ahead of VAD,
+# VAD at most a few windows ahead of ASR (memory stays flat on long files)
+STREAM_BLOCK_SECONDS = 10.0
+DECODE_QUEUE_BLOCKS = 6
+WINDOW_QUEUE_SIZE = 4
+
+_END = object()
+
+
+class _StageFailed:
+    """Queue item carrying an exception from an upstream stage."""
+
+    def __init__(self, error: Exception):
+        self.error = error
+
+
+class _DecodeFailed(Exception):
+    def __init__(self, error: Exception):
+        super().__init__(str(error))
+        self.error = error
+
+
+class _StreamingStages:
+    """Decode and VAD stages in background threads, linked by bounded queues.
+
+    The decode thread appends 16kHz mono blocks to a `GrowingAudioBuffer`
+    and queues them for VAD. The VAD thread scores them incrementally
+    (`vad.iter_speech_timestamps`), merges and packs the segments and queues
+    every window as soon as it closes. `windows()` yields the windows in the
+    consumer's thread; `window_audio()` cuts and normalizes one of them.
+    """
+
+    def __init__(self, audio_path: str, sr: int, vad_threshold: float, pack_windows: bool,
+                 window_min: float, window_max: float):
+        self.sr = sr
+        self.buffer = GrowingAudioBuffer(sr)
+        self.fingerprint = AudioFingerprinter()
+        self.decoded = threading.Event()  # set once the whole file is decoded
+        self._blocks: "queue.Queue" = queue.Queue(maxsize=DECODE_QUEUE_BLOCKS)
+        self._windows: "queue.Queue" = queue.Queue(maxsize=WINDOW_QUEUE_SIZE)
+        self._stop = threading.Event()
+        self._threads = [
+            threading.Thread(target=self._decode, args=(audio_path,), name="pipeline-decode", daemon=True),
+            threading.Thread(target=self._vad, args=(vad_threshold, pack_windows, window_min, window_max),
+                             name="pipeline-vad", daemon=True),
+        ]
+
+    def start(self) -> "_StreamingStages":
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def close(self):
+        """Stop the stages (if still running) and free the decoded audio."""
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout=5)
+        self.buffer.close()
+
+    @property
+    def duration(self) -> float:
+        return self.buffer.duration
+
+    def windows(self):
+        """Yield windows in time order; re-raises a decode failure."""
+        while True:
+            item = self._windows.get()
+            if item is _END:
+                return
+            if isinstance(item, _StageFailed):
+                raise item.error
+            yield item
+
+    def window_audio(self, window: Dict) -> np.ndarray:
+        """Samples of a window (already decoded when VAD closed it), normalized by the window's own peak.
+
+        Depends only on the window's samples - not on the audio before it -
+        so per-window cache keys stay stable across runs and window layouts.
+        """
+        chunk = np.asarray(vad_module.window_audio(self.buffer.view(), self.sr, window), dtype=np.float32)
+        peak = float(np.max(np.abs(chunk))) if chunk.size else 0.0
+        return chunk / np.float32(peak) if peak > 0 else chunk
+
+    def _put(self, q: "queue.Queue", item) -> bool:
+        """Blocking put that gives up when the pipeline is stopped."""
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _decode(self, audio_path: str):
+        blocks = iter_decoded_blocks(audio_path, self.sr, STREAM_BLOCK_SECONDS)
+        try:
+            for block in blocks:
+                block = np.asarray(block, dtype=np.float32)
+                self.buffer.append(block)
+                self.fingerprint.update(block)
+                if not self._put(self._blocks, block):
+                    return
+            if len(self.buffer) == 0:
+                raise ValueError(f"No audio samples decoded from {audio_path}")
+            self.decoded.set()
+            self._put(self._blocks, _END)
+        except Exception as e:
+            self._put(self._blocks, _StageFailed(e))
+        finally:
+            blocks.close()  # stops ffmpeg if the pipeline was cancelled
+
+    def _incoming(self):
+        """Decoded blocks for VAD, as decoded."""
+        while True:
+            item = self._blocks.get()
+            if item is _END:
+                return
+            if isinstance(item, _StageFailed):
+                raise _DecodeFailed(item.error)
+            yield item
+
+    def _vad(self, vad_threshold: float, pack_windows: bool, window_min: float, window_max: float):
+        blocks = self._incoming()
+        max_dur = min(window_max, WHISPER_WINDOW_SECONDS) if pack_windows else window_max
+        emitted, covered, vad_failed = False, 0.0, False
+        try:
+            try:
+                model, utils = vad_module.load_silero_vad(device="cpu")
+                segments = () if model is None else vad_module.iter_speech_timestamps(
+                    blocks, self.sr, model, threshold=vad_threshold)
+                merged = vad_module.iter_merged_timestamps(segments, max_gap=0.5)
+                if pack_windows:
+                    windows = vad_module.iter_packed_windows(merged, max_dur=max_dur)
+                else:
+                    windows = vad_module.iter_grouped_windows(merged, min_dur=window_min, max_dur=window_max)
+                for window in windows:
+                    emitted, covered = True, window["end"]
+                    if not self._put(self._windows, window):
+                        return
+            except _DecodeFailed:
+                raise
+            except Exception as e:
+                logger.warning(f"Streaming VAD failed, transcribing the rest without VAD: {str(e)}")
+                vad_failed = True
+
+            for _ in blocks:
+                pass  # no VAD model / VAD failed: let the decoder finish
+
+            duration = self.duration
+            if not emitted:
+                # No speech found (or no VAD): same whole-file fallback as before
+                if pack_windows:
+                    tail = vad_module.pack_segments_into_windows([], max_dur=max_dur, audio_duration=duration)
+                else:
+                    tail = vad_module.group_segments_into_windows([], audio_duration=duration)
+                tail = tail or [{"start": 0.0, "end": duration}]
+            elif vad_failed and covered < duration:
+                rest = [{"start": covered, "end": duration}]
+                tail = vad_module.pack_segments_into_windows(rest, max_dur=max_dur, audio_duration=duration) \
+                    if pack_windows else rest
+            else:
+                tail = []
+            for window in tail:
+                if not self._put(self._windows, window):
+                    return
+            self._put(self._windows, _END)
+        except _DecodeFailed as e:
+            self._put(self._windows, _StageFailed(e.error))
+        except Exception as e:
+            # Never leave the ASR stage waiting on a queue nobody feeds
+            self._put(self._windows, _StageFailed(e))
 
 
 def transcribe_with_vad_pipeline(
@@ -22,73 +214,221 @@ def transcribe_with_vad_pipeline(
     window_max: float = 30.0,
     language: str = "vi",
     postprocess_options: Optional[dict] = None,
+    batch_size: Optional[int] = None,
+    num_workers: Optional[int] = None,
+    decoding=None,
+    pack_windows: bool = True,
+    segment_callback: Optional[Callable[[Dict], None]] = None,
 ):
     """Run the full requested pipeline and return structured results.
 
+    Decoding, VAD and ASR overlap: the file is decoded block by block in a
+    background thread, VAD scores the blocks as they arrive and every window
+    is handed to ASR as soon as it closes (see `_StreamingStages`). Each
+    window is peak-normalized on its own (the peak of the whole file is not
+    known yet), so a window's samples do not depend on the audio before it.
+
+    Windows up to 30s are decoded `batch_size` at a time in a single
+    encoder/decoder forward pass (see `transcribe_batch`); `batch_size`
+    defaults to `inference.batch_size` from the settings manager. Use
+    `batch_size=1` to transcribe windows one by one.
+
+    When `num_workers` (default `resource.num_workers`) is above 1, windows
+    are instead fanned out to a pool of worker processes, each holding its
+    own model (see `core.asr.chunk_scheduler`), as they close.
+
+    Results are stored in the transcript cache keyed by the decoded audio
+    and every option above; the key is known once decoding finishes (long
+    before ASR does), and a cached result then cancels the remaining work.
+    Each window is also cached by the hash of its own samples: after changing
+    `vad_threshold`, `window_max` or the post-processing options, only windows
+    whose boundaries actually moved are decoded again.
+
+    With `pack_windows` (default) speech segments are packed into windows of
+    up to `window_max` (<= 30s) seconds of speech and the silence between
+    them is dropped (see `vad.pack_segments_into_windows`), so each Whisper
+    encoder pass is filled with speech; `window_min` only applies to the
+    unpacked 20-30s grouping.
+
+    `decoding` is a decoding profile name ("fast" / "accurate") or a
+    `DecodingProfile`; None uses `inference.decoding_profile`.
+
+    `segment_callback` receives each post-processed segment (index, start,
+    end, text) as soon as its window is transcribed (not with `num_workers` > 1).
+
     Returns Dict with keys: 'segments' (list), 'text' (full text), 'duration'
     """
     postprocess_options = postprocess_options or {}
+    if batch_size is None:
+        batch_size = load_settings()["inference"]["batch_size"]
+    decoding = get_decoding_profile(decoding)
 
-    # 1) Normalize audio to 16k mono PCM
-    norm_path, sr, y = normalize_audio_to_wav(audio_path, target_sr=16000)
+    # 1-4) Decode (16k mono, into a growing memmap) -> Silero VAD -> merge / pack into windows
+    sr = 16000
+    stages = _StreamingStages(audio_path, sr, vad_threshold, pack_windows, window_min, window_max).start()
     try:
-        duration = len(y) / sr
+        return _run_asr_stage(
+            stages, model_size, language, postprocess_options, batch_size, num_workers, decoding,
+            cache_options={
+                "vad_threshold": vad_threshold,
+                "window_min": window_min,
+                "window_max": window_max,
+                "batched": batch_size > 1,
+                "packed": pack_windows,
+                "postprocess": postprocess_options,
+                "decoding": decoding.cache_options(),
+                "normalize": "window",
+            },
+            segment_callback=segment_callback,
+        )
+    finally:
+        stages.close()
 
-        # 2) Load Silero VAD
-        device = "cpu"
-        model, utils = vad_module.load_silero_vad(device=device)
 
-        # 3) Get speech timestamps
-        timestamps = vad_module.get_speech_timestamps_from_array(y, sr, model, utils, threshold=vad_threshold)
-        timestamps = vad_module.merge_close_timestamps(timestamps, max_gap=0.5)
+class _CacheHit(Exception):
+    def __init__(self, result: Dict):
+        super().__init__("cached")
+        self.result = result
 
-        # 4) Group into 20-30s windows
-        windows = vad_module.group_segments_into_windows(timestamps, min_dur=window_min, max_dur=window_max, audio_duration=duration)
 
-        # If no windows (e.g., model failed or no speech detected), fallback to single window
-        if not windows:
-            windows = [{"start": 0.0, "end": duration}]
+def _run_asr_stage(stages: _StreamingStages, model_size: str, language: str, postprocess_options: dict,
+                   batch_size: int, num_workers: Optional[int], decoding, cache_options: dict,
+                   segment_callback: Optional[Callable[[Dict], None]] = None) -> Optional[Dict]:
+    """Consume windows from the VAD stage as they close and transcribe them."""
+    sr = stages.sr
+    cache = get_transcript_cache()
+    cache_state = {"key": None, "checked": not cache.enabled}
+
+    def check_cache():
+        """Once decoding is done the fingerprint is final: look the whole file up."""
+        if cache_state["checked"] or not stages.decoded.is_set():
+            return
+        cache_state["checked"] = True
+        cache_state["key"] = make_cache_key(
+            stages.fingerprint.hexdigest(),
+            "whisper-vad-pipeline",
+            model_size,
+            language,
+            cache_options,
+            precision=resolve_precision(default_device()),
+        )
+        cached = cache.get(cache_state["key"])
+        if cached is not None:
+            raise _CacheHit(cached)
+
+    windows: List[Dict] = []
+    raw_texts: Dict[int, str] = {}
+
+    def finished(idx: int, result: Optional[Dict]):
+        raw_texts[idx] = result.get("text", "") if result else ""
+        if segment_callback is not None:
+            window = windows[idx]
+            segment_callback({"index": idx, "start": window["start"], "end": window["end"],
+                              "text": _postprocess(raw_texts[idx], postprocess_options)})
+
+    def incoming():
+        for window in stages.windows():
+            check_cache()
+            windows.append(window)
+            yield len(windows) - 1, window
+
+    def result():
+        check_cache()  # decode is always done by now
+        return _store(cache_state["key"], _assemble_result(windows, raw_texts, stages.duration, postprocess_options))
+
+    try:
+        num_workers, threads_per_worker = plan_workers(num_workers)
+        if num_workers > 1:
+            # 5-6) Parallel: every worker process loads its own model once; windows are submitted as they close.
+            #      A cache hit raised from `incoming()` cancels the windows still queued in the pool
+            ordered = transcribe_chunks_parallel(
+                ((w["start"], w["end"], stages.window_audio(w)) for _, w in incoming()),
+                backend="whisper",
+                model_size=model_size,
+                sr=sr,
+                language=language,
+                num_workers=num_workers,
+                threads_per_worker=threads_per_worker,
+                decoding=decoding,
+            )
+            # Windows are already in time order, so the sorted results line up
+            for idx, (_, _, chunk_result) in enumerate(ordered):
+                raw_texts[idx] = chunk_result.get("text", "") if chunk_result else ""
+            return result()
 
-        # 5) Load Whisper model (force CPU, fp16=False inside transcribe)
+        # 5) Load Whisper model (force CPU, fp16=False inside transcribe) while decode + VAD run
         st.info(f"🔁 Loading Whisper model ({model_size}) — this may take a moment...")
         whisper_model, device = get_asr_model(model_size, backend='whisper')
         if whisper_model is None:
             st.error("❌ Không thể tải Whisper model")
             return None
 
-        segments = []
-        full_text_parts: List[str] = []
+        if isinstance(whisper_model, RemoteModel):
+            # Inference daemon: it schedules the decodes itself, send window by window
+            transcribe_remote = remote_transcribe_function()
+            for idx, w in incoming():
+                finished(idx, transcribe_remote(whisper_model, stages.window_audio(w), sr=sr,
+                                                language=language, decoding=decoding))
+            return result()
 
-        for idx, w in enumerate(windows):
-            wav_path, s_start, s_end = vad_module.extract_window_audio(y, sr, w)
-            try:
-                result = transcribe_audio(whisper_model, wav_path, sr=sr, language=language, task="transcribe", verbose=False)
-                text = result.get("text", "") if result else ""
-                # Post-process each segment
-                if postprocess_options.get("apply_normalize", True):
-                    text = normalize_vietnamese(text)
-                text = format_text(text, postprocess_options)
-
-                segments.append({"index": idx, "start": s_start, "end": s_end, "text": text})
-                full_text_parts.append(text)
-            finally:
-                # Clean up temporary chunk
-                try:
-                    os.unlink(wav_path)
-                except Exception:
-                    pass
-
-        full_text = "\n".join(full_text_parts)
-
-        return {
-            "segments": segments,
-            "text": full_text,
-            "duration": duration,
-            "windows": windows,
-        }
-    finally:
-        try:
-            if os.path.exists(norm_path):
-                os.unlink(norm_path)
-        except Exception:
-            pass
+        # 6) Decode: batch the windows Whisper can take in one 30s input,
+        #    fall back to per-window long-form transcription for the rest
+        batch: List[tuple] = []
+
+        def run_batch():
+            batch_results = transcribe_batch(whisper_model, [audio for _, audio in batch], language=language,
+                                             task="transcribe", batch_size=batch_size, decoding=decoding)
+            for (idx, _), batch_result in zip(batch, batch_results):
+                finished(idx, batch_result)
+            batch.clear()
+
+        for idx, w in incoming():
+            chunk = stages.window_audio(w)
+            if batch_size > 1 and vad_module.window_duration(w) <= WHISPER_WINDOW_SECONDS:
+                # Only one batch of window copies is held at a time
+                batch.append((idx, chunk))
+                if len(batch) >= batch_size:
+                    run_batch()
+                continue
+            finished(idx, transcribe_audio(whisper_model, chunk, sr=sr, language=language, task="transcribe",
+                                           verbose=False, decoding=decoding))
+        if batch:
+            run_batch()
+        return result()
+    except _CacheHit as hit:
+        return hit.result
+
+
+def _store(cache_key: Optional[str], result: Dict) -> Dict:
+    """Save a pipeline result in the transcript cache (if enabled) and return it."""
+    if cache_key:
+        get_transcript_cache().put(cache_key, result)
+    return result
+
+
+def _assemble_result(windows: List[Dict], raw_texts: Dict[int, str], duration: float, postprocess_options: dict) -> Dict:
+    """Post-process per-window texts and build the pipeline result dict."""
+    segments = []
+    full_text_parts: List[str] = []
+
+    for idx, w in enumerate(windows):
+        text = _postprocess(raw_texts.get(idx, ""), postprocess_options)
+
+        segments.append({"index": idx, "start": w["start"], "end": w["end"], "text": text})
+        full_text_parts.append(text)
+
+    full_text = "\n".join(full_text_parts)
+
+    return {
+        "segments": segments,
+        "text": full_text,
+        "duration": duration,
+        "windows": windows,
+    }
+
+
+def _postprocess(text: str, postprocess_options: dict) -> str:
+    """Normalize + format the text of one segment."""
+    if postprocess_options.get("apply_normalize", True):
+        text = normalize_vietnamese(text)
+    return format_text(text, postprocess_options)
@@ -0,0 +1,170 @@
+"""Load and warm up ASR models when a process starts.
+
+The loaders are lazy, so without preloading the first request after a deploy
+pays the model load plus the first-inference cost (weight paging, allocator
+growth, kernel selection). `ModelPreloader` loads a configured list of
+(backend, size) pairs in parallel threads, runs one short synthetic decode on
+each model and only then reports `ready`, so the first real request is as
+fast as the following ones.
+
+The list comes from `PRELOAD_MODELS`, e.g. "whisper:base,phowhisper:medium"
+("ct2:small" for faster-whisper); a bare backend name uses its default size.
+"""
+import logging
+import os
+import threading
+import time
+from typing import Callable, ContextManager, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from core.asr.backends import SUPPORTED_BACKENDS, load_model, transcribe_function
+from core.asr.model_registry import get_model_info
+
+logger = logging.getLogger(__name__)
+
+WARMUP_SECONDS = 2.0
+WARMUP_SR = 16000
+
+LOADING = "loading"
+WARMING = "warming"
+READY = "ready"
+FAILED = "failed"
+
+
+def parse_preload_spec(spec: Optional[str]) -> List[Tuple[str, str]]:
+    """'whisper:base, phowhisper' -> [('whisper', 'base'), ('phowhisper', <default size>)]."""
+    pairs = []
+    for item in (spec or "").split(","):
+        item = item.strip().lower()
+        if not item:
+            continue
+        backend, _, size = item.partition(":")
+        info = get_model_info(backend)
+        if backend not in SUPPORTED_BACKENDS or info is None:
+            raise ValueError(f"Unsupported ASR backend in preload list: {backend}")
+        size = size or info["default_size"]
+        if size not in info["sizes"]:
+            raise ValueError(f"Unsupported model size '{size}' for {backend}. Available: {', '.join(info['sizes'])}")
+        if (backend, size) not in pairs:
+            pairs.append((backend, size))
+    return pairs
+
+
+def default_preload_pairs() -> List[Tuple[str, str]]:
+    """Pairs from `Config.PRELOAD_MODELS` (env PRELOAD_MODELS)."""
+    try:
+        from config import config
+        spec = config.PRELOAD_MODELS
+    except (ImportError, AttributeError):
+        spec = os.getenv("PRELOAD_MODELS", "")
+    return parse_preload_spec(spec)
+
+
+def warmup_audio(seconds: float = WARMUP_SECONDS, sr: int = WARMUP_SR) -> np.ndarray:
+    """Short synthetic signal (low noise + a voiced-like tone), deterministic."""
+    t = np.arange(int(seconds * sr), dtype=np.float32) / sr
+    rng = np.random.default_rng(0)
+    tone = 0.1 * np.sin(2 * np.pi * 220.0 * t) * (0.5 + 0.5 * np.sin(2 * np.pi * 3.0 * t))
+    return (tone + 0.005 * rng.standard_normal(t.shape[0])).astype(np.float32)
+
+
+def warm_up_model(backend: str, model) -> None:
+    """One greedy decode of `warmup_audio()`; bypasses the transcript cache."""
+    transcribe_fn = transcribe_function(backend)
+    transcribe_fn(model, warmup_audio(), sr=WARMUP_SR, language="vi", use_cache=False, decoding="fast")
+
+
+class ModelPreloader:
+    """Loads and warms up models in background threads; `ready` once all are done."""
+
+    def __init__(self, pairs: List[Tuple[str, str]],
+                 load_fn: Optional[Callable[[str, str], object]] = None,
+                 warmup: bool = True,
+                 use_fn: Optional[Callable[[str, str], ContextManager]] = None):
+        """
+        Args:
+            pairs: [(backend, size)] to preload
+            load_fn: (backend, size) -> model; default `backends.load_model`
+                (Streamlit cache). The API passes its `ModelPool.get`.
+            warmup: run a synthetic decode after loading
+            use_fn: (backend, size) -> context manager yielding the model with
+                its inference lock held (`ModelPool.use`), so the warm-up
+                decode does not overlap a request on the same model
+        """
+        self.pairs = list(pairs)
+        self._load_fn = load_fn or load_model
+        self._use_fn = use_fn
+        self._warmup = warmup
+        self._lock = threading.Lock()
+        self._status: Dict[Tuple[str, str], Dict] = {
+            pair: {"state": LOADING, "seconds": None, "error": None} for pair in self.pairs
+        }
+        self._threads: List[threading.Thread] = []
+        self._done = threading.Event()
+        self.started_at: Optional[float] = None
+
+    def start(self) -> "ModelPreloader":
+        if self._threads:
+            return self
+        self.started_at = time.time()
+        self._threads = [
+            threading.Thread(target=self._preload, args=pair, daemon=True, name=f"preload-{pair[0]}-{pair[1]}")
+            for pair in self.pairs
+        ]
+        for thread in self._threads:
+            thread.start()
+        if not self._threads:
+            self._done.set()
+        else:
+            threading.Thread(target=self._join, daemon=True, name="preload-join").start()
+        return self
+
+    @property
+    def done(self) -> bool:
+        """All pairs finished (loaded or failed)."""
+        return self._done.is_set()
+
+    @property
+    def ready(self) -> bool:
+        """All pairs are loaded and warmed up."""
+        return self.status()["ready"]
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until done (or timeout); returns `ready`."""
+        self._done.wait(timeout)
+        return self.ready
+
+    def status(self) -> Dict:
+        with self._lock:
+            models = [{"backend": b, "size": s, **dict(state)} for (b, s), state in self._status.items()]
+        return {"ready": self._done.is_set() and all(m["state"] == READY for m in models), "models": models}
+
+    def _set(self, pair, **fields):
+        with self._lock:
+            self._status[pair].update(fields)
+
+    def _preload(self, backend: str, size: str):
+        pair = (backend, size)
+        t0 = time.time()
+        try:
+            model = self._load_fn(backend, size)
+            if model is None:
+                raise RuntimeError("loader returned no model")
+            if self._warmup:
+                self._set(pair, state=WARMING)
+                if self._use_fn is not None:
+                    with self._use_fn(backend, size) as locked:
+                        warm_up_model(backend, locked)
+                else:
+                    warm_up_model(backend, model)
+            self._set(pair, state=READY, seconds=round(time.time() - t0, 2))
+            logger.info(f"Preloaded {backend}/{size} in {time.time() - t0:.1f}s")
+        except Exception as e:
+            self._set(pair, state=FAILED, seconds=round(time.time() - t0, 2), error=str(e))
+            logger.warning(f"Failed to preload {backend}/{size}: {str(e)}")
+
+    def _join(self):
+        for thread in self._threads:
+            thread.join()
+        self._done.set()
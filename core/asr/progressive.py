@@ -0,0 +1,128 @@
+"""Two-pass progressive transcription: fast preview, background refinement.
+
+Two daemon threads work through the same list of windows in time order:
+
+- preview: a small model (e.g. whisper-tiny) produces a rough transcript
+  within seconds, window by window;
+- refine: the model of the selected preset re-transcribes every window and
+  replaces the preview text in place as each window finishes.
+
+Neither thread touches Streamlit; the UI polls `snapshot()` (e.g. from an
+`st.fragment(run_every=...)`) and renders whatever is ready.
+"""
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+PENDING = "pending"
+PREVIEW = "preview"
+FINAL = "final"
+
+ASRFn = Callable[[np.ndarray], Optional[Dict]]
+
+
+class ProgressiveTranscription:
+    """Shared state of one progressive run (thread-safe)."""
+
+    def __init__(self, windows: List[Dict], get_window: Callable[[int], np.ndarray],
+                 preview_fn: ASRFn, refine_fn: ASRFn,
+                 time_map_fn: Optional[Callable[[Dict], object]] = None):
+        """
+        Args:
+            windows: [{'start', 'end', ...}] in time order
+            get_window: index -> samples of that window
+            preview_fn / refine_fn: samples -> ASR result (format of `transcribe_audio`)
+            time_map_fn: window -> object with `remap_segments` (e.g. `vad.window_time_map`),
+                used to put segment timestamps on the original timeline
+        """
+        self.windows = windows
+        self._get_window = get_window
+        self._preview_fn = preview_fn
+        self._refine_fn = refine_fn
+        self._time_map_fn = time_map_fn
+        self._lock = threading.Lock()
+        self._cancel = threading.Event()
+        self._chunks = [
+            {"start": w["start"], "end": w["end"], "text": "", "segments": [], "stage": PENDING}
+            for w in windows
+        ]
+        self._threads: List[threading.Thread] = []
+        self.errors: List[str] = []
+        self.started_at: Optional[float] = None
+        self.first_text_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    def start(self) -> "ProgressiveTranscription":
+        self.started_at = time.time()
+        self._threads = [
+            threading.Thread(target=self._run, args=(self._preview_fn, PREVIEW), daemon=True, name="asr-preview"),
+            threading.Thread(target=self._run, args=(self._refine_fn, FINAL), daemon=True, name="asr-refine"),
+        ]
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def cancel(self):
+        self._cancel.set()
+
+    @property
+    def done(self) -> bool:
+        return bool(self._threads) and not any(t.is_alive() for t in self._threads)
+
+    def snapshot(self) -> Dict:
+        """Copy of the current chunks plus progress counters."""
+        with self._lock:
+            chunks = [dict(c) for c in self._chunks]
+        return {
+            "chunks": chunks,
+            "total": len(chunks),
+            "previewed": sum(1 for c in chunks if c["stage"] != PENDING),
+            "refined": sum(1 for c in chunks if c["stage"] == FINAL),
+            "done": self.done,
+        }
+
+    def _run(self, asr_fn: ASRFn, stage: str):
+        for i, window in enumerate(self.windows):
+            if self._cancel.is_set():
+                break
+            with self._lock:
+                if stage == PREVIEW and self._chunks[i]["stage"] == FINAL:
+                    continue  # refinement got here first
+            try:
+                result = asr_fn(self._get_window(i))
+            except Exception as e:
+                with self._lock:
+                    self.errors.append(f"{stage} window {i + 1}: {str(e)}")
+                continue
+            if not isinstance(result, dict):
+                continue
+
+            segments = result.get("segments") or []
+            if self._time_map_fn is not None:
+                segments = self._time_map_fn(window).remap_segments(segments)
+            with self._lock:
+                chunk = self._chunks[i]
+                if stage == PREVIEW and chunk["stage"] == FINAL:
+                    continue
+                chunk.update(text=(result.get("text") or "").strip(), segments=segments, stage=stage)
+                if self.first_text_at is None and chunk["text"]:
+                    self.first_text_at = time.time()
+
+        if stage == FINAL:
+            self.finished_at = time.time()
+            self._cancel.set()  # everything is final: the preview thread can stop
+
+
+def format_chunks(chunks: List[Dict], format_timestamp: Callable[[float], str],
+                  show_timestamps: bool = True, pending_text: str = "…") -> str:
+    """Render chunks as '[MM:SS - MM:SS] text' lines; pending windows show `pending_text`."""
+    lines = []
+    for chunk in chunks:
+        text = chunk["text"] if chunk["stage"] != PENDING else pending_text
+        if not text:
+            continue
+        ts = f"[{format_timestamp(chunk['start'])} - {format_timestamp(chunk['end'])}] " if show_timestamps else ""
+        lines.append(ts + text)
+    return "\n".join(lines)
@@ -3,27 +3,43 @@ Quality Presets Module
 Map quality presets (Fast/Balanced/Accurate) to model sizes
 Ẩn technical details khỏi người dùng thường
 """
-from typing import Dict, Optional
+from typing import Dict, Optional, Tuple
 import torch
 
 QUALITY_PRESETS: Dict[str, Dict[str, str]] = {
     "fast": {
         "whisper": "tiny",
         "phowhisper": "base",
+        "ct2": "base",
+        "decoding": "fast",
         "description": "⚡ Nhanh, ít chính xác, ít tài nguyên",
         "tooltip": "Phù hợp cho demo, preview, hoặc Streamlit Cloud (RAM thấp)"
     },
     "balanced": {
         "whisper": "small",
         "phowhisper": "small",  # or medium if available
+        "ct2": "small",
+        "decoding": "accurate",
         "description": "⚖️ Cân bằng tốc độ và độ chính xác",
         "tooltip": "Tốt cho hầu hết cuộc họp - giữ độ chính xác chấp nhận được mà không quá chậm"
     },
     "accurate": {
         "whisper": "medium",
         "phowhisper": "medium",
+        "ct2": "medium",
+        "decoding": "accurate",
         "description": "🎯 Chậm, chính xác nhất, nhiều tài nguyên",
         "tooltip": "Dùng cho transcript quan trọng (biên bản chính thức). Nếu có GPU, tự động khuyên dùng."
+    },
+    "cascade": {
+        # Draft with the "fast" preset, refine low-confidence windows with "accurate"
+        "whisper": "tiny",
+        "phowhisper": "base",
+        "ct2": "base",
+        "decoding": "fast",
+        "refine_preset": "accurate",
+        "description": "🔁 Cascade: model nhỏ cho mọi đoạn, model lớn chỉ cho đoạn kém tin cậy",
+        "tooltip": "Gần độ chính xác của Accurate với chi phí gần Fast khi audio sạch"
     }
 }
 
@@ -33,7 +49,7 @@ def get_model_size_for_preset(preset: str, model_id: str) -> Optional[str]:
     
     Args:
         preset: Quality preset ("fast", "balanced", "accurate")
-        model_id: Model ID ("whisper" or "phowhisper")
+        model_id: Model ID ("whisper", "phowhisper" or "ct2")
     
     Returns:
         Model size string (e.g., "tiny", "small", "medium") or None if invalid
@@ -46,6 +62,24 @@ def get_model_size_for_preset(preset: str, model_id: str) -> Optional[str]:
     
     return QUALITY_PRESETS[preset][model_id]
 
+def get_decoding_profile_for_preset(preset: str) -> Optional[str]:
+    """
+    Map quality preset to decoding profile ("fast" = greedy, no fallback;
+    "accurate" = beam search settings from Advanced Settings)
+
+    Returns None for unknown presets (use the settings default)
+    """
+    return QUALITY_PRESETS.get(preset, {}).get("decoding")
+
+def get_cascade_presets(preset: str) -> Optional[Tuple[str, str]]:
+    """
+    (draft preset, refine preset) cho preset dạng cascade, None với preset thường
+    """
+    refine = QUALITY_PRESETS.get(preset, {}).get("refine_preset")
+    if refine is None:
+        return None
+    return "fast", refine
+
 def get_preset_description(preset: str) -> str:
     """Get description for a quality preset"""
     return QUALITY_PRESETS.get(preset, {}).get("description", "")
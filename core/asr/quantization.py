@@ -0,0 +1,128 @@
+"""Precision / quantization modes for ASR models.
+
+The effective precision of a loaded model is one of:
+
+- "fp32": default weights and compute;
+- "fp16": half precision compute on CUDA;
+- "bf16": fp32 weights, bfloat16 autocast on CPUs with native bf16 support;
+- "int8": dynamic int8 quantization of the nn.Linear layers (CPU only).
+
+`resolve_precision` maps `model.precision` / `resource.quantization` from the
+settings manager onto what the device can actually run, so loaders can be
+cached per (size, precision) and the same request never loads two variants.
+"""
+import contextlib
+import logging
+from typing import Optional
+
+import torch
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_PRECISIONS = ("fp32", "fp16", "bf16", "int8")
+
+_PRECISION_ATTR = "_asr_precision"
+
+
+def cpu_supports_bf16() -> bool:
+    """True if this CPU has native bfloat16 instructions (AVX512-BF16 / AMX)."""
+    try:
+        return bool(torch.ops.mkldnn._is_mkldnn_bf16_supported())
+    except Exception:
+        pass
+    try:
+        with open("/proc/cpuinfo", "r") as f:
+            flags = f.read()
+        return "avx512_bf16" in flags or "amx_bf16" in flags
+    except OSError:
+        return False
+
+
+def resolve_precision(device: str, precision: Optional[str] = None,
+                      quantization: Optional[str] = None) -> str:
+    """Effective precision for `device` given the requested settings.
+
+    With `precision=None` both values come from `load_settings()`
+    (`model.precision`, `resource.quantization`); an explicit precision wins
+    over the settings. Requests the device cannot honour degrade to the
+    closest supported mode instead of failing.
+    """
+    if precision is None:
+        from core.utils.settings_manager import load_settings
+        settings = load_settings()
+        precision = settings["model"].get("precision", "fp32")
+        if quantization is None:
+            quantization = settings["resource"].get("quantization", "none")
+
+    precision = (precision or "fp32").lower()
+    quantization = (quantization or "none").lower()
+    on_cuda = str(device).startswith("cuda")
+
+    if quantization in ("int8", "int4") or precision == "int8":
+        if quantization == "int4":
+            logger.warning("int4 quantization is not supported; using dynamic int8")
+        if not on_cuda:
+            return "int8"
+        # Dynamic quantized kernels are CPU-only; half precision is the GPU equivalent
+        return "fp16"
+
+    if precision in ("fp16", "bf16"):
+        if on_cuda:
+            return "fp16"
+        if cpu_supports_bf16():
+            return "bf16"
+        logger.info(f"{precision} requested but this CPU has no native bf16 support; using fp32")
+    return "fp32"
+
+
+def _plain_linear_layers(module: torch.nn.Module):
+    """Turn nn.Linear subclasses (e.g. whisper.model.Linear) into plain nn.Linear.
+
+    `quantize_dynamic` only swaps modules whose type is exactly nn.Linear.
+    Whisper's subclass only overrides forward() to cast weights to the input
+    dtype, which is a no-op in fp32, so re-classing it is safe.
+    """
+    for child in module.modules():
+        if isinstance(child, torch.nn.Linear) and type(child) is not torch.nn.Linear:
+            child.__class__ = torch.nn.Linear
+
+
+def quantize_int8(module: torch.nn.Module) -> torch.nn.Module:
+    """Dynamic int8 quantization of every Linear layer (weights int8, activations fp32)."""
+    _plain_linear_layers(module)
+    module.eval()
+    return torch.ao.quantization.quantize_dynamic(module, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+
+
+def apply_precision(model, precision: str, module: Optional[torch.nn.Module] = None):
+    """Prepare a freshly loaded model for `precision` and record it on `model`.
+
+    `module` is the nn.Module holding the weights when `model` is a wrapper
+    (e.g. `pipeline.model` for a HF pipeline). Only int8 changes the weights
+    here; bf16 is applied at inference time (see `inference_context`) and
+    fp16 by the caller (Whisper `fp16=True`, HF `torch_dtype=float16`).
+    """
+    if precision == "int8":
+        quantize_int8(module if module is not None else model)
+    return set_model_precision(model, precision)
+
+
+def set_model_precision(model, precision: str):
+    """Remember the precision a model was loaded with (see `inference_context`)."""
+    if model is not None:
+        try:
+            setattr(model, _PRECISION_ATTR, precision)
+        except Exception:
+            pass
+    return model
+
+
+def model_precision(model) -> str:
+    return getattr(model, _PRECISION_ATTR, "fp32")
+
+
+def inference_context(model):
+    """Context manager for running `model`: bf16 autocast for bf16 models, else a no-op."""
+    if model_precision(model) == "bf16":
+        return torch.autocast("cpu", dtype=torch.bfloat16)
+    return contextlib.nullcontext()
@@ -0,0 +1,238 @@
+"""Content-addressed transcript cache.
+
+A transcription result is stored under a SHA-256 of the normalized audio
+(16kHz mono PCM16) plus everything that influences decoding: model id, model
+size, language and decoding options. Re-running the same recording with the
+same settings - a Streamlit rerun, a re-upload to the API, a re-export -
+returns the stored result instead of repeating the ASR pass.
+
+Entries are JSON files under `Config.TRANSCRIPT_CACHE_DIR`; when the directory
+grows past `Config.TRANSCRIPT_CACHE_MAX_MB`, least recently used entries are
+removed (hits refresh an entry's mtime).
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from core.asr.quantization import model_precision
+from core.audio.audio_processor import as_asr_input
+
+logger = logging.getLogger(__name__)
+
+# Hash PCM in blocks so a multi-hour recording is never copied as a whole
+_HASH_BLOCK_SAMPLES = 1 << 20
+
+_MODEL_ID_ATTR = "_asr_model_identity"
+
+
+def tag_model(model, model_id: str, model_size: str):
+    """Record which (model_id, model_size) a loaded model is, for cache keys."""
+    if model is not None:
+        try:
+            setattr(model, _MODEL_ID_ATTR, (model_id, model_size))
+        except Exception:
+            pass
+    return model
+
+
+def model_identity(model) -> Optional[Tuple[str, str]]:
+    """Return (model_id, model_size) recorded by `tag_model`, or None."""
+    return getattr(model, _MODEL_ID_ATTR, None)
+
+
+class AudioFingerprinter:
+    """`audio_fingerprint` computed block by block, for 16kHz audio that is still being decoded."""
+
+    def __init__(self):
+        self._digest = hashlib.sha256()
+
+    def update(self, samples: np.ndarray):
+        for start in range(0, len(samples), _HASH_BLOCK_SAMPLES):
+            block = samples[start:start + _HASH_BLOCK_SAMPLES]
+            pcm = (np.clip(block, -1.0, 1.0) * 32767.0).astype("<i2")
+            self._digest.update(pcm.tobytes())
+
+    def hexdigest(self) -> str:
+        return self._digest.hexdigest()
+
+
+def audio_fingerprint(y: np.ndarray, sr: int) -> str:
+    """SHA-256 of the audio as 16kHz mono PCM16."""
+    fingerprint = AudioFingerprinter()
+    fingerprint.update(as_asr_input(np.asarray(y), sr))
+    return fingerprint.hexdigest()
+
+
+def make_cache_key(audio_hash: str, model_id: str, model_size: str,
+                   language: Optional[str], options: Optional[Dict] = None,
+                   precision: str = "fp32") -> str:
+    """Combine the audio fingerprint with model and decoding settings.
+
+    Quantized / reduced-precision models can decode slightly differently, so
+    their results get their own keys (fp32 keys are unchanged).
+    """
+    fields = {
+        "audio": audio_hash,
+        "model_id": model_id,
+        "model_size": model_size,
+        "language": language,
+        "options": options or {},
+    }
+    if precision != "fp32":
+        fields["precision"] = precision
+    payload = json.dumps(fields, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _json_default(obj):
+    """Serialize numpy scalars/arrays found in ASR results."""
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    return str(obj)
+
+
+class TranscriptCache:
+    """JSON-file cache of transcription results with size-based LRU eviction."""
+
+    def __init__(self, cache_dir: Optional[str] = None, max_size_mb: Optional[float] = None,
+                 enabled: Optional[bool] = None):
+        from config import config
+        self.cache_dir = Path(cache_dir) if cache_dir else Path(config.TRANSCRIPT_CACHE_DIR)
+        self.max_size_bytes = int((max_size_mb if max_size_mb is not None else config.TRANSCRIPT_CACHE_MAX_MB) * 1024 * 1024)
+        self.enabled = config.TRANSCRIPT_CACHE_ENABLED if enabled is None else enabled
+        self._lock = threading.Lock()
+        # Running estimate of the directory size; None until the first scan
+        self._approx_bytes: Optional[int] = None
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    def get(self, key: str) -> Optional[Dict]:
+        if not self.enabled:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                result = json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Corrupt transcript cache entry {path}: {str(e)}")
+            return None
+        try:
+            os.utime(path, None)  # refresh LRU position
+        except OSError:
+            pass
+        return result
+
+    def put(self, key: str, result: Optional[Dict]):
+        if not self.enabled or result is None:
+            return
+        path = self._path(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # Write atomically so concurrent readers never see a partial file
+            fd, tmp_path = tempfile.mkstemp(dir=str(path.parent), suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(result, f, ensure_ascii=False, default=_json_default)
+                os.replace(tmp_path, path)
+            except BaseException:
+                # Do not leave half-written .tmp files behind (they are never evicted)
+                try:
+                    os.unlink(tmp_path)
+                except OSError:
+                    pass
+                raise
+            written = path.stat().st_size
+        except Exception as e:
+            logger.warning(f"Could not write transcript cache entry: {str(e)}")
+            return
+
+        # Per-window caching writes many small entries; only rescan the
+        # directory when the running estimate says the budget may be exceeded
+        with self._lock:
+            if self._approx_bytes is not None:
+                self._approx_bytes += written
+                if self._approx_bytes <= self.max_size_bytes:
+                    return
+        self._evict()
+
+    def clear(self):
+        with self._lock:
+            for entry in self.cache_dir.glob("*/*.json"):
+                try:
+                    entry.unlink()
+                except OSError:
+                    pass
+            self._approx_bytes = 0
+
+    def _evict(self):
+        """Remove least recently used entries until the cache fits its budget."""
+        with self._lock:
+            entries = []
+            total = 0
+            for entry in self.cache_dir.glob("*/*.json"):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry))
+                total += stat.st_size
+            if total > self.max_size_bytes:
+                entries.sort()
+                for _, size, entry in entries:
+                    if total <= self.max_size_bytes:
+                        break
+                    try:
+                        entry.unlink()
+                        total -= size
+                    except OSError:
+                        pass
+            self._approx_bytes = total
+
+
+_default_cache: Optional[TranscriptCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def get_transcript_cache() -> TranscriptCache:
+    """Process-wide cache instance configured from `config`."""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = TranscriptCache()
+        return _default_cache
+
+
+def transcription_cache_key(model_id: str, model_size: str, y: np.ndarray, sr: int,
+                            language: Optional[str], options: Optional[Dict] = None,
+                            precision: str = "fp32") -> Optional[str]:
+    """Cache key for transcribing exactly these samples, or None if caching is off.
+
+    Because the key covers only the samples passed in, it works at any
+    granularity: a whole recording, a fixed chunk or a single VAD window.
+    """
+    if not get_transcript_cache().enabled:
+        return None
+    return make_cache_key(audio_fingerprint(y, sr), model_id, model_size, language, options, precision)
+
+
+def cache_key_for(model, y: np.ndarray, sr: int, language: Optional[str],
+                  options: Optional[Dict] = None) -> Optional[str]:
+    """Cache key for transcribing `y` with a tagged model, or None if uncacheable."""
+    identity = model_identity(model)
+    if identity is None:
+        return None
+    model_id, model_size = identity
+    return transcription_cache_key(model_id, model_size, y, sr, language, options,
+                                   precision=model_precision(model))
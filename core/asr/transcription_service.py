@@ -9,7 +9,10 @@ import streamlit as st
 from typing import Optional, Dict, List
 import numpy as np
 import time
-from core.audio.audio_processor import _make_safe_temp_copy
+from core.audio.audio_processor import _make_safe_temp_copy, as_asr_input
+from core.asr.result_cache import cache_key_for, get_transcript_cache, tag_model
+from core.asr.quantization import apply_precision, inference_context, model_precision, resolve_precision
+from core.asr.decoding import get_decoding_profile
 
 def check_python_version():
     """
@@ -38,18 +41,33 @@ if _python_version_warning:
     except:
         print(_python_version_warning)
 
+def _select_device():
+    # On Streamlit Cloud, force CPU even if CUDA is detected
+    if os.getenv("STREAMLIT_SHARING", "").lower() == "true" or os.getenv("STREAMLIT_SERVER_BASE_URL", ""):
+        return "cpu"  # Force CPU on Cloud
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+
+def load_whisper_model(model_size="base", precision=None):
+    """
+    Load Whisper model với cache
+
+    Args:
+        model_size: tiny / base / small / medium / large
+        precision: fp32 | fp16 | bf16 | int8; None = theo settings
+            (`model.precision`, `resource.quantization`). Mỗi (model_size,
+            precision) được cache riêng, nên bản int8 không thay thế bản fp32.
+    """
+    return _load_whisper_model(model_size, resolve_precision(_select_device(), precision))
+
+
 @st.cache_resource
-def load_whisper_model(model_size="base"):
-    """Load Whisper model với cache"""
+def _load_whisper_model(model_size, precision):
     try:
-        # On Streamlit Cloud, force CPU even if CUDA is detected
-        if os.getenv("STREAMLIT_SHARING", "").lower() == "true" or os.getenv("STREAMLIT_SERVER_BASE_URL", ""):
-            device = "cpu"  # Force CPU on Cloud
-        else:
-            device = "cuda" if torch.cuda.is_available() else "cpu"
-        
+        device = _select_device()
         model = whisper.load_model(model_size, device=device)
-        return model, device
+        model = apply_precision(model, precision)
+        return tag_model(model, "whisper", model_size), device
     except KeyError as ke:
         # Handle "missing field" errors
         error_msg = f"Missing field error: {str(ke)}"
@@ -69,7 +87,8 @@ def load_whisper_model(model_size="base"):
             # Retry with CPU
             try:
                 model = whisper.load_model(model_size, device="cpu")
-                return model, "cpu"
+                model = apply_precision(model, resolve_precision("cpu", precision))
+                return tag_model(model, "whisper", model_size), "cpu"
             except Exception as cpu_err:
                 st.error(f"❌ Không thể load model ngay cả với CPU: {str(cpu_err)}")
                 return None, None
@@ -86,18 +105,28 @@ def load_whisper_model(model_size="base"):
         return None, None
 
 def transcribe_audio(model, audio_path_or_array, sr=16000, language="vi", 
-                     task="transcribe", verbose=False):
+                     task="transcribe", verbose=False, use_cache=True, decoding=None):
     """
     Transcribe audio sử dụng Whisper
     
     Args:
         model: Whisper model
-        audio_path_or_array: Đường dẫn file hoặc numpy array
-        sr: Sample rate
+        audio_path_or_array: Đường dẫn file hoặc numpy array (array được
+            truyền thẳng vào Whisper, không ghi file tạm / không gọi ffmpeg)
+        sr: Sample rate của array (tự resample về 16kHz nếu khác)
         language: Ngôn ngữ (vi cho tiếng Việt)
         task: "transcribe" hoặc "translate"
         verbose: Hiển thị thông tin chi tiết
+        use_cache: False để bỏ qua transcript cache (vd. audio live/streaming)
+        decoding: Tên decoding profile ("fast" | "accurate") hoặc DecodingProfile;
+            None = theo settings (`inference.decoding_profile`)
+
+    Với input là array và model được load qua `load_whisper_model`, kết quả
+    được lưu vào transcript cache (theo hash audio + model + options) và trả
+    về ngay ở những lần gọi sau.
     """
+    cache_key = None
+    profile = get_decoding_profile(decoding)
     try:
         if model is None:
             return None
@@ -148,6 +177,16 @@ def transcribe_audio(model, audio_path_or_array, sr=16000, language="vi",
                 st.error(f"❌ Không thể truy cập file: {audio_path_to_use}")
                 st.warning("💡 File có thể đang bị khóa bởi process khác hoặc không có quyền truy cập.")
                 return None
+        else:
+            # In-memory path: float32 16kHz view, no temp WAV / ffmpeg decode
+            audio_path_to_use = as_asr_input(np.asarray(audio_path_or_array), sr)
+            if use_cache:
+                cache_key = cache_key_for(model, audio_path_to_use, 16000, language,
+                                          {"task": task, "decoding": profile.cache_options()})
+            if cache_key:
+                cached = get_transcript_cache().get(cache_key)
+                if cached is not None:
+                    return cached
 
         # Final check before transcribe
         if isinstance(audio_path_to_use, str):
@@ -157,13 +196,17 @@ def transcribe_audio(model, audio_path_or_array, sr=16000, language="vi",
 
         # Transcribe
         try:
-            result = model.transcribe(
-                audio_path_to_use,
-                language=language,
-                task=task,
-                verbose=verbose,
-                fp16=False  # Sử dụng fp32 để tránh lỗi trên CPU
-            )
+            with inference_context(model):
+                result = model.transcribe(
+                    audio_path_to_use,
+                    language=language,
+                    task=task,
+                    verbose=verbose,
+                    fp16=model_precision(model) == "fp16",  # fp32 trừ khi chọn fp16 trên CUDA
+                    **profile.whisper_transcribe_kwargs()
+                )
+            if cache_key:
+                get_transcript_cache().put(cache_key, result)
             return result
         except FileNotFoundError as fnf_err:
             error_msg = str(fnf_err)
@@ -257,6 +300,125 @@ def transcribe_audio(model, audio_path_or_array, sr=16000, language="vi",
             st.error(f"Lỗi khi transcribe: {error_msg}")
         return None
 
+def transcribe_batch(model, audio_arrays: List[np.ndarray], language="vi",
+                     task="transcribe", batch_size: int = 16, decoding=None) -> List[Optional[Dict]]:
+    """
+    Transcribe nhiều cửa sổ audio ngắn (<= 30s, 16kHz) theo batch
+
+    Mỗi cửa sổ được pad/trim về 30s và chuyển thành log-mel, sau đó N cửa sổ
+    được stack thành một tensor (N, n_mels, 3000) để encoder/decoder của
+    Whisper chạy một lần forward cho cả batch thay vì N lần.
+
+    Args:
+        model: Whisper model
+        audio_arrays: Danh sách numpy array float32 16kHz, mỗi array <= 30s
+        language: Ngôn ngữ (vi cho tiếng Việt)
+        task: "transcribe" hoặc "translate"
+        batch_size: Số cửa sổ tối đa trong một lần forward
+        decoding: Decoding profile (xem `transcribe_audio`). Cửa sổ không qua
+            được ngưỡng compression ratio / log-prob được decode lại ở
+            temperature cao hơn, tối đa `max_fallbacks` lần
+
+    Returns:
+        List kết quả (cùng thứ tự với input), mỗi phần tử có format giống
+        `transcribe_audio` hoặc None nếu batch chứa nó bị lỗi
+
+    Mỗi cửa sổ được cache riêng theo hash samples của nó, nên khi chạy lại
+    với ranh giới cửa sổ gần như không đổi chỉ các cửa sổ mới/thay đổi được
+    đưa vào model.
+    """
+    if model is None:
+        return [None] * len(audio_arrays)
+
+    profile = get_decoding_profile(decoding)
+    cache = get_transcript_cache()
+    results: List[Optional[Dict]] = [None] * len(audio_arrays)
+    cache_keys: List[Optional[str]] = []
+    pending: List[int] = []
+    for i, audio in enumerate(audio_arrays):
+        key = cache_key_for(model, audio, whisper.audio.SAMPLE_RATE, language,
+                            {"task": task, "mode": "batch", "decoding": profile.cache_options()})
+        cache_keys.append(key)
+        cached = cache.get(key) if key else None
+        if cached is not None:
+            results[i] = cached
+        else:
+            pending.append(i)
+
+    batch_size = max(1, int(batch_size))
+    n_mels = getattr(getattr(model, "dims", None), "n_mels", 80)
+
+    for batch_start in range(0, len(pending), batch_size):
+        batch_idx = pending[batch_start:batch_start + batch_size]
+        batch = [audio_arrays[i] for i in batch_idx]
+        try:
+            mels = torch.stack([
+                whisper.log_mel_spectrogram(
+                    whisper.pad_or_trim(np.asarray(audio, dtype=np.float32)),
+                    n_mels=n_mels,
+                )
+                for audio in batch
+            ]).to(model.device)
+            decoded = _decode_with_fallback(model, mels, profile, language, task)
+        except Exception as e:
+            st.error(f"Lỗi khi transcribe batch: {str(e)}")
+            continue
+
+        for i, audio, item in zip(batch_idx, batch, decoded):
+            # Same silence rule as whisper.transcribe
+            is_silence = (item.no_speech_prob > profile.no_speech_threshold
+                          and item.avg_logprob < profile.logprob_threshold)
+            text = "" if is_silence else item.text.strip()
+            duration = len(audio) / whisper.audio.SAMPLE_RATE
+            results[i] = {
+                "text": text,
+                "language": item.language,
+                "segments": [{
+                    "start": 0.0,
+                    "end": duration,
+                    "text": text,
+                    "avg_logprob": item.avg_logprob,
+                    "no_speech_prob": item.no_speech_prob,
+                    "compression_ratio": item.compression_ratio,
+                    "temperature": item.temperature,
+                }] if text else [],
+            }
+            if cache_keys[i]:
+                cache.put(cache_keys[i], results[i])
+
+    return results
+
+def _decode_with_fallback(model, mels, profile, language, task):
+    """
+    `whisper.decode` cho cả batch, rồi decode lại chỉ các cửa sổ lỗi (lặp từ,
+    log-prob thấp) ở temperature kế tiếp trong `profile.temperatures()`.
+    Số lần thử mỗi cửa sổ bị chặn bởi `max_fallbacks`.
+    """
+    temperatures = profile.temperatures()
+    decoded = [None] * len(mels)
+    todo = list(range(len(mels)))
+    for attempt, temperature in enumerate(temperatures):
+        options = whisper.DecodingOptions(
+            language=language,
+            task=task,
+            fp16=model_precision(model) == "fp16",  # fp32 trừ khi chọn fp16 trên CUDA
+            without_timestamps=True,
+            **profile.whisper_decoding_kwargs(temperature),
+        )
+        with torch.no_grad(), inference_context(model):
+            batch_out = whisper.decode(model, mels[todo], options)
+
+        is_last = attempt == len(temperatures) - 1
+        retry = []
+        for j, item in zip(todo, batch_out):
+            decoded[j] = item
+            if not is_last and profile.needs_fallback(item.avg_logprob, item.compression_ratio, item.no_speech_prob):
+                retry.append(j)
+        if not retry:
+            break
+        todo = retry
+    return decoded
+
 def format_transcript(result: Dict, with_timestamps: bool = True) -> str:
     """Format transcript từ kết quả Whisper"""
     if result is None:
@@ -3,16 +3,22 @@ Module xử lý audio: upload, preprocessing, visualization
 Pipeline không cần ffprobe - sử dụng librosa/soundfile thay vì pydub
 """
 import os
+import logging
 import librosa
 import soundfile as sf
 import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
 import io
+import shutil
 import streamlit as st
 import tempfile
 from typing import Tuple, List, Dict
 
+from core.audio.time_map import TimeMap, splice_audio
+
+logger = logging.getLogger(__name__)
+
 def validate_audio_format(file_extension: str) -> Tuple[bool, str]:
     """
     Validate audio format được hỗ trợ
@@ -31,26 +37,38 @@ def validate_audio_format(file_extension: str) -> Tuple[bool, str]:
     else:
         return False, f"Format {file_ext_lower.upper()} không được hỗ trợ. Các format được hỗ trợ: {', '.join(supported_formats).upper()}"
 
-def load_audio(file, sr=16000):
+def load_audio(file, sr=16000, mmap=False):
     """
     Load audio file và convert về format chuẩn
-    Sử dụng librosa/soundfile thay vì pydub để tránh phụ thuộc ffprobe
+    Decode + resample một lần bằng ffmpeg pipe (`core.audio.ffmpeg_decoder`),
+    upload được pipe thẳng vào ffmpeg không qua file tạm; fallback librosa /
+    soundfile nếu không có ffmpeg
     
     Args:
-        file: File object hoặc bytes
+        file: File object, bytes hoặc đường dẫn file
         sr: Target sample rate (default 16kHz)
+        mmap: True để decode theo block vào memmap (xem `core.audio.audio_store`)
+            - dùng cho recording dài; samples giống hệt đường in-memory
     
     Returns:
         Tuple (audio_array: np.ndarray, sample_rate: int) hoặc (None, None) nếu lỗi
     """
+    if mmap:
+        return _load_audio_mmap(file, sr)
     try:
-        # Đọc audio file vào temporary file để librosa có thể xử lý
-        if isinstance(file, bytes):
-            audio_bytes = file
+        if isinstance(file, str):
+            source = file
+            file_extension = os.path.splitext(file)[1].lstrip('.').lower() or 'wav'
+            size = os.path.getsize(file) if os.path.isfile(file) else 0
+        elif isinstance(file, bytes):
+            source = file
             file_extension = 'wav'  # Default
+            size = len(file)
         else:
-            audio_bytes = file.read()
+            # File-like (Streamlit UploadedFile): pipe thẳng vào ffmpeg, không copy ra bytes
+            source = file
             file_extension = file.name.split('.')[-1].lower() if hasattr(file, 'name') else 'wav'
+            size = _stream_size(file)
         
         # Validate audio format
         is_valid_format, format_msg = validate_audio_format(file_extension)
@@ -62,22 +80,33 @@ def load_audio(file, sr=16000):
                 pass
         
         # Kiểm tra file không rỗng
-        if len(audio_bytes) == 0:
+        if size == 0:
             try:
                 st.error("❌ File audio rỗng! Vui lòng upload file hợp lệ.")
             except:
                 pass
             return None, None
+
+        y = _decode_with_ffmpeg(source, sr, file_extension)
+        if y is not None:
+            return y, sr
         
-        # Tạo temporary file để librosa load
-        # Librosa có thể load mp3, flac, ogg, m4a mà không cần pydub
-        with tempfile.NamedTemporaryFile(delete=False, suffix=f'.{file_extension}') as tmp_file:
-            tmp_file.write(audio_bytes)
-            tmp_path = tmp_file.name
+        # Fallback: librosa có thể load mp3, flac, ogg, m4a mà không cần pydub
+        if isinstance(source, str):
+            tmp_path = None
+            load_path = source
+        else:
+            if not isinstance(source, bytes):
+                source.seek(0)
+                source = source.read()
+            with tempfile.NamedTemporaryFile(delete=False, suffix=f'.{file_extension}') as tmp_file:
+                tmp_file.write(source)
+                tmp_path = tmp_file.name
+            load_path = tmp_path
         
         try:
             # Sử dụng librosa để load - hỗ trợ nhiều format và tự động convert về mono
-            y, sr_original = librosa.load(tmp_path, sr=sr, mono=True)
+            y, sr_original = librosa.load(load_path, sr=sr, mono=True)
             
             # Validate audio data
             if y is None or len(y) == 0:
@@ -98,7 +127,7 @@ def load_audio(file, sr=16000):
             error_msg = str(librosa_error)
             # Nếu librosa không load được, thử soundfile
             try:
-                y, sr_original = sf.read(tmp_path)
+                y, sr_original = sf.read(load_path)
                 # Convert to mono nếu stereo
                 if len(y.shape) > 1:
                     y = np.mean(y, axis=1)
@@ -125,10 +154,11 @@ def load_audio(file, sr=16000):
                 return None, None
         finally:
             # Xóa temporary file
-            try:
-                os.unlink(tmp_path)
-            except Exception:
-                pass
+            if tmp_path:
+                try:
+                    os.unlink(tmp_path)
+                except Exception:
+                    pass
         
         return y, sr
     except Exception as e:
@@ -138,6 +168,99 @@ def load_audio(file, sr=16000):
             pass
         return None, None
 
+def _stream_size(file) -> int:
+    """Kích thước file-like (byte) mà không đọc nội dung; vị trí đọc về đầu file."""
+    size = getattr(file, "size", None)
+    if size is None:
+        file.seek(0, os.SEEK_END)
+        size = file.tell()
+    file.seek(0)
+    return int(size)
+
+
+def _decode_with_ffmpeg(source, sr: int, file_extension: str = ""):
+    """Decode bằng ffmpeg pipe; None nếu không có ffmpeg / decode lỗi (caller fallback librosa)."""
+    from core.audio.ffmpeg_decoder import FFmpegDecodeError, decode_audio
+
+    if isinstance(source, (bytes, bytearray)):
+        # Đặt tên để decoder biết container (M4A/MP4 cần file seek được)
+        source = io.BytesIO(source)
+        source.name = f"upload.{file_extension or 'wav'}"
+    try:
+        return decode_audio(source, sr=sr)
+    except FFmpegDecodeError as e:
+        logger.info(f"FFmpeg decode failed, falling back to librosa: {str(e)}")
+        return None
+
+
+def _load_audio_mmap(file, sr=16000):
+    """`load_audio(..., mmap=True)`: decode upload theo chunk vào memmap.
+
+    Không normalize, giống đường in-memory (caller cần peak-normalize thì dùng
+    `load_normalized_audio`).
+
+    Có ffmpeg thì upload được đọc thẳng (soundfile / ffmpeg pipe); không có thì
+    copy ra file tạm theo chunk để librosa đọc.
+    """
+    from core.audio.audio_store import decode_to_memmap
+    from core.audio.ffmpeg_decoder import ffmpeg_available
+
+    tmp_path = None
+    try:
+        if isinstance(file, str):
+            source_path = file
+        elif ffmpeg_available():
+            name = getattr(file, "name", "audio.wav")
+            file_extension = name.split('.')[-1].lower() if '.' in name else 'wav'
+            if isinstance(file, bytes):
+                file = io.BytesIO(file)
+                file.name = f"upload.{file_extension}"
+            if _stream_size(file) == 0:
+                try:
+                    st.error("❌ File audio rỗng! Vui lòng upload file hợp lệ.")
+                except:
+                    pass
+                return None, None
+            return decode_to_memmap(file, target_sr=sr, normalize=False), sr
+        else:
+            name = getattr(file, "name", "audio.wav")
+            file_extension = name.split('.')[-1].lower() if '.' in name else 'wav'
+            is_valid_format, format_msg = validate_audio_format(file_extension)
+            if not is_valid_format:
+                try:
+                    st.warning(f"⚠️ {format_msg}")
+                except:
+                    pass
+            with tempfile.NamedTemporaryFile(delete=False, suffix=f'.{file_extension}') as tmp_file:
+                if isinstance(file, bytes):
+                    tmp_file.write(file)
+                else:
+                    shutil.copyfileobj(file, tmp_file, length=1024 * 1024)
+                tmp_path = tmp_file.name
+            source_path = tmp_path
+
+        if os.path.getsize(source_path) == 0:
+            try:
+                st.error("❌ File audio rỗng! Vui lòng upload file hợp lệ.")
+            except:
+                pass
+            return None, None
+
+        return decode_to_memmap(source_path, target_sr=sr, normalize=False), sr
+    except Exception as e:
+        try:
+            st.error(f"❌ Lỗi khi load audio: {str(e)}")
+        except:
+            pass
+        return None, None
+    finally:
+        if tmp_path:
+            try:
+                os.unlink(tmp_path)
+            except Exception:
+                pass
+
+
 def preprocess_audio(y, sr, normalize: bool = False, remove_noise: bool = False):
     """Tiền xử lý audio
 
@@ -186,10 +309,30 @@ def _make_safe_temp_copy(original_path: str) -> str:
     return tmp_name
 
 
-def normalize_audio_to_wav(audio_path: str, target_sr: int = 16000) -> Tuple[str, int, np.ndarray]:
+def as_asr_input(y: np.ndarray, sr: int, target_sr: int = 16000) -> np.ndarray:
     """
-    Load audio -> mono 16kHz WAV PCM16, peak-normalized.
-    Returns (normalized_wav_path, sr, samples)
+    Return samples in the layout Whisper/PhoWhisper take directly: 1-D float32 at 16kHz.
+
+    When `y` is already mono float32 at `target_sr` (the usual case for
+    `st.session_state.audio_data`) this returns `y` itself - slices stay views
+    and no bytes are copied. Otherwise the array is downmixed, converted and
+    resampled once in memory instead of round-tripping through a WAV file.
+    """
+    if y.ndim > 1:
+        y = np.mean(y, axis=1)
+    if sr != target_sr:
+        y = librosa.resample(np.asarray(y, dtype=np.float32), orig_sr=sr, target_sr=target_sr)
+    return np.ascontiguousarray(y, dtype=np.float32)
+
+
+def load_normalized_audio(audio_path: str, target_sr: int = 16000, mmap: bool = False) -> Tuple[int, np.ndarray]:
+    """
+    Load audio -> mono float32 samples at target_sr, peak-normalized, without
+    writing anything to disk. Returns (sr, samples)
+
+    With `mmap=True` the file is decoded block by block into a memory-mapped
+    array instead (see `core.audio.audio_store.decode_to_memmap`), so peak RAM
+    stays around one block for multi-hour recordings.
 
     To avoid Windows "No such file" / WinError 2 issues when the original filename
     is odd (e.g., trailing spaces) or when external tools have trouble with the
@@ -205,15 +348,17 @@ def normalize_audio_to_wav(audio_path: str, target_sr: int = 16000) -> Tuple[str
         else:
             load_path = audio_path
 
-        y, sr = librosa.load(load_path, sr=target_sr, mono=True)
+        if mmap:
+            from core.audio.audio_store import decode_to_memmap
+            return target_sr, decode_to_memmap(load_path, target_sr=target_sr)
+
+        y = _decode_with_ffmpeg(load_path, target_sr)
+        if y is None:
+            y, _ = librosa.load(load_path, sr=target_sr, mono=True)
         peak = float(np.max(np.abs(y))) if y.size else 0.0
         if peak > 0:
             y = y / peak
-
-        out_wav = tempfile.NamedTemporaryFile(delete=False, suffix=".wav")
-        out_wav.close()
-        sf.write(out_wav.name, y, target_sr, subtype="PCM_16")
-        return out_wav.name, target_sr, y
+        return target_sr, y
     finally:
         if temp_copy and os.path.exists(temp_copy):
             try:
@@ -222,6 +367,20 @@ def normalize_audio_to_wav(audio_path: str, target_sr: int = 16000) -> Tuple[str
                 pass
 
 
+def normalize_audio_to_wav(audio_path: str, target_sr: int = 16000) -> Tuple[str, int, np.ndarray]:
+    """
+    Load audio -> mono 16kHz WAV PCM16, peak-normalized.
+    Returns (normalized_wav_path, sr, samples)
+
+    Prefer `load_normalized_audio` when the caller only needs the samples.
+    """
+    sr, y = load_normalized_audio(audio_path, target_sr=target_sr)
+    out_wav = tempfile.NamedTemporaryFile(delete=False, suffix=".wav")
+    out_wav.close()
+    sf.write(out_wav.name, y, sr, subtype="PCM_16")
+    return out_wav.name, sr, y
+
+
 def apply_noise_reduction(y: np.ndarray, sr: int, cutoff: int = 80):
     """
     Simple high-pass filter to reduce low-frequency noise.
@@ -265,6 +424,9 @@ def detect_speech_segments(y: np.ndarray, sr: int, vad_threshold: float = 0.5, m
     Returns a list of dicts: [{'start': float, 'end': float}, ...]. If Silero VAD
     cannot be loaded or finds no speech, this function falls back to returning
     a single window that spans the whole audio.
+
+    VAD scores the audio chunk by chunk (see `vad.iter_speech_timestamps`), so
+    its memory use does not grow with the recording length.
     """
     # Pick sensible window sizes based on intent if not provided
     if min_dur is None or max_dur is None:
@@ -304,6 +466,87 @@ def detect_speech_segments(y: np.ndarray, sr: int, vad_threshold: float = 0.5, m
     return windows
 
 
+# Speech giữ thêm ở hai đầu mỗi đoạn VAD để không cắt mất âm đầu/cuối từ
+SILENCE_GUARD_PAD = 0.2
+
+
+def _vad_speech_ranges(y: np.ndarray, sr: int, vad_threshold: float = 0.5, min_gap: float = 0.5,
+                       guard_pad: float = SILENCE_GUARD_PAD):
+    """Speech timestamps (giây) mở rộng `guard_pad` mỗi bên và gộp các khoảng lặng <= min_gap.
+
+    Returns None nếu không load được Silero VAD.
+    """
+    try:
+        from core.audio.vad import load_silero_vad, get_speech_timestamps_from_array, merge_close_timestamps
+    except Exception:
+        return None
+
+    model, utils = load_silero_vad(device="cpu")
+    if model is None or utils is None:
+        return None
+
+    duration = len(y) / sr
+    timestamps = get_speech_timestamps_from_array(y, sr, model, utils, threshold=vad_threshold)
+    padded = [
+        {"start": max(0.0, ts["start"] - guard_pad), "end": min(duration, ts["end"] + guard_pad)}
+        for ts in timestamps
+    ]
+    return merge_close_timestamps(padded, max_gap=min_gap)
+
+
+def detect_packed_windows(y: np.ndarray, sr: int, vad_threshold: float = 0.5, min_gap: float = 0.5,
+                          max_dur: float = 30.0, guard_pad: float = SILENCE_GUARD_PAD) -> List[Dict]:
+    """Detect speech with Silero VAD and pack it into windows of up to max_dur seconds of speech.
+
+    Silence between speech segments is dropped; decode each window with
+    `vad.window_audio`, and map ASR timestamps back to the original audio
+    with `vad.window_time_map`. If Silero VAD cannot be loaded the audio is
+    cut into plain max_dur windows ({'start', 'end'}, no 'pieces').
+    """
+    timestamps = _vad_speech_ranges(y, sr, vad_threshold, min_gap, guard_pad)
+    if timestamps is None:
+        return [{"start": s0 / sr, "end": s1 / sr} for s0, s1 in chunk_signal(y, sr, max_dur)]
+
+    from core.audio.vad import pack_segments_into_windows
+    return pack_segments_into_windows(timestamps, max_dur=max_dur, audio_duration=len(y) / sr)
+
+
+def compress_silence(y: np.ndarray, sr: int, vad_threshold: float = 0.5, min_silence: float = 1.0,
+                     guard_pad: float = SILENCE_GUARD_PAD, min_saving: float = 0.05) -> Tuple[np.ndarray, TimeMap]:
+    """
+    Bỏ các khoảng lặng dài hơn `min_silence` giây trước khi đưa audio vào ASR.
+
+    Speech (Silero VAD) được giữ thêm `guard_pad` giây mỗi bên rồi nối liền
+    nhau. Returns (samples, time_map): dùng `time_map.remap_result(result)`
+    để đưa segment/word timestamp của `transcribe_audio` /
+    `transcribe_phowhisper` về thời gian gốc (xem `transcribe_without_silence`).
+
+    Trả về `y` nguyên vẹn (map đồng nhất) khi không có VAD, không phát hiện
+    được speech, hoặc phần bỏ đi nhỏ hơn `min_saving` độ dài audio. Với `y`
+    là memmap, phần speech được ghép vào một memmap mới thay vì copy vào RAM.
+    """
+    duration = len(y) / sr
+    identity = TimeMap([(0.0, 0.0, duration)])
+    ranges = _vad_speech_ranges(y, sr, vad_threshold, min_silence, guard_pad)
+    if not ranges:
+        return y, identity
+
+    kept = sum(r["end"] - r["start"] for r in ranges)
+    if kept >= duration * (1.0 - min_saving):
+        return y, identity
+    return splice_audio(y, sr, [(r["start"], r["end"]) for r in ranges],
+                        mmap=isinstance(y, np.memmap))
+
+
+def transcribe_without_silence(transcribe_fn, y: np.ndarray, sr: int, **kwargs):
+    """
+    `transcribe_fn(samples, sr)` trên audio đã bỏ khoảng lặng (`compress_silence`);
+    timestamp trong kết quả được map về thời gian gốc.
+    """
+    compressed, time_map = compress_silence(y, sr, **kwargs)
+    return time_map.remap_result(transcribe_fn(compressed, sr))
+
+
 def format_timestamp(seconds: float) -> str:
     """
     Format seconds -> MM:SS
@@ -312,11 +555,17 @@ def format_timestamp(seconds: float) -> str:
     s = int(seconds % 60)
     return f"{m:02d}:{s:02d}"
 
-def plot_waveform(y, sr, title="Waveform"):
-    """Vẽ waveform"""
+def plot_waveform(y, sr, title="Waveform", max_points: int = 10000):
+    """Vẽ waveform (audio dài được vẽ dạng min/max envelope, tối đa `max_points` điểm)"""
     fig, ax = plt.subplots(figsize=(12, 4))
-    time = np.linspace(0, len(y) / sr, len(y))
-    ax.plot(time, y, linewidth=0.5)
+    if len(y) > max_points:
+        from core.audio.audio_store import peak_envelope
+        mins, maxs, bucket = peak_envelope(y, max_points=max_points)
+        time = np.arange(len(mins)) * bucket / sr
+        ax.fill_between(time, mins, maxs, linewidth=0.5)
+    else:
+        time = np.linspace(0, len(y) / sr, len(y))
+        ax.plot(time, y, linewidth=0.5)
     ax.set_xlabel('Thời gian (s)', fontsize=10)
     ax.set_ylabel('Amplitude', fontsize=10)
     ax.set_title(title, fontsize=12)
@@ -327,7 +576,7 @@ def plot_waveform(y, sr, title="Waveform"):
 def plot_spectrogram(y, sr, title="Spectrogram"):
     """Vẽ spectrogram"""
     # Tính spectrogram
-    D = librosa.stft(y)
+    D = librosa.stft(np.asarray(y, dtype=np.float32))
     S_db = librosa.amplitude_to_db(np.abs(D), ref=np.max)
     
     fig, ax = plt.subplots(figsize=(12, 6))
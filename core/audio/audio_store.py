@@ -0,0 +1,273 @@
+"""
+Memory-mapped audio cho recording dài (nhiều giờ).
+
+`decode_to_memmap` decode file một lần, theo từng block, thành float32 mono
+ở target_sr trong một file tạm rồi trả về `np.memmap`. Memmap là ndarray nên
+mọi code hiện có (slice cho VAD/ASR, `len`, `as_asr_input`, hash cache) dùng
+được ngay; chỉ các trang được truy cập mới nằm trong RAM và kernel có thể
+thả chúng bất cứ lúc nào. Peak RAM khi decode ~ một block thay vì vài bản
+copy của cả file (decode stereo 48kHz + resample + normalize + WAV).
+
+Các helper `iter_blocks`, `peak_envelope` và `block_rms` xử lý array theo
+block để visualization/diarization không materialize toàn bộ tín hiệu.
+"""
+import logging
+import os
+import tempfile
+import threading
+import uuid
+from pathlib import Path
+from typing import Iterator, Tuple
+
+import numpy as np
+import soundfile as sf
+
+logger = logging.getLogger(__name__)
+
+# Độ dài block khi decode / duyệt array (giây)
+DEFAULT_BLOCK_SECONDS = 30.0
+
+
+def _mmap_dir() -> Path:
+    try:
+        from config import config
+        path = Path(config.AUDIO_MMAP_DIR)
+    except (ImportError, AttributeError):
+        path = Path(tempfile.gettempdir()) / "audio_mmap"
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+class _StreamResampler:
+    """Resample liên tục qua nhiều block (soxr stream; fallback librosa từng block)."""
+
+    def __init__(self, orig_sr: int, target_sr: int):
+        self.orig_sr = orig_sr
+        self.target_sr = target_sr
+        self._stream = None
+        if orig_sr != target_sr:
+            try:
+                import soxr
+                self._stream = soxr.ResampleStream(orig_sr, target_sr, 1, dtype="float32")
+            except ImportError:
+                logger.warning("soxr not available; resampling block by block with librosa")
+
+    def process(self, block: np.ndarray, last: bool = False) -> np.ndarray:
+        if self.orig_sr == self.target_sr:
+            return block
+        if self._stream is not None:
+            return self._stream.resample_chunk(block, last=last)
+        import librosa
+        return librosa.resample(block, orig_sr=self.orig_sr, target_sr=self.target_sr)
+
+
+def iter_decoded_blocks(source, target_sr: int, block_seconds: float) -> Iterator[np.ndarray]:
+    """Yield mono float32 blocks ở target_sr.
+
+    `source` là đường dẫn hoặc file-like. Dùng soundfile (WAV/FLAC/OGG/MP3 tùy
+    libsndfile) để đọc từng block. Với format soundfile không đọc được (vd.
+    M4A) thì stream qua ffmpeg pipe (`ffmpeg_decoder.iter_decode_chunks`), chỉ
+    fallback về librosa.load (decode cả file) khi không có ffmpeg.
+    """
+    try:
+        f = sf.SoundFile(source)
+    except Exception as e:
+        from core.audio.ffmpeg_decoder import ffmpeg_available, iter_decode_chunks
+        if hasattr(source, "seek"):
+            source.seek(0)
+        if ffmpeg_available():
+            logger.info(f"soundfile cannot stream {getattr(source, 'name', source)} ({str(e)}); decoding with ffmpeg")
+            yield from iter_decode_chunks(source, sr=target_sr, chunk_seconds=block_seconds)
+            return
+        logger.info(f"soundfile cannot stream {source} ({str(e)}); decoding with librosa")
+        import librosa
+        y, _ = librosa.load(source, sr=target_sr, mono=True)
+        yield np.asarray(y, dtype=np.float32)
+        return
+
+    with f:
+        resampler = _StreamResampler(f.samplerate, target_sr)
+        block_frames = max(1, int(block_seconds * f.samplerate))
+        while True:
+            block = f.read(block_frames, dtype="float32", always_2d=True)
+            last = len(block) < block_frames
+            mono = block.mean(axis=1) if block.shape[1] > 1 else block[:, 0]
+            out = resampler.process(np.ascontiguousarray(mono, dtype=np.float32), last=last)
+            if len(out):
+                yield out
+            if last:
+                return
+
+
+def decode_to_memmap(audio_path, target_sr: int = 16000, normalize: bool = True,
+                     block_seconds: float = DEFAULT_BLOCK_SECONDS) -> np.memmap:
+    """
+    Decode audio (đường dẫn hoặc file-like) một lần thành memmap float32 mono
+    ở target_sr (peak-normalized nếu `normalize`), RAM chỉ cần cỡ một block.
+
+    File backing nằm trong `Config.AUDIO_MMAP_DIR`; trên POSIX nó được unlink
+    ngay sau khi map nên tự biến mất khi memmap được giải phóng.
+    """
+    out_path = _mmap_dir() / f"{uuid.uuid4().hex}.f32"
+    length = 0
+    peak = 0.0
+    try:
+        with open(out_path, "wb") as out:
+            for block in iter_decoded_blocks(audio_path, target_sr, block_seconds):
+                if block.size:
+                    peak = max(peak, float(np.max(np.abs(block))))
+                out.write(block.astype("<f4", copy=False).tobytes())
+                length += len(block)
+
+        if length == 0:
+            raise ValueError(f"No audio samples decoded from {audio_path}")
+
+        y = np.memmap(out_path, dtype="<f4", mode="r+", shape=(length,))
+        if normalize and peak > 0:
+            for start, block in iter_blocks(y, target_sr, block_seconds):
+                y[start:start + len(block)] = block / peak
+            y.flush()
+    except Exception:
+        _unlink(out_path)
+        raise
+
+    # POSIX: mapping vẫn hợp lệ sau unlink -> không để lại file rác
+    _unlink(out_path)
+    return y
+
+
+def empty_memmap(length: int) -> np.ndarray:
+    """
+    Memmap float32 `length` sample (toàn zero) trong `Config.AUDIO_MMAP_DIR`,
+    để ghi kết quả xử lý audio dài mà không cấp phát cả array trong RAM.
+    File được unlink ngay sau khi map (POSIX), như `decode_to_memmap`.
+    """
+    if length <= 0:
+        return np.zeros(0, dtype=np.float32)
+    out_path = _mmap_dir() / f"{uuid.uuid4().hex}.f32"
+    try:
+        with open(out_path, "wb") as out:
+            out.truncate(length * 4)  # sparse: chưa tốn trang nào cho tới khi được ghi
+        y = np.memmap(out_path, dtype="<f4", mode="r+", shape=(length,))
+    except Exception:
+        _unlink(out_path)
+        raise
+    _unlink(out_path)
+    return y
+
+
+class GrowingAudioBuffer:
+    """
+    Float32 mono samples appended block by block while other threads read them.
+
+    Used by the streaming pipeline: the decode stage `append`s, later stages
+    map the samples decoded so far with `view()` (a memmap, no copy). The
+    file lives in `Config.AUDIO_MMAP_DIR` and is removed by `close()`.
+    """
+
+    def __init__(self, sr: int = 16000):
+        self.sr = sr
+        self.path = _mmap_dir() / f"{uuid.uuid4().hex}.f32"
+        self._file = open(self.path, "wb")
+        self._lock = threading.Lock()
+        self._length = 0
+
+    def append(self, block: np.ndarray):
+        block = np.asarray(block, dtype="<f4")
+        self._file.write(block.tobytes())
+        self._file.flush()  # readers map the file: samples must be on it before `len` grows
+        with self._lock:
+            self._length += len(block)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._length
+
+    @property
+    def duration(self) -> float:
+        return len(self) / self.sr
+
+    def view(self) -> np.ndarray:
+        """Read-only memmap of the samples appended so far."""
+        length = len(self)
+        if length == 0:
+            return np.zeros(0, dtype=np.float32)
+        return np.memmap(self.path, dtype="<f4", mode="r", shape=(length,))
+
+    def close(self):
+        try:
+            self._file.close()
+        except OSError:
+            pass
+        # POSIX: views that are still mapped stay valid after unlink
+        _unlink(self.path)
+
+
+def _unlink(path: Path):
+    try:
+        os.unlink(path)
+    except OSError:
+        # Windows không cho xóa file đang map; để lại cho cleanup TEMP_DIR
+        pass
+
+
+def iter_blocks(y: np.ndarray, sr: int, block_seconds: float = DEFAULT_BLOCK_SECONDS) -> Iterator[Tuple[int, np.ndarray]]:
+    """Yield (start_sample, view) theo block liên tiếp, không copy."""
+    step = max(1, int(block_seconds * sr))
+    for start in range(0, len(y), step):
+        yield start, y[start:start + step]
+
+
+def peak_envelope(y: np.ndarray, max_points: int = 10000) -> Tuple[np.ndarray, np.ndarray, int]:
+    """
+    Min/max envelope của waveform với tối đa `max_points` bucket.
+
+    Returns (mins, maxs, samples_per_bucket); tính theo từng bucket nên dùng
+    được trực tiếp trên memmap nhiều giờ.
+    """
+    n = len(y)
+    bucket = max(1, int(np.ceil(n / max_points)))
+    n_buckets = int(np.ceil(n / bucket)) if n else 0
+    mins = np.empty(n_buckets, dtype=np.float32)
+    maxs = np.empty(n_buckets, dtype=np.float32)
+    # Xử lý nhiều bucket một lần nhưng giới hạn ~4M samples mỗi lượt
+    per_pass = max(1, (1 << 22) // bucket)
+    for b0 in range(0, n_buckets, per_pass):
+        b1 = min(n_buckets, b0 + per_pass)
+        seg = np.asarray(y[b0 * bucket:b1 * bucket], dtype=np.float32)
+        full = (len(seg) // bucket) * bucket
+        if full:
+            view = seg[:full].reshape(-1, bucket)
+            mins[b0:b0 + len(view)] = view.min(axis=1)
+            maxs[b0:b0 + len(view)] = view.max(axis=1)
+        if full < len(seg):
+            mins[b1 - 1] = seg[full:].min()
+            maxs[b1 - 1] = seg[full:].max()
+    return mins, maxs, bucket
+
+
+def block_rms(y: np.ndarray, frame_length: int, hop_length: int,
+              block_frames: int = 100000) -> np.ndarray:
+    """
+    Bằng `librosa.feature.rms(y=y, frame_length, hop_length)[0]` (center=True,
+    pad zero) nhưng tính theo block, nên bộ nhớ tạm không tỉ lệ với độ dài audio.
+    """
+    import librosa
+
+    n = len(y)
+    n_frames = 1 + n // hop_length
+    half = frame_length // 2
+    out = np.empty(n_frames, dtype=np.float32)
+    for f0 in range(0, n_frames, block_frames):
+        f1 = min(n_frames, f0 + block_frames)
+        # Frame f nhìn vào [f*hop - half, f*hop - half + frame_length)
+        lo = f0 * hop_length - half
+        hi = (f1 - 1) * hop_length - half + frame_length
+        seg = np.zeros(hi - lo, dtype=np.float32)
+        src_lo, src_hi = max(0, lo), min(n, hi)
+        if src_hi > src_lo:
+            seg[src_lo - lo:src_hi - lo] = y[src_lo:src_hi]
+        out[f0:f1] = librosa.feature.rms(
+            y=seg, frame_length=frame_length, hop_length=hop_length, center=False
+        )[0][:f1 - f0]
+    return out
@@ -0,0 +1,245 @@
+"""
+Decode audio bằng một tiến trình ffmpeg duy nhất (decode + downmix + resample).
+
+`librosa.load(path, sr=16000)` decode qua soundfile/audioread rồi mới resample
+bằng một bước riêng, và với MP3/M4A thường phải decode hai lần. Ở đây ffmpeg
+(`ffmpeg_setup.get_ffmpeg_path`) nhận file gốc và ghi thẳng PCM float32 mono
+16kHz ra stdout; Python chỉ `readinto` vào một buffer cấp phát trước:
+
+- `decode_audio(source)`: cả file -> np.ndarray float32;
+- `iter_decode_chunks(source, chunk_seconds)`: từng chunk cố định, RAM chỉ
+  cỡ một chunk (dùng cho memmap / pipeline streaming).
+
+`source` là đường dẫn, bytes hoặc file-like (được pipe vào stdin, không cần
+file tạm; riêng MP4/M4A cần seek nên được ghi ra file tạm trước).
+"""
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+from typing import IO, Iterator, Optional, Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+AudioSource = Union[str, bytes, IO[bytes]]
+
+DEFAULT_CHUNK_SECONDS = 30.0
+# Container cần seek (moov atom thường ở cuối file) -> không decode được từ pipe
+_SEEKABLE_ONLY = {"m4a", "mp4", "mov", "3gp", "aac"}
+_PIPE_BLOCK = 1024 * 1024
+
+
+class FFmpegDecodeError(RuntimeError):
+    """ffmpeg không có hoặc không decode được input."""
+
+
+def ffmpeg_binary() -> Optional[str]:
+    """Đường dẫn ffmpeg đã cấu hình (cache của `ensure_ffmpeg`, không chạy lại `-version`)."""
+    from core.audio.ffmpeg_setup import get_ffmpeg_info, get_ffmpeg_path
+    path = get_ffmpeg_info().get("ffmpeg_path")
+    return path or get_ffmpeg_path()
+
+
+def ffmpeg_available() -> bool:
+    return ffmpeg_binary() is not None
+
+
+def _command(ffmpeg: str, input_arg: str, sr: int) -> list:
+    return [
+        ffmpeg, "-nostdin", "-hide_banner", "-loglevel", "error", "-threads", "0",
+        "-i", input_arg,
+        "-vn", "-f", "f32le", "-acodec", "pcm_f32le", "-ac", "1", "-ar", str(sr),
+        "pipe:1",
+    ]
+
+
+def _source_extension(source: AudioSource) -> str:
+    name = source if isinstance(source, str) else getattr(source, "name", "")
+    return os.path.splitext(str(name))[1].lower().lstrip(".")
+
+
+def _expected_samples(source: AudioSource, sr: int) -> Optional[int]:
+    """Số sample dự kiến từ header (`probe.probe_audio`), để cấp phát buffer một lần."""
+    if not isinstance(source, str):
+        return None
+    from core.audio.probe import AudioProbeError, probe_audio
+    try:
+        duration = probe_audio(source).duration
+    except AudioProbeError:
+        return None
+    return int(np.ceil(duration * sr)) if duration else None
+
+
+class _FFmpegProcess:
+    """ffmpeg subprocess đọc `source` (path / stdin) và ghi f32le ra stdout."""
+
+    def __init__(self, source: AudioSource, sr: int):
+        ffmpeg = ffmpeg_binary()
+        if ffmpeg is None:
+            raise FFmpegDecodeError("Không tìm thấy FFmpeg")
+        self._tmp_path = None
+        self._feeder = None
+        stdin_data = None
+        if isinstance(source, str):
+            input_arg = source
+        elif _source_extension(source) in _SEEKABLE_ONLY:
+            input_arg = self._tmp_path = self._spool(source)
+        else:
+            input_arg = "pipe:0"
+            stdin_data = source
+        try:
+            self.proc = subprocess.Popen(
+                _command(ffmpeg, input_arg, sr),
+                stdin=subprocess.PIPE if stdin_data is not None else subprocess.DEVNULL,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                bufsize=0,
+            )
+        except OSError as e:
+            self._cleanup()
+            raise FFmpegDecodeError(f"Không chạy được FFmpeg: {str(e)}")
+        # stderr đọc ở thread riêng để ffmpeg không bị block khi log nhiều
+        self._stderr = bytearray()
+        threading.Thread(target=self._drain_stderr, daemon=True).start()
+        if stdin_data is not None:
+            self._feeder = threading.Thread(target=self._feed, args=(stdin_data,), daemon=True)
+            self._feeder.start()
+
+    @staticmethod
+    def _spool(source) -> str:
+        suffix = "." + (_source_extension(source) or "bin")
+        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
+            if isinstance(source, (bytes, bytearray, memoryview)):
+                tmp.write(source)
+            else:
+                shutil.copyfileobj(source, tmp, length=_PIPE_BLOCK)
+            return tmp.name
+
+    def _feed(self, data):
+        try:
+            if isinstance(data, (bytes, bytearray, memoryview)):
+                view = memoryview(data)
+                for start in range(0, len(view), _PIPE_BLOCK):
+                    self.proc.stdin.write(view[start:start + _PIPE_BLOCK])
+            else:
+                while True:
+                    block = data.read(_PIPE_BLOCK)
+                    if not block:
+                        break
+                    self.proc.stdin.write(block)
+        except (BrokenPipeError, ValueError, OSError):
+            pass  # ffmpeg đã dừng (lỗi input) - lỗi được báo qua returncode
+        finally:
+            try:
+                self.proc.stdin.close()
+            except OSError:
+                pass
+
+    def _drain_stderr(self):
+        for line in self.proc.stderr:
+            if len(self._stderr) < 64 * 1024:
+                self._stderr.extend(line)
+
+    def readinto(self, buf: memoryview) -> int:
+        """Đọc đầy `buf` (trừ khi hết stream); trả về số byte đã đọc."""
+        total = 0
+        while total < len(buf):
+            n = self.proc.stdout.readinto(buf[total:])
+            if not n:
+                break
+            total += n
+        return total
+
+    def finish(self):
+        """Chờ ffmpeg kết thúc; raise nếu decode lỗi."""
+        try:
+            self.proc.stdout.close()
+            code = self.proc.wait()
+            if self._feeder is not None:
+                self._feeder.join(timeout=5)
+            if code != 0:
+                message = self._stderr.decode("utf-8", "replace").strip().splitlines()
+                raise FFmpegDecodeError(f"FFmpeg decode lỗi (code {code}): {message[-1] if message else ''}")
+        finally:
+            self._cleanup()
+
+    def kill(self):
+        try:
+            self.proc.kill()
+            self.proc.wait()
+        except OSError:
+            pass
+        self._cleanup()
+
+    def _cleanup(self):
+        if self._tmp_path:
+            try:
+                os.unlink(self._tmp_path)
+            except OSError:
+                pass
+            self._tmp_path = None
+
+
+def decode_audio(source: AudioSource, sr: int = 16000, expected_samples: Optional[int] = None) -> np.ndarray:
+    """
+    Decode `source` thành float32 mono ở `sr` bằng một lần chạy ffmpeg.
+
+    Buffer được cấp phát trước theo `expected_samples` (hoặc header của file)
+    và chỉ nới rộng khi thiếu. Raise FFmpegDecodeError nếu ffmpeg lỗi / không có.
+    """
+    if expected_samples is None:
+        expected_samples = _expected_samples(source, sr)
+    capacity = max(sr, int(expected_samples or sr * 60) + sr // 10)  # +0.1s cho sai số resample
+    buf = np.empty(capacity, dtype=np.float32)
+    n_bytes = 0
+
+    proc = _FFmpegProcess(source, sr)
+    try:
+        while True:
+            raw = memoryview(buf).cast("B")
+            n_bytes += proc.readinto(raw[n_bytes:])
+            if n_bytes < raw.nbytes:
+                break
+            grown = np.empty(int(len(buf) * 1.5) + sr, dtype=np.float32)
+            grown[:len(buf)] = buf
+            buf = grown
+        proc.finish()
+    except BaseException:
+        proc.kill()
+        raise
+
+    n = n_bytes // 4
+    if n == 0:
+        raise FFmpegDecodeError("Không decode được sample nào (file rỗng hoặc không có audio)")
+    # Trả về view nếu buffer vừa khít, copy nếu dư nhiều (để không giữ RAM thừa)
+    return buf[:n] if n >= 0.9 * len(buf) else buf[:n].copy()
+
+
+def iter_decode_chunks(source: AudioSource, sr: int = 16000,
+                       chunk_seconds: float = DEFAULT_CHUNK_SECONDS) -> Iterator[np.ndarray]:
+    """
+    Yield các chunk float32 mono `chunk_seconds` giây (chunk cuối ngắn hơn).
+
+    Mỗi chunk là một array mới (caller giữ lại được); ffmpeg chạy song song
+    với consumer nhờ pipe buffer. Dừng vòng lặp sớm sẽ kill ffmpeg.
+    """
+    chunk_samples = max(1, int(chunk_seconds * sr))
+    proc = _FFmpegProcess(source, sr)
+    finished = False
+    try:
+        while True:
+            chunk = np.empty(chunk_samples, dtype=np.float32)
+            n = proc.readinto(memoryview(chunk).cast("B")) // 4
+            if n:
+                yield chunk if n == chunk_samples else chunk[:n].copy()
+            if n < chunk_samples:
+                break
+        finished = True
+        proc.finish()
+    finally:
+        if not finished:
+            proc.kill()
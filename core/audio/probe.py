@@ -0,0 +1,176 @@
+"""
+Probe audio chỉ từ header: duration, sample rate, channels, codec.
+
+Chạy trong vài ms, không decode sample nào, nên API / trang Audio Input /
+batch tools có thể từ chối file quá dài (`Config.MAX_AUDIO_DURATION`) hoặc
+quá lớn (`Config.MAX_UPLOAD_SIZE`) trước khi tốn CPU và RAM cho decode:
+
+1. `soundfile.info` (WAV/FLAC/OGG/MP3 tùy libsndfile) đọc header;
+2. fallback: `ffmpeg -i <file>` không có output - ffmpeg chỉ đọc container
+   header rồi in `Duration:` / `Stream ... Audio:` ra stderr.
+"""
+import logging
+import os
+import re
+import subprocess
+import tempfile
+from dataclasses import dataclass
+from typing import IO, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+PROBE_TIMEOUT = 10.0
+# File-like không có path: chỉ cần phần đầu file cho header (MP4 moov ở cuối thì không đủ)
+_HEAD_BYTES = 4 * 1024 * 1024
+
+_DURATION_RE = re.compile(r"Duration:\s*(\d+):(\d+):(\d+(?:\.\d+)?)")
+_AUDIO_RE = re.compile(r"Stream #\S+.*?Audio:\s*([^,\s]+)[^,]*,\s*(\d+)\s*Hz,\s*([^,]+)")
+_CHANNEL_LAYOUTS = {"mono": 1, "stereo": 2, "2.1": 3, "quad": 4, "5.0": 5, "5.1": 6, "6.1": 7, "7.1": 8}
+
+
+@dataclass
+class AudioProbe:
+    """Metadata của file audio (None khi header không cho biết)."""
+    duration: Optional[float]
+    sample_rate: Optional[int]
+    channels: Optional[int]
+    codec: Optional[str]
+    size_bytes: Optional[int] = None
+    source: str = "soundfile"  # soundfile | ffmpeg
+
+    def to_dict(self) -> dict:
+        return {
+            "duration": self.duration,
+            "sample_rate": self.sample_rate,
+            "channels": self.channels,
+            "codec": self.codec,
+            "size_bytes": self.size_bytes,
+        }
+
+
+class AudioProbeError(ValueError):
+    """Không đọc được header (không phải file audio hoặc không có audio stream)."""
+
+
+def _size_of(source) -> Optional[int]:
+    if isinstance(source, str):
+        return os.path.getsize(source) if os.path.isfile(source) else None
+    if isinstance(source, (bytes, bytearray)):
+        return len(source)
+    size = getattr(source, "size", None)
+    if size is None and hasattr(source, "seek"):
+        pos = source.tell()
+        source.seek(0, os.SEEK_END)
+        size = source.tell()
+        source.seek(pos)
+    return size
+
+
+def _probe_soundfile(source) -> Optional[AudioProbe]:
+    try:
+        import io
+        import soundfile as sf
+        target = io.BytesIO(source) if isinstance(source, (bytes, bytearray)) else source
+        info = sf.info(target)
+    except Exception:
+        return None
+    finally:
+        if hasattr(source, "seek"):
+            source.seek(0)
+    duration = info.frames / info.samplerate if info.frames > 0 and info.samplerate else None
+    return AudioProbe(duration=duration, sample_rate=info.samplerate, channels=info.channels,
+                      codec=(info.subtype or info.format or "").lower() or None)
+
+
+def parse_ffmpeg_header(stderr: str) -> Optional[AudioProbe]:
+    """Parse `Duration:` và stream Audio đầu tiên từ log của `ffmpeg -i`."""
+    audio = _AUDIO_RE.search(stderr)
+    if audio is None:
+        return None
+    duration = None
+    match = _DURATION_RE.search(stderr)
+    if match:
+        hours, minutes, seconds = match.groups()
+        duration = int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+    layout = audio.group(3).strip().split("(")[0].strip()
+    channels = _CHANNEL_LAYOUTS.get(layout)
+    if channels is None:
+        count = re.match(r"(\d+)\s*channels", layout)
+        channels = int(count.group(1)) if count else None
+    return AudioProbe(duration=duration, sample_rate=int(audio.group(2)), channels=channels,
+                      codec=audio.group(1).lower(), source="ffmpeg")
+
+
+def _probe_ffmpeg(source) -> Optional[AudioProbe]:
+    from core.audio.ffmpeg_decoder import ffmpeg_binary
+    ffmpeg = ffmpeg_binary()
+    if ffmpeg is None:
+        return None
+
+    tmp_path = None
+    if isinstance(source, str):
+        path = source
+    else:
+        # Không có path: ghi phần đầu ra file tạm (đủ cho header của hầu hết container)
+        suffix = os.path.splitext(str(getattr(source, "name", "")))[1] or ".bin"
+        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
+            if isinstance(source, (bytes, bytearray)):
+                tmp.write(source[:_HEAD_BYTES])
+            else:
+                source.seek(0)
+                tmp.write(source.read(_HEAD_BYTES))
+                source.seek(0)
+            tmp_path = path = tmp.name
+    try:
+        proc = subprocess.run(
+            [ffmpeg, "-hide_banner", "-nostdin", "-i", path],
+            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, timeout=PROBE_TIMEOUT,
+        )
+        # ffmpeg luôn exit != 0 ở đây (không có output file) - chỉ cần log header
+        return parse_ffmpeg_header(proc.stderr.decode("utf-8", "replace"))
+    except (OSError, subprocess.TimeoutExpired) as e:
+        logger.info(f"ffmpeg probe failed: {str(e)}")
+        return None
+    finally:
+        if tmp_path:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+
+
+def probe_audio(source: Union[str, bytes, IO[bytes]]) -> AudioProbe:
+    """
+    Đọc metadata của `source` (đường dẫn, bytes hoặc file-like) mà không decode.
+
+    Raise AudioProbeError nếu cả soundfile lẫn ffmpeg đều không nhận ra audio.
+    """
+    size = _size_of(source)
+    probe = _probe_soundfile(source)
+    if probe is None or probe.duration is None:
+        probe = _probe_ffmpeg(source) or probe
+    if probe is None:
+        raise AudioProbeError("Could not read audio header (corrupt file or no audio stream)")
+    probe.size_bytes = size
+    return probe
+
+
+def _limits():
+    try:
+        from config import config
+        return float(config.MAX_AUDIO_DURATION), config.MAX_UPLOAD_SIZE * 1024 * 1024
+    except (ImportError, AttributeError):
+        return float(os.getenv("MAX_AUDIO_DURATION", "3600")), int(os.getenv("MAX_UPLOAD_SIZE", "200")) * 1024 * 1024
+
+
+def limit_violation(probe: AudioProbe, max_duration: Optional[float] = None,
+                    max_bytes: Optional[int] = None) -> Optional[str]:
+    """Thông báo lỗi nếu `probe` vượt MAX_AUDIO_DURATION / MAX_UPLOAD_SIZE, None nếu hợp lệ."""
+    default_duration, default_bytes = _limits()
+    max_duration = default_duration if max_duration is None else max_duration
+    max_bytes = default_bytes if max_bytes is None else max_bytes
+    if probe.size_bytes is not None and max_bytes and probe.size_bytes > max_bytes:
+        return f"File too large ({probe.size_bytes / (1024 * 1024):.0f}MB). Maximum size: {max_bytes / (1024 * 1024):.0f}MB"
+    if probe.duration is not None and max_duration and probe.duration > max_duration:
+        return f"Audio too long ({probe.duration / 60:.1f} min). Maximum duration: {max_duration / 60:.0f} min"
+    return None
@@ -0,0 +1,143 @@
+"""
+Ghép các đoạn audio (bỏ phần im lặng ở giữa) và map timestamp về thời gian gốc.
+
+`splice_audio` nối các khoảng [start, end) (giây, thời gian gốc) thành một
+array liên tục, chèn `gap` giây zero giữa hai đoạn để từ cuối đoạn trước
+không dính vào từ đầu đoạn sau. `TimeMap` là map tuyến tính từng khúc từ thời
+gian trong array đã ghép về thời gian gốc, dùng để sửa segment/word timestamp
+do Whisper / PhoWhisper trả về.
+"""
+from bisect import bisect_right
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+class TimeMap:
+    """Map thời gian trong audio đã ghép -> thời gian gốc.
+
+    `pieces` là list (spliced_start, original_start, duration) theo giây,
+    sắp xếp theo spliced_start. Trong một piece thời gian trôi như nhau ở hai
+    phía; phần nằm giữa hai piece (gap chèn vào) không có thời gian gốc tương
+    ứng và được kéo về mép speech gần nhất.
+    """
+
+    def __init__(self, pieces: Sequence[Tuple[float, float, float]]):
+        self.pieces = [tuple(float(v) for v in p) for p in pieces]
+        self._starts = [p[0] for p in self.pieces]
+
+    @classmethod
+    def for_ranges(cls, ranges: Sequence[Tuple[float, float]], sr: int, gap: float = 0.0,
+                   n_samples: Optional[int] = None) -> "TimeMap":
+        """Map của `splice_audio(y, sr, ranges, gap)` mà không cần audio."""
+        pieces = []
+        pos = 0
+        gap_samples = max(0, int(gap * sr))
+        for s0, s1 in _sample_bounds(ranges, sr, n_samples):
+            pieces.append((pos / sr, s0 / sr, (s1 - s0) / sr))
+            pos += s1 - s0 + gap_samples
+        return cls(pieces)
+
+    @property
+    def duration(self) -> float:
+        """Độ dài audio đã ghép (giây), không tính gap sau piece cuối."""
+        if not self.pieces:
+            return 0.0
+        return self.pieces[-1][0] + self.pieces[-1][2]
+
+    @property
+    def original_span(self) -> Tuple[float, float]:
+        """(start, end) của phần audio gốc được giữ lại."""
+        if not self.pieces:
+            return 0.0, 0.0
+        return self.pieces[0][1], self.pieces[-1][1] + self.pieces[-1][2]
+
+    def to_original(self, t: Optional[float], is_end: bool = False) -> Optional[float]:
+        """Thời gian gốc của điểm `t` (giây) trong audio đã ghép.
+
+        Điểm rơi vào gap được kéo về đầu piece kế tiếp (start) hoặc cuối
+        piece trước đó (`is_end=True`).
+        """
+        if t is None or not self.pieces:
+            return t
+        t = float(t)
+        i = bisect_right(self._starts, t) - 1
+        if i < 0:
+            return self.pieces[0][1]
+        if is_end and i > 0 and t == self._starts[i]:
+            i -= 1  # end đúng tại ranh giới: thuộc piece trước
+        spliced_start, original_start, duration = self.pieces[i]
+        if t <= spliced_start + duration:
+            return original_start + (t - spliced_start)
+        if not is_end and i + 1 < len(self.pieces):
+            return self.pieces[i + 1][1]
+        return original_start + duration
+
+    def remap_segments(self, segments: Optional[List[Dict]]) -> List[Dict]:
+        """Copy các segment (và `words` nếu có) với start/end theo thời gian gốc."""
+        remapped = []
+        for seg in segments or []:
+            seg = dict(seg)
+            self._remap_span(seg)
+            if isinstance(seg.get("words"), list):
+                seg["words"] = [self._remap_span(dict(w)) for w in seg["words"]]
+            remapped.append(seg)
+        return remapped
+
+    def remap_result(self, result: Optional[Dict]) -> Optional[Dict]:
+        """Copy kết quả ASR (format `transcribe_audio`) với timestamp theo thời gian gốc."""
+        if not isinstance(result, dict):
+            return result
+        result = dict(result)
+        if "segments" in result:
+            result["segments"] = self.remap_segments(result["segments"])
+        return result
+
+    def _remap_span(self, item: Dict) -> Dict:
+        start = self.to_original(item.get("start"))
+        end = self.to_original(item.get("end"), is_end=True)
+        if start is not None and end is not None and end < start:
+            end = start  # cả span nằm trong một gap
+        if "start" in item:
+            item["start"] = start
+        if "end" in item:
+            item["end"] = end
+        return item
+
+
+def _sample_bounds(ranges: Sequence[Tuple[float, float]], sr: int,
+                   n_samples: Optional[int] = None) -> List[Tuple[int, int]]:
+    bounds = []
+    for start, end in ranges:
+        s0 = max(0, int(start * sr))
+        s1 = int(end * sr) if n_samples is None else min(n_samples, int(end * sr))
+        if s1 > s0:
+            bounds.append((s0, s1))
+    return bounds
+
+
+def splice_audio(y: np.ndarray, sr: int, ranges: Sequence[Tuple[float, float]],
+                 gap: float = 0.0, mmap: bool = False) -> Tuple[np.ndarray, TimeMap]:
+    """
+    Nối các khoảng `ranges` (giây, thời gian gốc, theo thứ tự) của `y` thành
+    một array float32 mới, chèn `gap` giây zero giữa hai khoảng.
+
+    mmap: True để ghi vào memmap (`core.audio.audio_store.empty_memmap`)
+    thay vì array trong RAM, dùng khi `y` là recording dài đã memory-map.
+
+    Returns (samples, time_map). Biên được làm tròn về sample nên map khớp
+    chính xác với array trả về.
+    """
+    bounds = _sample_bounds(ranges, sr, len(y))
+    gap_samples = max(0, int(gap * sr))
+    total = sum(s1 - s0 for s0, s1 in bounds) + gap_samples * max(0, len(bounds) - 1)
+    if mmap:
+        from core.audio.audio_store import empty_memmap
+        out = empty_memmap(total)
+    else:
+        out = np.zeros(total, dtype=np.float32)
+    pos = 0
+    for s0, s1 in bounds:
+        out[pos:pos + s1 - s0] = y[s0:s1]
+        pos += s1 - s0 + gap_samples
+    return out, TimeMap.for_ranges(ranges, sr, gap=gap, n_samples=len(y))
@@ -1,19 +1,35 @@
 """Silero VAD helpers
 
 Provides a simple wrapper around the Silero VAD to extract speech timestamps
-and group them into windows suitable for ASR (e.g., 20-30s chunks).
+and group them into windows suitable for ASR (e.g., 20-30s chunks), or pack
+them into windows of ~30s of speech with the silence between them dropped
+(`pack_segments_into_windows`).
+
+Speech detection is incremental: audio is scored in Silero's fixed frames
+while the model keeps its state (`IncrementalVAD`), and segments are yielded
+as they close (`iter_speech_timestamps`), so long recordings and live streams
+are segmented in bounded memory.
 """
-from typing import List, Dict, Tuple
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+import copy
 import torch
 import numpy as np
 import tempfile
 import warnings
 
+from core.audio.time_map import TimeMap, splice_audio
+
 
 # Module-level cache to avoid re-loading the Silero VAD repeatedly (useful for cloud/streaming)
 _cached_vad_model = None
 _cached_vad_utils = None
 
+# Silero VAD scores fixed-size frames: 512 samples at 16kHz (32ms), 256 at 8kHz
+SILERO_FRAME_SAMPLES = {16000: 512, 8000: 256}
+
+# Silence (s) inserted between two speech segments packed into the same window
+PACK_GAP_SECONDS = 0.2
+
 
 def load_silero_vad(force_reload: bool = False, device: str = "cpu"):
     """Load Silero VAD model and utils via torch.hub.
@@ -49,14 +65,212 @@ def load_silero_vad(force_reload: bool = False, device: str = "cpu"):
         return None, None
 
 
-def get_speech_timestamps_from_array(y: np.ndarray, sr: int, model, utils, threshold: float = 0.5) -> List[Dict]:
+def clone_silero_vad(device: str = "cpu"):
+    """Return a private copy of the cached Silero VAD model, or None.
+
+    Silero keeps recurrent state inside the model object, so every live stream
+    needs its own copy; the weights are copied from the cached model instead of
+    being loaded from torch.hub again.
+    """
+    model, _ = load_silero_vad(device=device)
+    if model is None:
+        return None
+    try:
+        clone = copy.deepcopy(model)
+    except Exception as e:
+        warnings.warn(f"Could not copy Silero VAD model: {e}")
+        return None
+    if hasattr(clone, "reset_states"):
+        clone.reset_states()
+    return clone
+
+
+class IncrementalVAD:
+    """Frame-by-frame Silero VAD for audio that arrives in pieces.
+
+    Feed samples of any length with `feed`; they are scored in Silero's fixed
+    frame size while the model keeps its state across calls. Closed speech
+    segments are returned as {'start': float, 'end': float} in seconds of the
+    whole stream. Uses the same hysteresis as Silero's get_speech_timestamps
+    (speech starts above `threshold`, ends after `min_silence_ms` below
+    `threshold - 0.15`). Segments longer than `max_speech_s` are split.
+    """
+
+    def __init__(self, model, sr: int = 16000, threshold: float = 0.5,
+                 min_silence_ms: int = 300, speech_pad_ms: int = 100,
+                 min_speech_ms: int = 250, max_speech_s: float = float("inf")):
+        if sr not in SILERO_FRAME_SAMPLES:
+            raise ValueError(f"Silero VAD supports {sorted(SILERO_FRAME_SAMPLES)} Hz, got {sr}")
+        self.model = model
+        self.sr = sr
+        self.threshold = threshold
+        self.neg_threshold = max(threshold - 0.15, 0.01)
+        self.frame_samples = SILERO_FRAME_SAMPLES[sr]
+        self.min_silence_samples = int(sr * min_silence_ms / 1000)
+        self.speech_pad_samples = int(sr * speech_pad_ms / 1000)
+        self.min_speech_samples = int(sr * min_speech_ms / 1000)
+        self.max_speech_samples = max_speech_s * sr
+        self.reset()
+
+    def reset(self):
+        if hasattr(self.model, "reset_states"):
+            self.model.reset_states()
+        self._pending = np.zeros(0, dtype=np.float32)
+        self._position = 0          # samples scored so far
+        self._speech_start = None   # sample index of the open segment
+        self._silence_start = None  # first sample of the current silence run
+        self._pad_start = True      # False after a forced split (no overlap with the previous cut)
+
+    @property
+    def position(self) -> float:
+        """Seconds of audio scored so far."""
+        return self._position / self.sr
+
+    @property
+    def in_speech(self) -> bool:
+        return self._speech_start is not None
+
+    @property
+    def speech_start(self) -> Optional[float]:
+        """Start (seconds, padded) of the open speech segment, if any."""
+        if self._speech_start is None:
+            return None
+        return self._padded_start() / self.sr
+
+    def feed(self, samples: np.ndarray) -> List[Dict]:
+        """Score new samples; return speech segments that closed during this call."""
+        samples = np.asarray(samples, dtype=np.float32).reshape(-1)
+        if len(self._pending):
+            samples = np.concatenate([self._pending, samples])
+        n_frames = len(samples) // self.frame_samples
+        closed = []
+        for i in range(n_frames):
+            frame = samples[i * self.frame_samples:(i + 1) * self.frame_samples]
+            with torch.no_grad():
+                prob = float(self.model(torch.from_numpy(np.ascontiguousarray(frame)), self.sr).item())
+            segment = self._update(prob)
+            if segment is not None:
+                closed.append(segment)
+        self._pending = samples[n_frames * self.frame_samples:].copy()
+        return closed
+
+    def flush(self) -> List[Dict]:
+        """End of stream: close the open segment (if any) at the current position."""
+        closed = []
+        if self._speech_start is not None:
+            end = self._silence_start if self._silence_start is not None else self._position
+            segment = self._close(end)
+            if segment is not None:
+                closed.append(segment)
+        self._pending = np.zeros(0, dtype=np.float32)
+        return closed
+
+    def _update(self, prob: float) -> Optional[Dict]:
+        frame_start = self._position
+        self._position += self.frame_samples
+
+        if self._speech_start is None:
+            if prob >= self.threshold:
+                self._speech_start = frame_start
+                self._silence_start = None
+                self._pad_start = True
+            return None
+
+        if prob >= self.threshold:
+            self._silence_start = None
+        elif prob < self.neg_threshold:
+            if self._silence_start is None:
+                self._silence_start = frame_start
+            if self._position - self._silence_start >= self.min_silence_samples:
+                return self._close(self._silence_start)
+
+        if self._position - self._speech_start >= self.max_speech_samples:
+            # Force a cut and keep going: the next frame starts a new segment
+            segment = self._close(self._position, pad=False)
+            self._speech_start = self._position
+            self._pad_start = False
+            return segment
+        return None
+
+    def _padded_start(self) -> int:
+        if not self._pad_start:
+            return self._speech_start
+        return max(0, self._speech_start - self.speech_pad_samples)
+
+    def _close(self, end: int, pad: bool = True) -> Optional[Dict]:
+        start = self._padded_start()
+        length = end - self._speech_start
+        self._speech_start = None
+        self._silence_start = None
+        if length < self.min_speech_samples:
+            return None
+        pad_samples = self.speech_pad_samples if pad else 0
+        return {
+            "start": start / self.sr,
+            "end": min(self._position, end + pad_samples) / self.sr,
+        }
+
+
+def iter_speech_timestamps(audio: Union[np.ndarray, Iterable[np.ndarray]], sr: int, model,
+                           threshold: float = 0.5, chunk_seconds: float = 30.0,
+                           min_silence_ms: int = 100, speech_pad_ms: int = 30,
+                           min_speech_ms: int = 250) -> Iterator[Dict]:
+    """Yield speech timestamps {'start': float, 'end': float} (seconds) as they close.
+
+    `audio` is either a 1-D array, scored `chunk_seconds` at a time through
+    views, or an iterable of consecutive 1-D chunks (e.g. blocks read from a
+    file), so memory stays bounded by one chunk however long the recording
+    is. Audio that is not 8/16kHz is resampled to 16kHz chunk by chunk.
+    Defaults match Silero's get_speech_timestamps.
+
+    Runs on a private copy of `model` so concurrent callers of the cached
+    model do not share recurrent state.
+    """
+    try:
+        model = copy.deepcopy(model)
+    except Exception:
+        pass
+
+    vad_sr = sr if sr in SILERO_FRAME_SAMPLES else 16000
+    vad = IncrementalVAD(model, sr=vad_sr, threshold=threshold, min_silence_ms=min_silence_ms,
+                         speech_pad_ms=speech_pad_ms, min_speech_ms=min_speech_ms)
+
+    if isinstance(audio, np.ndarray):
+        step = max(1, int(chunk_seconds * sr))
+        chunks = (audio[i:i + step] for i in range(0, len(audio), step))
+    else:
+        chunks = audio
+
+    for chunk in chunks:
+        chunk = np.asarray(chunk, dtype=np.float32)
+        if vad_sr != sr:
+            import librosa
+            chunk = librosa.resample(chunk, orig_sr=sr, target_sr=vad_sr)
+        for segment in vad.feed(chunk):
+            yield segment
+    for segment in vad.flush():
+        yield segment
+
+
+def get_speech_timestamps_from_array(y: np.ndarray, sr: int, model, utils, threshold: float = 0.5,
+                                     streaming: bool = True) -> List[Dict]:
     """Return speech timestamps in seconds as list of dicts {'start': float, 'end': float}.
 
-    The Silero utils may return timestamps in samples; we convert to seconds.
+    By default the array is scored incrementally (`iter_speech_timestamps`),
+    so VAD memory does not grow with recording length. `streaming=False`, or
+    a Silero build whose model cannot be called frame by frame, hands the
+    whole array to Silero's get_speech_timestamps instead; those utils may
+    return timestamps in samples, which are converted to seconds.
     """
     if model is None or utils is None:
         return []
 
+    if streaming:
+        try:
+            return list(iter_speech_timestamps(y, sr, model, threshold=threshold))
+        except Exception as e:
+            warnings.warn(f"Streaming VAD failed, falling back to whole-array VAD: {e}")
+
     get_speech_ts = utils[0]
 
     # Silero expects a 1-D numpy array of floats (int16 -> float32 in [-1,1])
@@ -93,18 +307,25 @@ def get_speech_timestamps_from_array(y: np.ndarray, sr: int, model, utils, thres
 
 def merge_close_timestamps(timestamps: List[Dict], max_gap: float = 0.5) -> List[Dict]:
     """Merge adjacent timestamps separated by less than max_gap seconds."""
-    if not timestamps:
-        return []
+    return list(iter_merged_timestamps(sorted(timestamps, key=lambda x: x["start"]), max_gap=max_gap))
 
-    timestamps = sorted(timestamps, key=lambda x: x["start"])
-    merged = [timestamps[0].copy()]
-    for seg in timestamps[1:]:
-        prev = merged[-1]
-        if seg["start"] - prev["end"] <= max_gap:
-            prev["end"] = max(prev["end"], seg["end"])
-        else:
-            merged.append(seg.copy())
-    return merged
+
+def iter_merged_timestamps(timestamps: Iterable[Dict], max_gap: float = 0.5) -> Iterator[Dict]:
+    """Streaming `merge_close_timestamps` for timestamps arriving in time order.
+
+    A segment is yielded once the next one starts more than `max_gap` after
+    it (or the input ends), so it can no longer grow.
+    """
+    current = None
+    for seg in timestamps:
+        if current is not None and seg["start"] - current["end"] <= max_gap:
+            current["end"] = max(current["end"], seg["end"])
+            continue
+        if current is not None:
+            yield current
+        current = seg.copy()
+    if current is not None:
+        yield current
 
 
 def group_segments_into_windows(segments: List[Dict], min_dur: float = 20.0, max_dur: float = 30.0, audio_duration: float = None) -> List[Dict]:
@@ -118,10 +339,24 @@ def group_segments_into_windows(segments: List[Dict], min_dur: float = 20.0, max
             return [{"start": 0.0, "end": audio_duration}]
         return []
 
-    windows = []
-    current = {"start": segments[0]["start"], "end": segments[0]["end"]}
+    windows = list(iter_grouped_windows(segments, min_dur=min_dur, max_dur=max_dur))
+
+    # Optionally clip by audio_duration
+    if audio_duration is not None:
+        for w in windows:
+            w["start"] = max(0.0, w["start"])
+            w["end"] = min(audio_duration, w["end"])
+
+    return windows
+
 
-    for seg in segments[1:]:
+def iter_grouped_windows(segments: Iterable[Dict], min_dur: float = 20.0, max_dur: float = 30.0) -> Iterator[Dict]:
+    """Streaming `group_segments_into_windows`: a window is yielded when the next segment no longer fits."""
+    current = None
+    for seg in segments:
+        if current is None:
+            current = {"start": seg["start"], "end": seg["end"]}
+            continue
         proposed_end = seg["end"]
         # If merging the segment keeps us under max_dur, merge
         if (proposed_end - current["start"]) <= max_dur:
@@ -133,30 +368,123 @@ def group_segments_into_windows(segments: List[Dict], min_dur: float = 20.0, max
                 # If still exceeded max_dur, cut
                 if (current["end"] - current["start"]) > max_dur:
                     current["end"] = current["start"] + max_dur
-            windows.append(current)
+            yield current
             current = {"start": seg["start"], "end": seg["end"]}
+    if current is not None:
+        yield current
+
+
+def pack_segments_into_windows(segments: List[Dict], max_dur: float = 30.0, gap: float = PACK_GAP_SECONDS,
+                               audio_duration: float = None) -> List[Dict]:
+    """Pack speech segments into windows holding close to max_dur seconds of speech.
+
+    Whisper pads every input to 30s, so a window only costs one encoder pass
+    whatever its length; filling it with speech minimises the number of
+    passes. Segments are taken in time order and added to the current window
+    while the packed length (speech + `gap` between pieces) stays within
+    max_dur; the silence between pieces is not decoded. Speech is only cut
+    when a single segment is longer than max_dur (split into equal parts).
+
+    Returns list of windows {'start', 'end', 'pieces', 'gap', 'duration'}:
+    'start'/'end' span the original audio, 'pieces' are the original
+    [{'start', 'end'}] ranges laid end to end (see `slice_packed_window`) and
+    'duration' is the packed length in seconds. Without segments the whole
+    audio is cut into max_dur windows.
+    """
+    if not segments:
+        if not audio_duration:
+            return []
+        segments = [{"start": 0.0, "end": audio_duration}]
+    return list(iter_packed_windows(sorted(segments, key=lambda s: s["start"]), max_dur=max_dur, gap=gap,
+                                    audio_duration=audio_duration))
 
-    windows.append(current)
 
-    # Optionally clip by audio_duration
-    if audio_duration is not None:
-        for w in windows:
-            w["start"] = max(0.0, w["start"])
-            w["end"] = min(audio_duration, w["end"])
+def iter_packed_windows(segments: Iterable[Dict], max_dur: float = 30.0, gap: float = PACK_GAP_SECONDS,
+                        audio_duration: float = None) -> Iterator[Dict]:
+    """Streaming `pack_segments_into_windows` for segments arriving in time order.
 
-    return windows
+    A window is yielded as soon as the next piece no longer fits, so ASR can
+    start on it while later audio is still being decoded and scored.
+    """
+    current: List[Tuple[float, float]] = []
+    length = 0.0
+    for seg in segments:
+        start = max(0.0, seg["start"])
+        end = min(audio_duration, seg["end"]) if audio_duration is not None else seg["end"]
+        if end <= start:
+            continue
+        parts = int(np.ceil((end - start) / max_dur))
+        step = (end - start) / parts
+        for k in range(parts):
+            piece_start, piece_end = start + k * step, end if k == parts - 1 else start + (k + 1) * step
+            added = (piece_end - piece_start) + (gap if current else 0.0)
+            if current and length + added > max_dur:
+                yield _packed_window(current, gap, length)
+                current, length, added = [], 0.0, piece_end - piece_start
+            current.append((piece_start, piece_end))
+            length += added
+    if current:
+        yield _packed_window(current, gap, length)
+
+
+def _packed_window(pieces: List[Tuple[float, float]], gap: float, length: float) -> Dict:
+    return {
+        "start": pieces[0][0],
+        "end": pieces[-1][1],
+        "pieces": [{"start": s, "end": e} for s, e in pieces],
+        "gap": gap,
+        "duration": length,
+    }
+
+
+def window_duration(window: Dict) -> float:
+    """Seconds of audio the ASR model actually sees for a (possibly packed) window."""
+    return window.get("duration", window["end"] - window["start"])
+
+
+def slice_packed_window(y: np.ndarray, sr: int, window: Dict) -> Tuple[np.ndarray, TimeMap]:
+    """Return (samples, time_map) for a window from `pack_segments_into_windows`.
+
+    The pieces are copied end to end with `gap` seconds of zeros between
+    them; `time_map.remap_result` maps ASR timestamps back to the original
+    audio. Plain {'start', 'end'} windows are returned as a single piece.
+    """
+    pieces = window.get("pieces") or [window]
+    return splice_audio(y, sr, [(p["start"], p["end"]) for p in pieces], gap=window.get("gap", 0.0))
 
 
-def extract_window_audio(y: np.ndarray, sr: int, window: Dict) -> Tuple[str, float, float]:
-    """Write a window to a temporary WAV file and return (path, start, end)."""
-    import soundfile as sf
+def window_audio(y: np.ndarray, sr: int, window: Dict) -> np.ndarray:
+    """Samples of any window: packed pieces are spliced, plain windows are a view of `y`."""
+    if window.get("pieces"):
+        return slice_packed_window(y, sr, window)[0]
+    return slice_window(y, sr, window)[0]
+
+
+def window_time_map(window: Dict, sr: int) -> TimeMap:
+    """Map from time inside `window_audio(y, sr, window)` to time in the original audio."""
+    pieces = window.get("pieces") or [window]
+    return TimeMap.for_ranges([(p["start"], p["end"]) for p in pieces], sr, gap=window.get("gap", 0.0))
+
+
+def slice_window(y: np.ndarray, sr: int, window: Dict) -> Tuple[np.ndarray, float, float]:
+    """Return (samples, start, end) for a window without copying the samples.
 
+    The returned array is a view into `y`, so it is cheap enough to collect
+    for every window of a long recording before batching them for ASR.
+    """
     start_sample = int(window["start"] * sr)
     end_sample = int(window["end"] * sr)
     start_sample = max(0, start_sample)
     end_sample = min(len(y), end_sample)
 
-    chunk = y[start_sample:end_sample]
+    return y[start_sample:end_sample], window["start"], window["end"]
+
+
+def extract_window_audio(y: np.ndarray, sr: int, window: Dict) -> Tuple[str, float, float]:
+    """Write a window to a temporary WAV file and return (path, start, end)."""
+    import soundfile as sf
+
+    chunk, _, _ = slice_window(y, sr, window)
 
     tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".wav")
     tmp.close()
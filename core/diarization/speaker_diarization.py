@@ -11,7 +11,7 @@ try:
     ensure_ffmpeg(silent=True)
 except Exception:
     pass
-import librosa
+from core.audio.audio_store import block_rms
 
 def simple_speaker_segmentation(audio_array, sr, segments, min_silence_duration=0.5):
     """
@@ -39,7 +39,8 @@ def simple_speaker_segmentation(audio_array, sr, segments, min_silence_duration=
         frame_length = int(0.025 * sr)  # 25ms frames
         hop_length = int(0.010 * sr)    # 10ms hop
         
-        energy = librosa.feature.rms(y=audio_array, frame_length=frame_length, hop_length=hop_length)[0]
+        # Tính theo block: audio có thể là memmap nhiều giờ
+        energy = block_rms(audio_array, frame_length=frame_length, hop_length=hop_length)
         
         # Threshold để phát hiện speech
         energy_threshold = np.percentile(energy, 20)
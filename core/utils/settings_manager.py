@@ -17,6 +17,7 @@ def load_settings() -> Dict:
             "phowhisper_repo": os.getenv("PHOWHISPER_REPO", "vinai/PhoWhisper"),
             "device": "cpu" if config.is_cloud() else ("cuda" if os.getenv("USE_GPU", "true").lower() == "true" else "cpu"),
             "precision": os.getenv("MODEL_PRECISION", "fp32"),
+            "ct2_compute_type": os.getenv("CT2_COMPUTE_TYPE", "int8"),
         },
         "inference": {
             "beam_size": int(os.getenv("BEAM_SIZE", "5")),
@@ -24,14 +25,20 @@ def load_settings() -> Dict:
             "temperature": float(os.getenv("TEMPERATURE", "0.0")),
             "best_of": int(os.getenv("BEST_OF", "5")),
             "patience": float(os.getenv("PATIENCE", "1.0")),
+            "decoding_profile": os.getenv("DECODING_PROFILE", "accurate"),
+            "max_fallbacks": int(os.getenv("MAX_FALLBACKS", "2")),
+            "max_new_tokens": int(os.getenv("MAX_NEW_TOKENS", "224")),
+            "cascade_logprob_threshold": float(os.getenv("CASCADE_LOGPROB_THRESHOLD", "-0.6")),
         },
         "resource": {
             "num_threads": int(os.getenv("NUM_THREADS", "4")),
+            "num_workers": int(os.getenv("NUM_WORKERS", "1")),
             "quantization": os.getenv("QUANTIZATION", "none"),
             "max_memory_mb": int(os.getenv("MAX_MEMORY_MB", "4096")),
         },
         "pipeline": {
             "vad_enabled": os.getenv("VAD_ENABLED", "false").lower() == "true",
+            "compress_silence": os.getenv("COMPRESS_SILENCE", "true").lower() == "true",
             "diarization_backend": os.getenv("DIARIZATION_BACKEND", "simple"),
             "max_speakers": int(os.getenv("MAX_SPEAKERS", "4")),
         },
@@ -0,0 +1,71 @@
+"""DecodingProfile temperature schedules and backend kwargs (core/asr/decoding.py)."""
+from core.asr.decoding import FAST_PROFILE, DecodingProfile, accurate_profile
+
+SETTINGS = {"inference": {"beam_size": 5, "best_of": 5, "temperature": 0.0, "patience": 1.0,
+                          "max_fallbacks": 2, "max_new_tokens": 128}}
+
+
+def test_temperature_schedule_is_capped_by_fallbacks():
+    profile = DecodingProfile(name="x", temperature=0.0, max_fallbacks=2)
+    assert profile.temperatures() == (0.0, 0.2, 0.4)
+
+
+def test_temperature_schedule_stops_at_one():
+    profile = DecodingProfile(name="x", temperature=0.6, max_fallbacks=5)
+    assert profile.temperatures() == (0.6, 0.8, 1.0)
+
+
+def test_fast_profile_never_falls_back():
+    assert FAST_PROFILE.temperatures() == (0.0,)
+    kwargs = FAST_PROFILE.whisper_transcribe_kwargs()
+    assert kwargs["temperature"] == (0.0,)
+    assert "beam_size" not in kwargs and "best_of" not in kwargs
+
+
+def test_accurate_profile_from_settings():
+    profile = accurate_profile(SETTINGS)
+    assert profile.name == "accurate"
+    kwargs = profile.whisper_transcribe_kwargs()
+    assert kwargs["temperature"] == (0.0, 0.2, 0.4)
+    assert kwargs["beam_size"] == 5
+    assert kwargs["patience"] == 1.0
+    assert kwargs["best_of"] == 5
+    assert kwargs["sample_len"] == 128
+
+
+def test_single_decode_uses_beam_at_zero_and_best_of_when_sampling():
+    profile = accurate_profile(SETTINGS)
+    greedy = profile.whisper_decoding_kwargs(0.0)
+    assert greedy == {"temperature": 0.0, "sample_len": 128, "beam_size": 5, "patience": 1.0}
+    sampled = profile.whisper_decoding_kwargs(0.4)
+    assert sampled == {"temperature": 0.4, "sample_len": 128, "best_of": 5}
+
+
+def test_ct2_kwargs_use_faster_whisper_names():
+    kwargs = accurate_profile(SETTINGS).ct2_transcribe_kwargs()
+    assert kwargs["temperature"] == [0.0, 0.2, 0.4]
+    assert kwargs["log_prob_threshold"] == -1.0
+    assert kwargs["max_new_tokens"] == 128
+    assert FAST_PROFILE.ct2_transcribe_kwargs()["beam_size"] == 1
+
+
+def test_generate_kwargs_sample_only_above_zero_temperature():
+    assert accurate_profile(SETTINGS).generate_kwargs() == {"max_new_tokens": 128, "num_beams": 5}
+    sampled = DecodingProfile(name="x", temperature=0.3).generate_kwargs()
+    assert sampled["do_sample"] is True and sampled["temperature"] == 0.3
+
+
+def test_fallback_rule():
+    profile = DecodingProfile(name="x")
+    assert profile.needs_fallback(avg_logprob=-0.2, compression_ratio=3.0, no_speech_prob=0.0)
+    assert profile.needs_fallback(avg_logprob=-1.5, compression_ratio=1.0, no_speech_prob=0.0)
+    assert not profile.needs_fallback(avg_logprob=-1.5, compression_ratio=1.0, no_speech_prob=0.9)
+    assert not profile.needs_fallback(avg_logprob=-0.2, compression_ratio=1.5, no_speech_prob=0.0)
+
+
+def test_cache_options_ignore_the_name():
+    a = DecodingProfile(name="a", beam_size=5)
+    b = DecodingProfile(name="b", beam_size=5)
+    assert a.cache_options() == b.cache_options()
+    assert "name" not in a.cache_options()
+    assert a.cache_options() != DecodingProfile(name="a", beam_size=3).cache_options()
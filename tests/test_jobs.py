@@ -0,0 +1,76 @@
+"""Bounded job queue: rejection when full and input cleanup (core/api/jobs.py)."""
+import threading
+
+import pytest
+
+from core.api.jobs import JOB_DONE, JOB_FAILED, JobQueue, QueueFullError
+
+
+def wait_finished(queue, job, timeout=5.0):
+    done = threading.Event()
+    for _ in range(int(timeout / 0.01)):
+        if queue.get(job.id).finished:
+            return queue.get(job.id)
+        done.wait(0.01)
+    raise AssertionError(f"job {job.id} did not finish")
+
+
+def test_full_queue_rejects_and_cleans_up():
+    queue = JobQueue(lambda **kwargs: kwargs, workers=1, max_queue_size=1)  # not started: nothing drains
+    cleaned = []
+    first = queue.submit(cleanup=lambda: cleaned.append("first"), value=1)
+    with pytest.raises(QueueFullError):
+        queue.submit(cleanup=lambda: cleaned.append("second"), value=2)
+    assert cleaned == ["second"]
+    assert queue.get(first.id) is not None
+    assert queue.stats()["queued"] == 1
+
+
+def test_rejected_job_can_keep_its_input():
+    queue = JobQueue(lambda **kwargs: kwargs, workers=1, max_queue_size=1)
+    queue.submit(value=1)
+    cleaned = []
+    with pytest.raises(QueueFullError):
+        queue.submit(cleanup=lambda: cleaned.append(True), cleanup_on_reject=False, value=2)
+    assert cleaned == []
+
+
+def test_cleanup_runs_once_after_the_job():
+    cleaned = []
+    queue = JobQueue(lambda value: {"value": value}, workers=2, max_queue_size=4)
+    queue.start()
+    try:
+        job = wait_finished(queue, queue.submit(cleanup=lambda: cleaned.append(1), value=7))
+    finally:
+        queue.stop()
+    assert job.status == JOB_DONE
+    assert job.result == {"value": 7}
+    assert job.kwargs == {}
+    assert cleaned == [1]
+
+
+def test_failures_are_classified_and_still_cleaned_up():
+    def handler(kind):
+        raise (ValueError if kind == "client" else RuntimeError)(kind)
+
+    cleaned = []
+    queue = JobQueue(handler, workers=1, max_queue_size=4, client_errors=(ValueError,))
+    queue.start()
+    try:
+        client = wait_finished(queue, queue.submit(cleanup=lambda: cleaned.append("client"), kind="client"))
+        server = wait_finished(queue, queue.submit(cleanup=lambda: cleaned.append("server"), kind="server"))
+    finally:
+        queue.stop()
+    assert (client.status, client.client_error, client.error) == (JOB_FAILED, True, "client")
+    assert (server.status, server.client_error) == (JOB_FAILED, False)
+    assert cleaned == ["client", "server"]
+
+
+def test_finished_jobs_are_pruned():
+    queue = JobQueue(lambda: {}, workers=1, max_queue_size=8, max_finished_jobs=2)
+    queue.start()
+    try:
+        jobs = [wait_finished(queue, queue.submit()) for _ in range(4)]
+    finally:
+        queue.stop()
+    assert [queue.get(job.id) is not None for job in jobs] == [False, False, True, True]
@@ -0,0 +1,172 @@
+"""ModelPool single-flight loading, LRU eviction and per-model locking (core/asr/model_pool.py)."""
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("torch")
+
+from core.asr import model_pool as model_pool_module
+from core.asr.model_pool import CT2_FP16_MB, ModelPool, estimate_model_mb
+from core.asr.quantization import set_model_precision
+from core.asr.result_cache import tag_model
+
+
+class FakeModel:
+    def __init__(self, size, size_mb=100.0):
+        self.size = size
+        self.size_mb = size_mb
+
+
+class FakeTensor:
+    def __init__(self, n_bytes, ptr):
+        self.n_bytes = n_bytes
+        self.ptr = ptr
+
+    def numel(self):
+        return self.n_bytes
+
+    def element_size(self):
+        return 1
+
+    def data_ptr(self):
+        return self.ptr
+
+
+class FakeModule:
+    def __init__(self, state):
+        self.state = state
+
+    def state_dict(self):
+        return self.state
+
+
+class FakeCt2Model:
+    pass
+
+
+@pytest.fixture(autouse=True)
+def fake_sizes(monkeypatch):
+    monkeypatch.setattr(model_pool_module, "estimate_model_mb", lambda model: model.size_mb)
+
+
+def make_pool(max_memory_mb=250, delay=0.0):
+    calls = []
+
+    def loader(size, device, precision):
+        calls.append(size)
+        time.sleep(delay)
+        return FakeModel(size)
+
+    return ModelPool(max_memory_mb=max_memory_mb, loaders={"whisper": loader}), calls
+
+
+def get(pool, size):
+    return pool.get("whisper", size, device="cpu", precision="fp32")
+
+
+def loaded_sizes(pool):
+    return [entry["size"] for entry in pool.loaded()]
+
+
+def test_concurrent_gets_load_once():
+    pool, calls = make_pool(delay=0.1)
+    barrier = threading.Barrier(8)
+    models = []
+
+    def worker():
+        barrier.wait()
+        models.append(get(pool, "base"))
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert calls == ["base"]
+    assert len(models) == 8 and all(model is models[0] for model in models)
+
+
+def test_least_recently_used_model_is_evicted():
+    pool, calls = make_pool(max_memory_mb=250)
+    get(pool, "tiny")
+    get(pool, "base")
+    get(pool, "tiny")  # tiny is now the most recently used
+    get(pool, "small")
+    assert loaded_sizes(pool) == ["tiny", "small"]
+    assert pool.memory_mb() == 200
+    get(pool, "base")  # evicted earlier: loaded again
+    assert calls == ["tiny", "base", "small", "base"]
+
+
+def test_model_over_budget_is_still_kept():
+    pool, _ = make_pool(max_memory_mb=50)
+    get(pool, "tiny")
+    get(pool, "base")
+    assert loaded_sizes(pool) == ["base"]
+
+
+def test_model_being_decoded_is_not_evicted():
+    pool, _ = make_pool(max_memory_mb=250)
+    with pool.use("whisper", "tiny", device="cpu", precision="fp32"):
+        get(pool, "base")
+        get(pool, "small")  # over budget: tiny is the LRU but busy, base goes
+        assert loaded_sizes(pool) == ["tiny", "small"]
+
+
+def test_use_serializes_decodes_per_model():
+    pool, _ = make_pool()
+    active, peak = [0], [0]
+    counter_lock = threading.Lock()
+
+    def decode(size):
+        with pool.use("whisper", size, device="cpu", precision="fp32"):
+            with counter_lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.02)
+            with counter_lock:
+                active[0] -= 1
+
+    threads = [threading.Thread(target=decode, args=("base",)) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert peak[0] == 1
+
+
+def test_different_models_do_not_share_a_lock():
+    pool, _ = make_pool()
+    _, tiny_lock = pool.acquire("whisper", "tiny", device="cpu", precision="fp32")
+    _, base_lock = pool.acquire("whisper", "base", device="cpu", precision="fp32")
+    with tiny_lock:
+        assert base_lock.acquire(timeout=1)
+        base_lock.release()
+
+
+def test_estimate_counts_packed_int8_weights():
+    mb = 1024 * 1024
+    weight = FakeTensor(2 * mb, ptr=1)
+    state = {
+        "encoder.weight": weight,
+        "decoder.weight": weight,  # tied: counted once
+        "layer._packed_params._packed_params": (FakeTensor(mb, ptr=2), FakeTensor(mb, ptr=3)),
+        "layer._packed_params.dtype": "qint8",
+    }
+    assert estimate_model_mb(FakeModule(state)) == 4.0
+
+
+def test_ct2_estimate_falls_back_to_size_table():
+    model = set_model_precision(tag_model(FakeCt2Model(), "ct2", "distil-large-v3"), "int8")
+    assert estimate_model_mb(model) == CT2_FP16_MB["large"] / 2
+    model = set_model_precision(tag_model(FakeCt2Model(), "ct2", "small"), "float16")
+    assert estimate_model_mb(model) == CT2_FP16_MB["small"]
+
+
+def test_unknown_backend_and_precision_are_rejected():
+    pool, _ = make_pool()
+    with pytest.raises(ValueError):
+        pool.get("nope", "base", device="cpu", precision="fp32")
+    with pytest.raises(ValueError):
+        pool.get("whisper", "base", device="cpu", precision="int4")
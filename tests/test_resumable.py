@@ -0,0 +1,120 @@
+"""Content-Range parsing and part assembly of resumable uploads (core/api/resumable.py)."""
+import hashlib
+
+import pytest
+
+from core.api.resumable import (
+    ChecksumMismatchError,
+    ResumableUploadStore,
+    UploadConflictError,
+    UploadSizeError,
+    parse_content_range,
+)
+
+MAX_BYTES = 1000
+DATA = bytes(range(256)) * 2 + b"tail"  # 516 bytes
+
+
+def sha(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ResumableUploadStore(tmp_path, max_bytes=MAX_BYTES, ttl=3600)
+
+
+def send(upload, start, end, total=len(DATA), data=DATA, checksum=None):
+    """PUT bytes [start, end) of `data`."""
+    body = data[start:end]
+    writer = upload.begin_part(start, len(body), total, checksum or sha(body), MAX_BYTES)
+    if writer is None:
+        return False
+    writer.write(body)
+    writer.commit()
+    return True
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes 0-99/1000", (0, 100, 1000)),
+    ("bytes 100-100/101", (100, 1, 101)),
+    (" bytes 5-9/* ", (5, 5, None)),
+])
+def test_parse_content_range(header, expected):
+    assert parse_content_range(header) == expected
+
+
+@pytest.mark.parametrize("header", [None, "", "bytes 0-99", "items 0-9/10", "bytes 10-5/100", "bytes 0-100/100"])
+def test_parse_content_range_rejects_invalid(header):
+    with pytest.raises(ValueError):
+        parse_content_range(header)
+
+
+def test_out_of_order_parts_are_merged_into_the_prefix(store):
+    upload = store.create("talk.mp3", len(DATA))
+    send(upload, 400, len(DATA))
+    send(upload, 200, 400)
+    assert upload.contiguous == 0
+    assert upload.missing_ranges() == [(0, 199)]
+    send(upload, 0, 200)
+    assert upload.contiguous == len(DATA)
+    assert upload.missing_ranges() == []
+
+    path = upload.complete(sha(DATA))
+    with open(path, "rb") as f:
+        assert f.read() == DATA
+    assert not list(upload.dir.glob("*.part*"))
+
+
+def test_retried_part_is_idempotent(store):
+    upload = store.create("talk.mp3", len(DATA))
+    assert send(upload, 0, 100)
+    assert not send(upload, 0, 100)
+    assert upload.contiguous == 100
+
+
+def test_overlapping_part_is_rejected(store):
+    upload = store.create("talk.mp3", len(DATA))
+    send(upload, 0, 100)
+    with pytest.raises(UploadConflictError):
+        send(upload, 50, 150)
+
+
+def test_bad_checksum_keeps_the_valid_prefix(store):
+    upload = store.create("talk.mp3", len(DATA))
+    send(upload, 0, 100)
+    with pytest.raises(ChecksumMismatchError):
+        send(upload, 100, 200, checksum="0" * 64)
+    assert upload.contiguous == 100
+    send(upload, 100, len(DATA))
+    with open(upload.complete(), "rb") as f:
+        assert f.read() == DATA
+
+
+def test_incomplete_upload_cannot_be_finalized(store):
+    upload = store.create("talk.mp3", len(DATA))
+    send(upload, 0, 100)
+    with pytest.raises(UploadConflictError):
+        upload.complete()
+
+
+def test_whole_file_checksum_is_verified(store):
+    upload = store.create("talk.mp3", len(DATA))
+    send(upload, 0, len(DATA))
+    with pytest.raises(ChecksumMismatchError):
+        upload.complete(sha(b"something else"))
+
+
+def test_total_from_content_range_is_capped(store):
+    upload = store.create("talk.mp3")  # size unknown at creation
+    with pytest.raises(UploadSizeError):
+        upload.begin_part(0, 10, MAX_BYTES + 1, sha(DATA[:10]), MAX_BYTES)
+    with pytest.raises(UploadSizeError):
+        upload.begin_part(MAX_BYTES - 5, 10, None, sha(DATA[:10]), MAX_BYTES)
+    assert upload.total_size is None
+
+
+def test_range_past_declared_size_is_rejected(store):
+    upload = store.create("talk.mp3", 100)
+    with pytest.raises(UploadSizeError):
+        send(upload, 90, 110, total=None)
@@ -0,0 +1,82 @@
+"""TimeMap / splice_audio offset remapping (core/audio/time_map.py)."""
+import numpy as np
+import pytest
+
+from core.audio.time_map import TimeMap, splice_audio
+
+SR = 10
+
+
+@pytest.fixture
+def spliced():
+    y = np.arange(100, dtype=np.float32)  # 10 s at 10 Hz, sample value = index
+    return splice_audio(y, SR, [(1.0, 2.0), (5.0, 6.0)], gap=0.5)
+
+
+def test_splice_copies_ranges_with_zero_gap(spliced):
+    out, time_map = spliced
+    assert len(out) == 10 + 5 + 10
+    np.testing.assert_array_equal(out[:10], np.arange(10, 20))
+    np.testing.assert_array_equal(out[10:15], 0)
+    np.testing.assert_array_equal(out[15:], np.arange(50, 60))
+    assert time_map.duration == pytest.approx(2.5)
+    assert time_map.original_span == (pytest.approx(1.0), pytest.approx(6.0))
+
+
+def test_points_inside_pieces_keep_their_offset(spliced):
+    _, time_map = spliced
+    assert time_map.to_original(0.0) == pytest.approx(1.0)
+    assert time_map.to_original(0.5) == pytest.approx(1.5)
+    assert time_map.to_original(1.7) == pytest.approx(5.2)
+    assert time_map.to_original(2.5, is_end=True) == pytest.approx(6.0)
+
+
+def test_points_in_gap_snap_to_nearest_speech_edge(spliced):
+    _, time_map = spliced
+    assert time_map.to_original(1.2) == pytest.approx(5.0)
+    assert time_map.to_original(1.2, is_end=True) == pytest.approx(2.0)
+    # An end exactly on the next piece's start belongs to the previous piece
+    assert time_map.to_original(1.5, is_end=True) == pytest.approx(2.0)
+
+
+def test_remap_result_moves_segments_and_words(spliced):
+    _, time_map = spliced
+    result = {
+        "text": "a b",
+        "segments": [
+            {"start": 0.2, "end": 1.8, "text": "a b",
+             "words": [{"start": 0.2, "end": 0.9, "word": "a"}, {"start": 1.6, "end": 1.8, "word": "b"}]},
+            {"start": 1.1, "end": 1.3, "text": ""},  # entirely inside the gap
+        ],
+    }
+    remapped = time_map.remap_result(result)
+    first, second = remapped["segments"]
+    assert (first["start"], first["end"]) == (pytest.approx(1.2), pytest.approx(5.3))
+    assert [(w["start"], w["end"]) for w in first["words"]] == [
+        (pytest.approx(1.2), pytest.approx(1.9)),
+        (pytest.approx(5.1), pytest.approx(5.3)),
+    ]
+    assert second["start"] == second["end"]
+    # The input is not modified
+    assert result["segments"][0]["start"] == 0.2
+
+
+def test_for_ranges_matches_splice_without_audio():
+    ranges = [(0.25, 1.0), (3.0, 3.7), (8.0, 9.9)]
+    _, from_audio = splice_audio(np.zeros(100, dtype=np.float32), SR, ranges, gap=0.2)
+    assert TimeMap.for_ranges(ranges, SR, gap=0.2, n_samples=100).pieces == from_audio.pieces
+
+
+def test_mmap_splice_writes_to_a_memmap(spliced):
+    pytest.importorskip("soundfile")  # core.audio.audio_store
+    out, _ = spliced
+    y = np.arange(100, dtype=np.float32)
+    mapped, _ = splice_audio(y, SR, [(1.0, 2.0), (5.0, 6.0)], gap=0.5, mmap=True)
+    assert isinstance(mapped, np.memmap)
+    np.testing.assert_array_equal(mapped, out)
+
+
+def test_empty_map_passes_times_through():
+    time_map = TimeMap([])
+    assert time_map.to_original(3.0) == 3.0
+    assert time_map.to_original(None) is None
@@ -0,0 +1,121 @@
+"""IncrementalVAD hysteresis and streaming window packing (core/audio/vad.py)."""
+import random
+
+import numpy as np
+import pytest
+
+pytest.importorskip("torch")
+
+from core.audio.vad import IncrementalVAD, iter_packed_windows, pack_segments_into_windows
+
+SR = 16000
+FRAME = 512  # Silero frame at 16 kHz
+
+
+def frames(*runs):
+    """[(prob, n_frames), ...] -> samples whose every frame carries `prob` as its value."""
+    return np.concatenate([np.full(n * FRAME, p, dtype=np.float32) for p, n in runs])
+
+
+def prob_model(frame, sr):
+    # The fake "model" reads the speech probability straight from the frame
+    return frame[0]
+
+
+def make_vad(**kwargs):
+    options = {"threshold": 0.5, "min_silence_ms": 300, "speech_pad_ms": 0, "min_speech_ms": 0}
+    options.update(kwargs)
+    return IncrementalVAD(prob_model, sr=SR, **options)
+
+
+def run(vad, audio, piece=None):
+    segments = []
+    piece = piece or len(audio)
+    for i in range(0, len(audio), piece):
+        segments += vad.feed(audio[i:i + piece])
+    return segments + vad.flush()
+
+
+def seconds(n_frames):
+    return n_frames * FRAME / SR
+
+
+def test_probability_between_thresholds_keeps_speech_open():
+    # 0.4 is below `threshold` (0.5) but above `threshold - 0.15`: no silence starts
+    audio = frames((0.0, 10), (0.9, 20), (0.4, 20), (0.9, 20), (0.0, 20))
+    segments = run(make_vad(), audio)
+    assert segments == [{"start": pytest.approx(seconds(10)), "end": pytest.approx(seconds(70))}]
+
+
+def test_probability_between_thresholds_does_not_open_speech():
+    audio = frames((0.0, 5), (0.4, 40), (0.0, 20))
+    assert run(make_vad(), audio) == []
+
+
+def test_short_dip_below_negative_threshold_is_bridged():
+    # 5 frames = 160 ms of silence < min_silence_ms
+    audio = frames((0.9, 20), (0.1, 5), (0.9, 20), (0.0, 20))
+    segments = run(make_vad(), audio)
+    assert len(segments) == 1
+    assert segments[0]["end"] == pytest.approx(seconds(45))
+
+
+def test_long_silence_closes_segment():
+    audio = frames((0.9, 20), (0.1, 20), (0.9, 20), (0.0, 20))
+    segments = run(make_vad(), audio)
+    assert [(s["start"], s["end"]) for s in segments] == [
+        pytest.approx((0.0, seconds(20))),
+        pytest.approx((seconds(40), seconds(60))),
+    ]
+
+
+def test_feed_piece_size_does_not_change_segments():
+    audio = frames((0.0, 7), (0.9, 13), (0.4, 9), (0.2, 15), (0.9, 31), (0.0, 12))
+    expected = run(make_vad(), audio)
+    for piece in (100, FRAME, 3 * FRAME + 17):
+        assert run(make_vad(), audio, piece=piece) == expected
+
+
+def test_max_speech_splits_without_overlap():
+    audio = frames((0.9, 100), (0.0, 20))
+    segments = run(make_vad(max_speech_s=1.0), audio)
+    assert len(segments) > 1
+    for before, after in zip(segments, segments[1:]):
+        assert before["end"] <= after["start"]
+        assert before["end"] - before["start"] <= 1.0 + seconds(1)
+
+
+def random_segments(rng, count):
+    segments, t = [], 0.0
+    for _ in range(count):
+        t += rng.uniform(0.0, 3.0)
+        length = rng.choice([rng.uniform(0.05, 4.0), rng.uniform(20.0, 95.0)])
+        segments.append({"start": t, "end": t + length})
+        t += length
+    return segments
+
+
+@pytest.mark.parametrize("max_dur", [5.0, 30.0])
+def test_packed_windows_never_exceed_max_dur(max_dur):
+    rng = random.Random(0)
+    for _ in range(200):
+        segments = random_segments(rng, rng.randint(1, 30))
+        windows = list(iter_packed_windows(segments, max_dur=max_dur))
+        for window in windows:
+            pieces = window["pieces"]
+            packed = sum(p["end"] - p["start"] for p in pieces) + window["gap"] * (len(pieces) - 1)
+            assert packed == pytest.approx(window["duration"])
+            assert window["duration"] <= max_dur + 1e-6
+        # Every second of speech ends up in exactly one window, in time order
+        speech = sum(s["end"] - s["start"] for s in segments)
+        packed_speech = sum(p["end"] - p["start"] for w in windows for p in w["pieces"])
+        assert packed_speech == pytest.approx(speech)
+        starts = [p["start"] for w in windows for p in w["pieces"]]
+        assert starts == sorted(starts)
+
+
+def test_streaming_packing_matches_batch():
+    rng = random.Random(1)
+    segments = random_segments(rng, 40)
+    assert list(iter_packed_windows(iter(segments), max_dur=30.0)) == \
+        pack_segments_into_windows(segments, max_dur=30.0)